@@ -0,0 +1,69 @@
+"""
+Micro-benchmark of per-request chain overhead in RAGPipeline, before and after the
+compiled-chain cache.
+
+"rebuild" constructs the prompt template + RunnableWithMessageHistory on every request
+(the old behaviour); "cached" looks the chain up in the LRU. Both then invoke it with
+an instant fake LLM and in-memory history, so the numbers are pure framework overhead.
+No API keys, Redis or vector store are needed.
+
+Usage:
+    python Verify/benchmark_chain_cache.py --requests 2000
+"""
+import argparse
+import time
+
+from langchain_core.chat_history import InMemoryChatMessageHistory
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from ultimaterag.core.rag_engine import RAGPipeline
+from ultimaterag.utils.LRU_Cache import LRUCache
+
+
+class InMemoryHistories:
+    def __init__(self):
+        self.sessions = {}
+
+    def get_session_memory(self, session_id: str):
+        history = self.sessions.setdefault(session_id, InMemoryChatMessageHistory())
+        history.clear()  # keep prompt size constant across iterations
+        return history
+
+
+def make_pipeline() -> RAGPipeline:
+    rag = RAGPipeline.__new__(RAGPipeline)  # skip vector store / Redis setup
+    rag.llm = FakeListChatModel(responses=["ok"])
+    rag.memory_manager = InMemoryHistories()
+    rag.chain_cache = LRUCache(128)
+    return rag
+
+
+def run(rag: RAGPipeline, get_chain, n: int, invoke: bool) -> float:
+    params = {"temperature": 0.2}
+    start = time.perf_counter()
+    for i in range(n):
+        chain = get_chain("You are a helpful assistant.", params)
+        if invoke:
+            chain.invoke(
+                {"question": "What is RAG?", "context": "Retrieval augmented generation."},
+                config={"configurable": {"session_id": f"s{i % 16}"}},
+            )
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=1000)
+    args = parser.parse_args()
+
+    rag = make_pipeline()
+    print(f"Requests: {args.requests}")
+    for label, invoke in (("construction only", False), ("construction + invoke", True)):
+        rebuild = run(rag, rag._build_chain, args.requests, invoke)
+        cached = run(rag, rag._get_chain, args.requests, invoke)
+        print(f"  {label:<22} rebuild {rebuild:>8.1f} us/req   cached {cached:>8.1f} us/req   "
+              f"({rebuild / cached:.1f}x)")
+    print(f"  chain cache: {rag.chain_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Chat throughput benchmark against a running server.
+
+Fires --requests chat calls with --concurrency in flight and reports requests/s and
+latency percentiles. Run it once per worker count to check scaling, e.g.:
+
+    ultimaterag start --workers 1      # then, in another shell:
+    python Verify/benchmark_chat_throughput.py --concurrency 32 --requests 256
+    ultimaterag start --workers 4
+    python Verify/benchmark_chat_throughput.py --concurrency 32 --requests 256
+
+Each request uses its own session so the answer cache and session memory do not
+serialize the run; pass --query to repeat one question and measure cached answers instead.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import httpx
+
+
+async def run(url: str, total: int, concurrency: int, query: str) -> dict:
+    latencies, failures = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(client: httpx.AsyncClient, i: int):
+        nonlocal failures
+        payload = {
+            "session_id": f"bench-{uuid.uuid4().hex}",
+            "query": query or f"Question {i}: summarise the indexed documents.",
+            "include_sources": False,
+        }
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.post(url, json=payload)
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                failures += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=300, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(one(client, i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] if latencies else float("nan")
+    return {
+        "ok": len(latencies),
+        "failed": failures,
+        "seconds": elapsed,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50": statistics.median(latencies) if latencies else float("nan"),
+        "p95": pct(0.95),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000/api/v1/chat/chat")
+    parser.add_argument("--requests", type=int, default=128)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--query", default="", help="Fixed query (default: a distinct query per request).")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.url, args.requests, args.concurrency, args.query))
+    print(f"✅ {result['ok']} ok, ❌ {result['failed']} failed in {result['seconds']:.1f}s")
+    print(f"⚡ {result['rps']:.2f} req/s   p50 {result['p50']:.2f}s   p95 {result['p95']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
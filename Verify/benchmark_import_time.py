@@ -0,0 +1,60 @@
+"""
+Import-time benchmark for the server and CLI entry points.
+
+Each sample imports the module in a fresh interpreter, so nothing is cached between
+runs. Importing must stay cheap and service-free: the RAG engine, vector DB clients and
+models are built lazily (server lifespan / first use), never at import.
+
+Usage:
+    python Verify/benchmark_import_time.py --runs 5
+    python Verify/benchmark_import_time.py --max-seconds 1.5   # exit 1 when over budget (CI guard)
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+MODULES = ["ultimaterag.cli", "ultimaterag.server"]
+
+# Modules that must not be imported just by importing an entry point
+HEAVY_MODULES = ["chromadb", "sklearn", "sentence_transformers", "torch", "psycopg2", "redis",
+                 "uvicorn", "langchain_openai", "ultimaterag.core.rag_engine"]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module: str) -> dict:
+    result = subprocess.run([sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=None, help="Fail if a median exceeds this.")
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'module':<22}{'median s':>10}{'min s':>10}  heavy imports")
+    for module in MODULES:
+        samples = [measure(module) for _ in range(args.runs)]
+        times = [s["seconds"] for s in samples]
+        heavy = sorted({m for s in samples for m in s["heavy"]})
+        median = statistics.median(times)
+        print(f"{module:<22}{median:>10.3f}{min(times):>10.3f}  {', '.join(heavy) or '-'}")
+        if heavy or (args.max_seconds is not None and median > args.max_seconds):
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+CPU throughput of the local embedding engine (needs `pip install "ultimaterag[local]"`).
+
+Reports embeddings/sec for three cases:
+    sequential   one embed_query at a time (no batching possible)
+    concurrent   --threads callers issuing embed_query together (micro-batched)
+    documents    embed_documents in EMBEDDING_LOCAL_BATCH_SIZE slices
+
+Usage:
+    python Verify/benchmark_local_embeddings.py --texts 512 --threads 16
+    python Verify/benchmark_local_embeddings.py --backend onnx --quantize
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ultimaterag.config.settings import settings
+from ultimaterag.LLM.local_embeddings import LocalEmbeddingEngine
+
+
+def make_texts(n: int):
+    return [f"Question {i}: how does retrieval augmented generation handle document {i % 37}?"
+            for i in range(n)]
+
+
+def report(name: str, count: int, seconds: float, engine: LocalEmbeddingEngine):
+    stats = engine.stats()
+    print(f"{name:<12}{count / seconds:>12.1f}{stats['avg_batch_size']:>12.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=settings.EMBEDDING_LOCAL_MODEL)
+    parser.add_argument("--backend", default=settings.EMBEDDING_LOCAL_BACKEND, choices=["torch", "onnx", "openvino"])
+    parser.add_argument("--onnx-file", default=settings.EMBEDDING_LOCAL_ONNX_FILE)
+    parser.add_argument("--quantize", action="store_true", default=settings.EMBEDDING_LOCAL_QUANTIZE)
+    parser.add_argument("--batch-size", type=int, default=settings.EMBEDDING_LOCAL_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=settings.EMBEDDING_LOCAL_MAX_WAIT_MS)
+    parser.add_argument("--texts", type=int, default=256)
+    parser.add_argument("--threads", type=int, default=16)
+    args = parser.parse_args()
+
+    def engine():
+        return LocalEmbeddingEngine(args.model, device="cpu", backend=args.backend, onnx_file=args.onnx_file,
+                                    quantize=args.quantize, batch_size=args.batch_size,
+                                    max_wait_ms=args.max_wait_ms)
+
+    texts = make_texts(args.texts)
+    print(f"{'mode':<12}{'emb/s':>12}{'avg batch':>12}")
+
+    sequential = engine()
+    sequential.embed_documents(texts[:8])  # load + warm up
+    start = time.perf_counter()
+    for text in texts:
+        sequential._encode([text])
+    report("sequential", len(texts), time.perf_counter() - start, sequential)
+
+    concurrent = engine()
+    concurrent._model = sequential._model
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        list(pool.map(concurrent.embed_query, texts))
+    report("concurrent", len(texts), time.perf_counter() - start, concurrent)
+    concurrent.close()
+
+    documents = engine()
+    documents._model = sequential._model
+    start = time.perf_counter()
+    documents.embed_documents(texts)
+    report("documents", len(texts), time.perf_counter() - start, documents)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark PostgresVectorDB bulk insert modes against a local Postgres (pgvector).
+
+Compares rows/sec of the per-row INSERT loop, execute_values and binary COPY.
+Rows go into a TEMP table named `documents`, which shadows the real table for this
+session only, so nothing is written to your data.
+
+Usage:
+    python Verify/benchmark_pg_bulk_insert.py --rows 20000 --dim 1536
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+from pgvector.psycopg2 import register_vector
+from ultimaterag.Database.Connection import db_connection
+from ultimaterag.core.vector_db.postgres import PostgresVectorDB
+
+
+def make_rows(n: int, dim: int):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    return [
+        (f"benchmark chunk {i} " * 20, json.dumps({"source": "bench", "access_level": "common"}),
+         vectors[i].tolist(), None, "common", f"bench-{i}", vectors[i, :3].tolist(), "bench")
+        for i in range(n)
+    ]
+
+
+def run_mode(conn, db: PostgresVectorDB, mode: str, rows, batch_size: int) -> float:
+    with conn.cursor() as cur:
+        cur.execute("TRUNCATE documents")
+    conn.commit()
+
+    start = time.perf_counter()
+    for i in range(0, len(rows), batch_size):
+        db._insert_rows(conn, rows[i:i + batch_size], mode=mode)
+        conn.commit()
+    elapsed = time.perf_counter() - start
+
+    with conn.cursor() as cur:
+        cur.execute("SELECT count(*) FROM documents")
+        count = cur.fetchone()[0]
+    assert count == len(rows), f"{mode}: expected {len(rows)} rows, found {count}"
+    return len(rows) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--batch-size", type=int, default=128)
+    args = parser.parse_args()
+
+    try:
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("CREATE EXTENSION IF NOT EXISTS vector")
+                cur.execute(
+                    f"CREATE TEMP TABLE documents (id bigserial PRIMARY KEY, content text, "
+                    f"metadata jsonb, embedding vector({args.dim}), user_id text, access_level text) "
+                    f"ON COMMIT PRESERVE ROWS"
+                )
+            conn.commit()
+            register_vector(conn)
+
+            db = PostgresVectorDB.__new__(PostgresVectorDB)  # no embedding model needed
+            rows = make_rows(args.rows, args.dim)
+
+            print(f"Rows: {args.rows}  Dim: {args.dim}  Batch: {args.batch_size}")
+            baseline = None
+            for mode in ("row", "values", "copy"):
+                rate = run_mode(conn, db, mode, rows, args.batch_size)
+                baseline = baseline or rate
+                print(f"  {mode:<7} {rate:>10.0f} rows/s   ({rate / baseline:.1f}x)")
+
+            with conn.cursor() as cur:
+                cur.execute("DROP TABLE documents")
+            conn.commit()
+    except ConnectionError as e:
+        print(f"❌ {e} (check POSTGRES_* settings).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark multi-tenant RBAC search latency as the number of tenants grows.
+
+Compares the old filter (metadata->>'user_id' OR metadata->>'access_level' on the JSON
+column) with the compiled filter PostgresVectorDB uses now (typed columns, one UNION ALL
+branch per access rule). Rows go into a TEMP table named `documents`, which shadows the
+real table for this session only, so nothing is written to your data.
+
+Usage:
+    python Verify/benchmark_rbac_search.py --tenants 10,100,1000 --docs-per-tenant 50
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+from pgvector.psycopg2 import register_vector
+from ultimaterag.Database.BulkInsert import copy_rows
+from ultimaterag.Database.Connection import db_connection
+from ultimaterag.Database.Indexes import COMMON_INDEX_NAME, COMMON_PREDICATE, INDEX_NAME, index_ddl
+from ultimaterag.core.vector_db.base import build_access_filter
+from ultimaterag.core.vector_db.postgres import DOCUMENT_COLUMNS, DOCUMENT_COLUMN_TYPES, PostgresVectorDB
+
+LEGACY_SQL = """
+    SELECT content, metadata, (embedding <=> %s) AS distance
+    FROM documents
+    WHERE (metadata->>'user_id' = %s OR metadata->>'access_level' = %s)
+    ORDER BY distance ASC
+    LIMIT %s
+"""
+
+
+def load(conn, tenants: int, per_tenant: int, common: int, dim: int, rng):
+    def rows():
+        for t in range(tenants):
+            meta = json.dumps({"source": "bench", "user_id": f"user-{t}", "access_level": "private"})
+            for v in rng.standard_normal((per_tenant, dim)).astype(np.float32):
+                yield ("tenant chunk", meta, v, f"user-{t}", "private", None)
+        meta = json.dumps({"source": "bench", "access_level": "common"})
+        for v in rng.standard_normal((common, dim)).astype(np.float32):
+            yield ("common chunk", meta, v, None, "common", None)
+
+    with conn.cursor() as cur:
+        cur.execute("TRUNCATE documents")
+        copy_rows(cur, "documents", DOCUMENT_COLUMNS, DOCUMENT_COLUMN_TYPES, rows())
+        cur.execute("ANALYZE documents")
+    conn.commit()
+
+
+def timed(conn, sql: str, params, runs: list) -> int:
+    with conn.cursor() as cur:
+        start = time.perf_counter()
+        cur.execute(sql, params)
+        found = len(cur.fetchall())
+        runs.append((time.perf_counter() - start) * 1000)
+    conn.rollback()
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tenants", default="10,100,1000")
+    parser.add_argument("--docs-per-tenant", type=int, default=50)
+    parser.add_argument("--common", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=4)
+    args = parser.parse_args()
+
+    db = PostgresVectorDB.__new__(PostgresVectorDB)  # no embedding model needed
+    rng = np.random.default_rng(0)
+
+    try:
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("CREATE EXTENSION IF NOT EXISTS vector")
+                cur.execute(
+                    f"CREATE TEMP TABLE documents (id bigserial PRIMARY KEY, content text, metadata jsonb, "
+                    f"embedding vector({args.dim}), user_id text, access_level text, chunk_id text) ON COMMIT PRESERVE ROWS"
+                )
+                cur.execute(index_ddl("hnsw", INDEX_NAME))
+                cur.execute(index_ddl("hnsw", COMMON_INDEX_NAME, where=COMMON_PREDICATE))
+                cur.execute("CREATE INDEX ON documents (user_id) WHERE user_id IS NOT NULL")
+            conn.commit()
+            register_vector(conn)
+
+            print(f"{'tenants':>8} {'rows':>9} {'legacy p50':>11} {'legacy hits':>12} {'typed p50':>10} {'typed hits':>11}")
+            for tenants in (int(t) for t in args.tenants.split(",")):
+                load(conn, tenants, args.docs_per_tenant, args.common, args.dim, rng)
+                legacy, typed, legacy_hits, typed_hits = [], [], 0, 0
+
+                for q in range(args.queries):
+                    user = f"user-{rng.integers(tenants)}"
+                    vector = rng.standard_normal(args.dim).astype(np.float32)
+                    legacy_hits += timed(conn, LEGACY_SQL, (vector, user, "common", args.k), legacy)
+                    sql, params = db._build_search_query(vector, args.k, build_access_filter(user), False)
+                    typed_hits += timed(conn, sql, tuple(params), typed)
+
+                rows = tenants * args.docs_per_tenant + args.common
+                print(f"{tenants:>8} {rows:>9} {np.median(legacy):>9.2f}ms {legacy_hits / args.queries:>12.1f} "
+                      f"{np.median(typed):>8.2f}ms {typed_hits / args.queries:>11.1f}")
+
+            with conn.cursor() as cur:
+                cur.execute("DROP TABLE documents")
+            conn.commit()
+    except ConnectionError as e:
+        print(f"❌ {e} (check POSTGRES_* settings).")
+
+
+if __name__ == "__main__":
+    main()
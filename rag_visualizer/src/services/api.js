@@ -41,4 +41,143 @@ export const chat = async ({ query, sessionId, userId, systemPrompt, temperature
     });
 };
 
+// Streams a chat turn from /chat/stream (Server-Sent Events over POST).
+// Calls onSources(sources) once, onToken(text) per chunk and resolves with the full answer.
+export const chatStream = async ({ query, sessionId, userId, systemPrompt, temperature = 0.7, maxTokens, onSources, onToken }) => {
+    const response = await fetch(`${baseURL}/chat/stream`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            query,
+            session_id: sessionId,
+            user_id: userId,
+            system_prompt: systemPrompt,
+            temperature,
+            max_tokens: maxTokens
+        }),
+    });
+    if (!response.ok) throw new Error(`Stream request failed: ${response.status}`);
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let answer = '';
+
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const frame = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            const event = frame.match(/^event: (.*)$/m)?.[1];
+            const data = JSON.parse(frame.match(/^data: (.*)$/m)?.[1] ?? 'null');
+
+            if (event === 'sources') onSources?.(data);
+            else if (event === 'token') { answer += data; onToken?.(data); }
+            else if (event === 'error') throw new Error(data.error || data.message);
+        }
+    }
+    return answer;
+};
+
+// --- Corpus map (binary pages from /visualization/points) ---
+
+let halfTable = null;
+
+// float16 bit pattern -> float32 value, built once (64K entries)
+const getHalfTable = () => {
+    if (halfTable) return halfTable;
+    halfTable = new Float32Array(65536);
+    for (let h = 0; h < 65536; h++) {
+        const sign = h & 0x8000 ? -1 : 1;
+        const exponent = (h >> 10) & 0x1f;
+        const fraction = h & 0x3ff;
+        if (exponent === 0) halfTable[h] = sign * fraction * 2 ** -24;
+        else if (exponent === 31) halfTable[h] = fraction ? NaN : sign * Infinity;
+        else halfTable[h] = sign * (1 + fraction / 1024) * 2 ** (exponent - 15);
+    }
+    return halfTable;
+};
+
+// Decodes one page (layout documented in ultimaterag/core/visualization.py).
+export const decodePointsPage = (buffer) => {
+    const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+    if (magic !== 'RVZ1') throw new Error('Unexpected visualization page format');
+
+    const headerLength = new DataView(buffer).getUint32(4, true);
+    const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 8, headerLength)));
+    const count = header.count;
+
+    let offset = 8 + headerLength;
+    const halves = new Uint16Array(buffer, offset, count * 3);
+    offset += count * 6 + ((4 - ((count * 6) % 4)) % 4);
+    const labelCodes = new Uint32Array(buffer, offset, count);
+
+    const table = getHalfTable();
+    const positions = new Float32Array(count * 3);
+    for (let i = 0; i < halves.length; i++) positions[i] = table[halves[i]];
+
+    return { ...header, positions, labelCodes };
+};
+
+// Loads every projected chunk in the user's scope, page by page.
+// Resolves with { count, positions: Float32Array (x, y, z per point), labelCodes: Uint32Array,
+// labels, texts?, ids?, projection }. onProgress(loadedCount) is called after each page.
+export const loadCorpusPoints = async ({ userId, pageSize, labelField = 'source', includeText = false,
+                                         includeIds = false, onProgress, signal } = {}) => {
+    const pages = [];
+    const labels = [];
+    const labelIndex = new Map();
+    let cursor = null;
+    let loaded = 0;
+
+    do {
+        const params = new URLSearchParams({ label_field: labelField, include_text: includeText, include_ids: includeIds });
+        if (userId) params.set('user_id', userId);
+        if (pageSize) params.set('limit', pageSize);
+        if (cursor) params.set('cursor', cursor);
+
+        const response = await fetch(`${baseURL}/visualization/points?${params}`, { signal });
+        if (!response.ok) throw new Error(`Points request failed: ${response.status}`);
+        const page = decodePointsPage(await response.arrayBuffer());
+
+        // Page-local label codes -> codes into the combined label list
+        const remap = page.labels.map((label) => {
+            if (!labelIndex.has(label)) {
+                labelIndex.set(label, labels.length);
+                labels.push(label);
+            }
+            return labelIndex.get(label);
+        });
+        page.labelCodes = page.labelCodes.map((code) => remap[code]);
+
+        pages.push(page);
+        loaded += page.count;
+        onProgress?.(loaded);
+        cursor = page.next_cursor;
+    } while (cursor);
+
+    const positions = new Float32Array(loaded * 3);
+    const labelCodes = new Uint32Array(loaded);
+    let offset = 0;
+    for (const page of pages) {
+        positions.set(page.positions, offset * 3);
+        labelCodes.set(page.labelCodes, offset);
+        offset += page.count;
+    }
+
+    return {
+        count: loaded,
+        positions,
+        labelCodes,
+        labels,
+        texts: includeText ? pages.flatMap((page) => page.texts) : undefined,
+        ids: includeIds ? pages.flatMap((page) => page.ids) : undefined,
+        projection: pages.length ? pages[pages.length - 1].projection : null,
+    };
+};
+
 export default api;
@@ -1,9 +1,9 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Literal
 from langchain_core.messages import HumanMessage
-from ultimaterag.core.container import rag_engine
-from ultimaterag.core.workflows.engine import WorkflowEngine
+from ultimaterag.core.container import get_rag_engine
+from ultimaterag.core.concurrency import run_blocking
 from ultimaterag.utils.Response_Helper import make_response
 from ultimaterag.utils.Response_Helper_Model import HTTPStatusCode, APICode
 
@@ -16,6 +16,9 @@ class AgentSearchRequest(BaseModel):
     k: int = Field(5, description="Number of results to return.")
     user_id: Optional[str] = Field(None, description="User ID for RBAC. If None, only common data is searched.")
     filter: Optional[Dict[str, Any]] = Field(None, description="Metadata filter.")
+    search_mode: Optional[Literal["vector", "keyword", "hybrid"]] = Field(
+        None, description="vector (dense), keyword (full-text) or hybrid (both, RRF-fused). Defaults to RETRIEVAL_MODE."
+    )
 
 class AgentSummarizeRequest(BaseModel):
     text: str = Field(..., description="Text to summarize.")
@@ -48,10 +51,13 @@ async def agent_search(request: AgentSearchRequest):
         else:
              filter_criteria["access_level"] = "common"
 
-        docs = rag_engine.vector_manager.similarity_search(
-            query=request.query,
+        engine = await run_blocking(get_rag_engine)
+        docs = await run_blocking(
+            engine.vector_manager.search,
+            request.query,
             k=request.k,
-            filter=filter_criteria
+            filter=filter_criteria,
+            mode=request.search_mode
         )
         
         results = []
@@ -84,7 +90,8 @@ async def agent_summarize(request: AgentSummarizeRequest):
         prompt_text = request.instruction or "Summarize the following text concisely:"
         prompt = f"{prompt_text}\n\n{request.text}"
         
-        response = rag_engine.llm.invoke([HumanMessage(content=prompt)])
+        engine = await run_blocking(get_rag_engine)
+        response = await engine.llm.ainvoke([HumanMessage(content=prompt)])
         summary = response.content
         
         return make_response(
@@ -123,6 +130,11 @@ async def get_tools():
                         "k": {
                             "type": "integer",
                             "description": "Number of results (default 5)."
+                        },
+                        "search_mode": {
+                            "type": "string",
+                            "enum": ["vector", "keyword", "hybrid"],
+                            "description": "Use keyword or hybrid for exact terms like product codes or error IDs."
                         }
                     },
                     "required": ["query"]
@@ -161,17 +173,21 @@ async def get_tools():
 
 class WorkflowRequest(BaseModel):
     query: str
-    workflow_type: str = "self-correcting"
+    workflow_type: str = Field("self-correcting", description="Workflow to run: self-correcting or multi-query")
 
 @router.post("/workflow")
 async def run_workflow(request: WorkflowRequest):
     """
     Run an advanced agentic workflow (e.g. Self-Correcting RAG).
-    Returns the final answer and the trace of steps.
+    Returns the final answer and the trace of steps (per-node time and token usage).
     """
     try:
-        engine = WorkflowEngine()
-        result = engine.run(request.query)
+        # Imported here: the workflow chains pull in most of LangChain, which the rest of the API does not need at startup
+        from ultimaterag.core.workflows.engine import get_workflow_engine
+        # Built on first use (may load the reranker model): off the event loop like the run itself
+        engine = await run_blocking(get_workflow_engine)
+        # Blocking LLM/vector calls run on the thread pool, not the event loop
+        result = await run_blocking(engine.run, request.query, request.workflow_type)
         
         return make_response(
             status=HTTPStatusCode.OK,
@@ -183,6 +199,13 @@ async def run_workflow(request: WorkflowRequest):
                 "final_query": result["question"]
             }
         )
+    except ValueError as e:
+        return make_response(
+            status=HTTPStatusCode.BAD_REQUEST,
+            code=APICode.BAD_REQUEST,
+            message="Invalid workflow request",
+            error=str(e)
+        )
     except Exception as e:
         return make_response(
             status=HTTPStatusCode.INTERNAL_SERVER_ERROR,
@@ -1,7 +1,10 @@
+import json
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any, List
-from ultimaterag.core.container import rag_engine
+from typing import Optional, Dict, Any, List, Literal
+from ultimaterag.core.concurrency import run_blocking
+from ultimaterag.core.container import get_rag_engine
 from ultimaterag.utils.Response_Helper import make_response
 from ultimaterag.utils.Response_Helper_Model import HTTPStatusCode, APICode
 
@@ -16,6 +19,9 @@ class ChatRequest(BaseModel):
     max_tokens: Optional[int] = None
     include_visualization: Optional[bool] = False
     include_sources: Optional[bool] = True
+    search_mode: Optional[Literal["vector", "keyword", "hybrid"]] = Field(
+        None, description="Retrieval mode for context: vector, keyword or hybrid. Defaults to RETRIEVAL_MODE."
+    )
 
 @router.post("/chat")
 async def chat(request: ChatRequest):
@@ -34,24 +40,25 @@ async def chat(request: ChatRequest):
         # Pass extra flags if rag_engine supports them, or handle here.
         # Currently query() returns a dict with keys.
          
-        response_data = rag_engine.query(
-            session_id=request.session_id, 
-            query_text=request.query, 
+        # The first call builds the engine (model clients, DB pools): keep it off the event loop
+        engine = await run_blocking(get_rag_engine)
+        response_data = await engine.aquery(
+            session_id=request.session_id,
+            query_text=request.query,
             system_prompt=request.system_prompt,
             user_id=request.user_id,
-            model_params=model_params
+            model_params=model_params,
+            include_visualization=bool(request.include_visualization),
+            search_mode=request.search_mode
         )
-        
-        # Optimization: Remove visualization if not requested
-        if not request.include_visualization and "visualization" in response_data:
-            del response_data["visualization"]
             
         data = {
             "answer": response_data["content"],
             "session_id": request.session_id,
             "metadata": {
                 "usage": response_data["usage_metadata"],
-                "params": response_data["params"]
+                "params": response_data["params"],
+                "cached": response_data.get("cached", False)
             }
         }
         
@@ -71,3 +78,45 @@ async def chat(request: ChatRequest):
             message="Failed to process chat request",
             error=str(e)
         )
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@router.post("/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Streaming chat over Server-Sent Events.
+
+    Emits a `sources` event with the retrieved chunks, then one `token` event per
+    LLM chunk, then `done`. The full answer is saved to the session history when
+    the stream completes. Errors mid-stream are sent as an `error` event.
+    """
+    model_params = {
+        "temperature": request.temperature,
+        "max_tokens": request.max_tokens
+    }
+    model_params = {k: v for k, v in model_params.items() if v is not None}
+
+    async def event_stream():
+        try:
+            engine = await run_blocking(get_rag_engine)
+            async for item in engine.astream_query(
+                session_id=request.session_id,
+                query_text=request.query,
+                system_prompt=request.system_prompt,
+                user_id=request.user_id,
+                model_params=model_params,
+                include_sources=bool(request.include_sources),
+                search_mode=request.search_mode
+            ):
+                yield _sse(item["event"], item["data"])
+        except Exception as e:
+            yield _sse("error", {"message": "Failed to process chat request", "error": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
@@ -3,12 +3,21 @@ from pydantic import BaseModel
 from typing import Optional
 import os
 import shutil
-from ultimaterag.core.container import rag_engine
+from ultimaterag.core.concurrency import run_blocking
+from ultimaterag.core.container import get_rag_engine
 from ultimaterag.utils.Response_Helper import make_response
 from ultimaterag.utils.Response_Helper_Model import HTTPStatusCode, APICode
 
 router = APIRouter()
 
+
+def _save_and_ingest(upload, tmp_path: str, user_id: Optional[str], access_level: str) -> dict:
+    with open(tmp_path, "wb") as buffer:
+        shutil.copyfileobj(upload, buffer)
+    # Ingest (streamed in bounded batches)
+    return get_rag_engine().ingest_file_with_stats(tmp_path, user_id=user_id, access_level=access_level)
+
+
 @router.post("/upload")
 async def upload_file(
     file: UploadFile = File(...),
@@ -22,17 +31,31 @@ async def upload_file(
     os.makedirs("tmp", exist_ok=True)
     
     try:
-        with open(tmp_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-            
-        # Ingest
-        num_docs = rag_engine.ingest_file(tmp_path, user_id=user_id, access_level=access_level)
-        
+        # Copying a large upload and embedding it is blocking work: keep it off the event loop
+        stats = await run_blocking(_save_and_ingest, file.file, tmp_path, user_id, access_level)
+
         return make_response(
             status=HTTPStatusCode.OK,
             code=APICode.OK,
-            message=f"Successfully ingested {num_docs} chunks from {file.filename}",
-            data={"filename": file.filename, "chunks": num_docs}
+            message=f"Successfully ingested {stats['chunks']} chunks from {file.filename}",
+            data={
+                "filename": file.filename,
+                "chunks": stats["chunks"],
+                "written": stats["written"],
+                "skipped": stats["skipped"],
+                "removed": stats["removed"],
+                "batches": stats["batches"],
+                "seconds": stats["seconds"],
+                "docs_per_sec": stats["docs_per_sec"],
+                "peak_rss_mb": stats["peak_rss_mb"]
+            }
+        )
+    except ValueError as e:
+        return make_response(
+            status=HTTPStatusCode.BAD_REQUEST,
+            code=APICode.BAD_REQUEST,
+            message="Ingestion failed",
+            error=str(e)
         )
     except Exception as e:
         return make_response(
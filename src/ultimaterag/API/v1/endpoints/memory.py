@@ -2,7 +2,8 @@ from fastapi import APIRouter
 from pydantic import BaseModel
 from ultimaterag.utils.Response_Helper import make_response
 from ultimaterag.utils.Response_Helper_Model import HTTPStatusCode, APICode
-from ultimaterag.core.container import rag_engine
+from ultimaterag.core.container import get_rag_engine
+from ultimaterag.core.concurrency import run_blocking
 
 router = APIRouter()
 
@@ -12,7 +13,8 @@ async def clear_memory(session_id: str):
     Clear the chat history for a specific session.
     """
     try:
-        rag_engine.memory_manager.clear_memory(session_id)
+        engine = await run_blocking(get_rag_engine)
+        await run_blocking(engine.memory_manager.clear_memory, session_id)
         
         return make_response(
             status=HTTPStatusCode.OK,
@@ -33,7 +35,8 @@ async def get_history(session_id: str):
     Retrieve chat history for a session.
     """
     try:
-        history = rag_engine.memory_manager.get_history(session_id)
+        engine = await run_blocking(get_rag_engine)
+        history = await run_blocking(engine.memory_manager.get_history, session_id)
         # Serialize history messages if needed, but return_messages=True gives BaseMessage objects.
         # We need to convert to string or dict for JSON response
         formatted_history = []
@@ -72,10 +75,11 @@ async def add_message(session_id: str, request: MemoryRequest):
     Manually add a message to the session memory.
     """
     try:
+        engine = await run_blocking(get_rag_engine)
         if request.type == "human":
-            rag_engine.memory_manager.add_user_message(session_id, request.message)
+            await run_blocking(engine.memory_manager.add_user_message, session_id, request.message)
         elif request.type == "ai":
-            rag_engine.memory_manager.add_ai_message(session_id, request.message)
+            await run_blocking(engine.memory_manager.add_ai_message, session_id, request.message)
         else:
              return make_response(
                 status=HTTPStatusCode.BAD_REQUEST,
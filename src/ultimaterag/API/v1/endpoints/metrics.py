@@ -0,0 +1,44 @@
+from fastapi import APIRouter
+from ultimaterag.utils.Response_Helper import make_response
+from ultimaterag.utils.Response_Helper_Model import HTTPStatusCode, APICode
+
+router = APIRouter()
+
+@router.get("")
+async def get_metrics():
+    """
+    Runtime counters for caches and background subsystems.
+    """
+    try:
+        # Imported per call so the metrics route does not load LangChain / NumPy at server import
+        from ultimaterag.LLM.connection import llm_client_stats
+        from ultimaterag.LLM.embeddings import get_embedding_cache
+        from ultimaterag.LLM.local_embeddings import local_embedding_stats
+        from ultimaterag.core.answer_cache import get_answer_cache
+        from ultimaterag.core.consolidation import get_consolidation_queue
+        from ultimaterag.core.rerank import get_reranker
+
+        reranker = get_reranker()
+        answer_cache = get_answer_cache()
+        data = {
+            "embedding_cache": get_embedding_cache().stats(),
+            "local_embeddings": local_embedding_stats(),
+            "consolidation_queue": get_consolidation_queue().stats(),
+            "reranker": reranker.stats() if reranker is not None else None,
+            "llm_clients": llm_client_stats(),
+            "answer_cache": answer_cache.stats() if answer_cache is not None else None
+        }
+
+        return make_response(
+            status=HTTPStatusCode.OK,
+            code=APICode.OK,
+            message="Metrics retrieved",
+            data=data
+        )
+    except Exception as e:
+        return make_response(
+            status=HTTPStatusCode.INTERNAL_SERVER_ERROR,
+            code=APICode.INTERNAL_SERVER_ERROR,
+            message="Failed to retrieve metrics",
+            error=str(e)
+        )
@@ -0,0 +1,54 @@
+from fastapi import APIRouter, Query, Response
+from typing import Optional
+from ultimaterag.config.settings import settings
+from ultimaterag.core.container import get_rag_engine
+from ultimaterag.core.concurrency import run_blocking
+from ultimaterag.core.visualization import MEDIA_TYPE, encode_points_page
+from ultimaterag.utils.Response_Helper import make_response
+from ultimaterag.utils.Response_Helper_Model import HTTPStatusCode, APICode
+
+router = APIRouter()
+
+@router.get("/points")
+async def export_points(
+    user_id: Optional[str] = Query(None, description="User ID for RBAC. If None, only common data is exported."),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page; omit for the first page."),
+    limit: int = Query(settings.VISUALIZATION_PAGE_SIZE, ge=1, le=settings.VISUALIZATION_MAX_PAGE_SIZE),
+    label_field: str = Query("source", description="Metadata field used to label (color) points."),
+    include_text: bool = Query(False, description="Add a 100-character snippet per point."),
+    include_ids: bool = Query(False, description="Add chunk IDs."),
+):
+    """
+    One page of the corpus map: projected 3D coordinates of every chunk in the scope,
+    as a compact binary page (float16 coordinates, dictionary-encoded labels; layout in
+    ultimaterag.core.visualization). Follow X-Next-Cursor until it is empty.
+    """
+    try:
+        engine = await run_blocking(get_rag_engine)
+        page = await run_blocking(engine.vector_manager.export_points,
+                                  user_id=user_id, cursor=cursor, limit=limit)
+        body = await run_blocking(encode_points_page, page, label_field=label_field,
+                                  include_text=include_text, include_ids=include_ids)
+        return Response(
+            content=body,
+            media_type=MEDIA_TYPE,
+            headers={
+                "X-Next-Cursor": page["next_cursor"] or "",
+                "X-Point-Count": str(len(page["ids"])),
+                "X-Projection": page["projection"],
+            }
+        )
+    except ValueError as e:
+        return make_response(
+            status=HTTPStatusCode.BAD_REQUEST,
+            code=APICode.BAD_REQUEST,
+            message="Invalid export request",
+            error=str(e)
+        )
+    except Exception as e:
+        return make_response(
+            status=HTTPStatusCode.INTERNAL_SERVER_ERROR,
+            code=APICode.INTERNAL_SERVER_ERROR,
+            message="Failed to export visualization points",
+            error=str(e)
+        )
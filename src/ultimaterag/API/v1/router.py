@@ -1,4 +1,4 @@
-from ultimaterag.API.v1.endpoints import ingest, chat, memory, agent
+from ultimaterag.API.v1.endpoints import ingest, chat, memory, agent, metrics, visualization
 from fastapi import APIRouter
 
 api_router = APIRouter()
@@ -7,3 +7,5 @@ api_router.include_router(ingest.router, prefix="/ingest", tags=["Ingestion"])
 api_router.include_router(chat.router, prefix="/chat", tags=["Chat"])
 api_router.include_router(memory.router, prefix="/memory", tags=["Memory"])
 api_router.include_router(agent.router, prefix="/agent", tags=["Agent"])
+api_router.include_router(metrics.router, prefix="/metrics", tags=["Metrics"])
+api_router.include_router(visualization.router, prefix="/visualization", tags=["Visualization"])
@@ -0,0 +1,116 @@
+import io
+import json
+import struct
+from typing import Any, Iterable, Iterator, List, Sequence
+
+import numpy as np
+from psycopg2 import sql
+from psycopg2.extras import execute_values
+
+# PGCOPY binary format: signature, flags, header extension length.
+COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+COPY_TRAILER = struct.pack("!h", -1)
+
+
+def _encode_text(value: Any) -> bytes:
+    return str(value).encode("utf-8")
+
+
+def _encode_jsonb(value: Any) -> bytes:
+    # jsonb binary format = version byte (1) + json text
+    text = value if isinstance(value, str) else json.dumps(value)
+    return b"\x01" + text.encode("utf-8")
+
+
+def _encode_vector(value: Any) -> bytes:
+    # pgvector binary format = int16 dim, int16 unused, float32[dim] (network byte order)
+    arr = np.asarray(value, dtype=">f4")
+    return struct.pack("!HH", arr.shape[0], 0) + arr.tobytes()
+
+
+FLOAT4_OID = 700
+
+
+def _encode_float4_array(value: Any) -> bytes:
+    # real[] binary format = ndim, has-nulls flag, element OID, (length, lower bound),
+    # then int32 length + float32 per element
+    arr = np.asarray(value, dtype=np.float32).ravel()
+    elements = np.empty(arr.shape[0], dtype=[("length", ">i4"), ("value", ">f4")])
+    elements["length"] = 4
+    elements["value"] = arr
+    return struct.pack("!iiiii", 1, 0, FLOAT4_OID, arr.shape[0], 1) + elements.tobytes()
+
+
+ENCODERS = {
+    "text": _encode_text,
+    "jsonb": _encode_jsonb,
+    "vector": _encode_vector,
+    "float4[]": _encode_float4_array,
+}
+
+
+def encode_copy_binary(rows: Iterable[Sequence[Any]], types: Sequence[str]) -> Iterator[bytes]:
+    """
+    Encode rows as a PGCOPY binary stream, one bytes object per row (plus header/trailer).
+    `types` names the encoder for each column (see ENCODERS); None values become NULL.
+    """
+    encoders = [ENCODERS[t] for t in types]
+    field_count = struct.pack("!h", len(encoders))
+
+    yield COPY_HEADER
+    for row in rows:
+        parts = [field_count]
+        for encode, value in zip(encoders, row):
+            if value is None:
+                parts.append(struct.pack("!i", -1))
+                continue
+            data = encode(value)
+            parts.append(struct.pack("!i", len(data)))
+            parts.append(data)
+        yield b"".join(parts)
+    yield COPY_TRAILER
+
+
+class _StreamReader(io.RawIOBase):
+    """File-like view over a bytes generator, so COPY pulls rows as it sends them."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._buffer = bytearray()
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            try:
+                self._buffer += next(self._chunks)
+            except StopIteration:
+                break
+        if size < 0 or size >= len(self._buffer):
+            data, self._buffer = bytes(self._buffer), bytearray()
+        else:
+            data = bytes(self._buffer[:size])
+            del self._buffer[:size]
+        return data
+
+
+def copy_rows(cur, table: str, columns: List[str], types: Sequence[str], rows: Iterable[Sequence[Any]]):
+    """
+    Stream rows into `table` with `COPY ... FROM STDIN WITH (FORMAT BINARY)`.
+    """
+    statement = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT BINARY)").format(
+        sql.Identifier(table), sql.SQL(", ").join(map(sql.Identifier, columns))
+    )
+    cur.copy_expert(statement.as_string(cur), _StreamReader(encode_copy_binary(rows, types)))
+
+
+def values_insert(cur, table: str, columns: List[str], rows: Iterable[Sequence[Any]],
+                  template: str = None, page_size: int = 500, suffix: str = ""):
+    """
+    Multi-row `INSERT ... VALUES (...), (...)` via psycopg2's execute_values.
+    """
+    statement = sql.SQL("INSERT INTO {} ({}) VALUES %s").format(
+        sql.Identifier(table), sql.SQL(", ").join(map(sql.Identifier, columns))
+    ).as_string(cur) + suffix
+    execute_values(cur, statement, list(rows), template=template, page_size=page_size)
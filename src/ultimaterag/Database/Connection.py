@@ -1,25 +1,35 @@
 import psycopg2
 import os
 import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from psycopg2 import extensions as pg_ext
+from pgvector.psycopg2 import register_vector
 from dotenv import load_dotenv
 from ultimaterag.config.settings import settings
 load_dotenv()
 
 
+def _conn_params() -> dict:
+    return {
+        "host": settings.POSTGRES_HOST,
+        "database": settings.POSTGRES_DB,
+        "user": settings.POSTGRES_USER,
+        "password": settings.POSTGRES_PASSWORD,
+        "port": settings.POSTGRES_PORT
+    }
+
 
 def get_db_connection():
+    """
+    Open a standalone connection (caller closes it).
+    Prefer `db_connection()`, which borrows from the process-wide pool.
+    """
     conn = None
     try:
-        # Define connection parameters (replace placeholders)
-        conn_params = {
-            "host": settings.POSTGRES_HOST,
-            "database": settings.POSTGRES_DB,
-            "user": settings.POSTGRES_USER,
-            "password": settings.POSTGRES_PASSWORD,
-            "port": settings.POSTGRES_PORT
-        }
-
-        conn = psycopg2.connect(**conn_params)
+        conn = psycopg2.connect(**_conn_params())
         if conn.closed == 0:
             pass # Silent success
             # print("PostgreSQL connected successfully ✅")
@@ -27,9 +37,203 @@ def get_db_connection():
     except (Exception, psycopg2.DatabaseError) as error:
         # print(f"An error occurred: {error}")
         return None
-    
+
     return conn
 
+
+class PooledConnection(pg_ext.connection):
+    """psycopg2 connection carrying pool bookkeeping."""
+    vector_registered = False
+    last_used = 0.0
+
+
+class ConnectionPool:
+    """
+    Thread-safe PostgreSQL connection pool.
+
+    - Keeps between `minconn` and `maxconn` connections; callers block (up to `timeout`)
+      when all are busy instead of failing.
+    - Health checks: closed/broken connections are replaced, and connections idle
+      longer than `ping_interval` seconds are pinged before being handed out.
+    - pgvector types are registered once per connection, not once per query.
+    """
+
+    def __init__(self, minconn: int, maxconn: int, timeout: float, ping_interval: float, **conn_params):
+        self.minconn = minconn
+        self.maxconn = max(maxconn, minconn, 1)
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self.pid = os.getpid()
+        self.closed = False
+        self._params = conn_params
+        self._idle: deque = deque()
+        self._size = 0
+        self._cond = threading.Condition()
+
+        for _ in range(self.minconn):
+            self._idle.append(self._connect())
+            self._size += 1
+
+    def _connect(self) -> PooledConnection:
+        conn = psycopg2.connect(connection_factory=PooledConnection, **self._params)
+        conn.last_used = time.monotonic()
+        self._register_types(conn)
+        return conn
+
+    def _register_types(self, conn: PooledConnection):
+        if conn.vector_registered:
+            return
+        try:
+            register_vector(conn)
+            conn.vector_registered = True
+        except psycopg2.ProgrammingError:
+            # Extension not created yet (fresh database); retried on next checkout.
+            pass
+        finally:
+            conn.rollback()
+
+    def _is_healthy(self, conn: PooledConnection) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - conn.last_used < self.ping_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _release_slot(self):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def getconn(self) -> PooledConnection:
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self.closed:
+                    raise ConnectionError("PostgreSQL connection pool is closed")
+                if self._idle:
+                    conn = self._idle.pop()  # LIFO: reuse the warmest connection
+                    break
+                if self._size < self.maxconn:
+                    self._size += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise ConnectionError(f"Timed out after {self.timeout}s waiting for a PostgreSQL connection")
+                self._cond.wait(remaining)
+
+        try:
+            if conn is not None and not self._is_healthy(conn):
+                conn.close()
+                conn = None
+            if conn is None:
+                conn = self._connect()
+            self._register_types(conn)
+            return conn
+        except Exception:
+            if conn is not None and not conn.closed:
+                conn.close()
+            self._release_slot()
+            raise
+
+    def putconn(self, conn: PooledConnection):
+        if not conn.closed and not self.closed:
+            status = conn.info.transaction_status
+            if status == pg_ext.TRANSACTION_STATUS_UNKNOWN:
+                conn.close()
+            elif status != pg_ext.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+
+        if conn.closed or self.closed:
+            if not conn.closed:
+                conn.close()
+            self._release_slot()
+            return
+
+        conn.last_used = time.monotonic()
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def closeall(self):
+        with self._cond:
+            self.closed = True
+            while self._idle:
+                self._idle.pop().close()
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"size": self._size, "idle": len(self._idle), "in_use": self._size - len(self._idle),
+                    "min": self.minconn, "max": self.maxconn}
+
+
+_pool: ConnectionPool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """
+    Process-wide pool, created on first use (and re-created in a forked child).
+    """
+    global _pool
+    if _pool is not None and not _pool.closed and _pool.pid == os.getpid():
+        return _pool
+    with _pool_lock:
+        if _pool is None or _pool.closed or _pool.pid != os.getpid():
+            try:
+                _pool = ConnectionPool(
+                    settings.POSTGRES_POOL_MIN,
+                    settings.POSTGRES_POOL_MAX,
+                    timeout=settings.POSTGRES_POOL_TIMEOUT,
+                    ping_interval=settings.POSTGRES_POOL_PING_INTERVAL,
+                    **_conn_params()
+                )
+            except psycopg2.Error as e:
+                raise ConnectionError(f"Failed to connect to PostgreSQL: {e}") from e
+        return _pool
+
+
+def close_pool():
+    """Close every pooled connection (e.g. on application shutdown)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool.pid == os.getpid() and not _pool.closed:
+            _pool.closeall()
+        _pool = None
+
+
+@contextmanager
+def db_connection():
+    """
+    Borrow a pooled connection. Uncommitted work is rolled back when the block exits.
+
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                ...
+            conn.commit()
+    """
+    pool = get_pool()
+    try:
+        conn = pool.getconn()
+    except psycopg2.Error as e:
+        raise ConnectionError(f"Failed to connect to PostgreSQL: {e}") from e
+    try:
+        yield conn
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn)
+
+
 if __name__ == '__main__':
     conn = get_db_connection()
     if conn:
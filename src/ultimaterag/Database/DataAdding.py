@@ -1,40 +1,27 @@
-from sentence_transformers import SentenceTransformer
-from ultimaterag.Database.Connection import get_db_connection
+from ultimaterag.Database.Connection import db_connection
+from ultimaterag.LLM.local_embeddings import get_local_embedding_engine
 
-# Load embedding model
-model = SentenceTransformer('all-MiniLM-L6-v2')
 
 def add_data(content: str):
     """
     Generates an embedding for the content and stores it in the database.
     """
-    conn = get_db_connection()
-    if conn is None:
-        return
-
     try:
         # Generate embedding
-        embedding = model.encode(content).tolist()
-        
-        cursor = conn.cursor()
-        
-        # Insert into database
-        cursor.execute(
-            "INSERT INTO documents (content, embedding) VALUES (%s, %s)",
-            (content, embedding)
-        )
-        
-        conn.commit()
+        embedding = get_local_embedding_engine().embed_query(content)
+
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                # Insert into database
+                cursor.execute(
+                    "INSERT INTO documents (content, embedding) VALUES (%s, %s)",
+                    (content, embedding)
+                )
+            conn.commit()
         print(f"✅ Added document: '{content[:30]}...'")
-        
-        cursor.close()
-        conn.close()
 
     except Exception as e:
         print(f"❌ Error adding data: {e}")
-        if conn:
-            conn.rollback()
-            conn.close()
 
 if __name__ == "__main__":
     # Test adding data
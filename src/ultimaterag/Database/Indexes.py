@@ -0,0 +1,239 @@
+"""
+ANN index management for documents.embedding (pgvector HNSW / IVFFlat).
+
+Cosine operator classes are used to match the `<=>` ordering in PostgresVectorDB.
+"""
+import time
+from contextlib import contextmanager
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from ultimaterag.config.settings import settings
+from ultimaterag.Database.Connection import db_connection
+
+INDEX_NAME = "documents_embedding_idx"
+COMMON_INDEX_NAME = "documents_embedding_common_idx"
+COMMON_PREDICATE = "access_level = 'common'"
+INDEX_METHODS = ("hnsw", "ivfflat", "none")
+
+# Every ANN index on documents.embedding as (name, partial-index predicate). The partial
+# index serves the "common" branch of RBAC searches without scanning private rows.
+ANN_INDEXES = [(INDEX_NAME, None), (COMMON_INDEX_NAME, COMMON_PREDICATE)]
+
+
+def index_ddl(method: str, name: str = INDEX_NAME, concurrently: bool = False,
+              m: Optional[int] = None, ef_construction: Optional[int] = None,
+              lists: Optional[int] = None, where: Optional[str] = None) -> str:
+    """CREATE INDEX statement for the given method, using settings for unset parameters."""
+    method = method.lower()
+    concurrent = "CONCURRENTLY " if concurrently else ""
+    if method == "hnsw":
+        options = (f"m = {int(m or settings.PG_HNSW_M)}, "
+                   f"ef_construction = {int(ef_construction or settings.PG_HNSW_EF_CONSTRUCTION)}")
+    elif method == "ivfflat":
+        options = f"lists = {int(lists or settings.PG_IVFFLAT_LISTS)}"
+    else:
+        raise ValueError(f"Unsupported index method: {method} (expected hnsw or ivfflat)")
+    partial = f" WHERE {where}" if where else ""
+    return (f"CREATE INDEX {concurrent}IF NOT EXISTS {name} ON documents "
+            f"USING {method} (embedding vector_cosine_ops) WITH ({options}){partial}")
+
+
+def search_params(k: int, ef_search: Optional[int] = None, probes: Optional[int] = None,
+                  method: Optional[str] = None) -> List[Tuple[str, int]]:
+    """
+    Per-query planner settings (applied with SET LOCAL) for the configured index.
+    Explicit `ef_search` / `probes` always apply; otherwise the configured defaults do.
+    """
+    method = (method or settings.PG_INDEX_METHOD).lower()
+    params = []
+    if ef_search is not None or method == "hnsw":
+        # HNSW returns at most ef_search rows, so keep it >= k (pgvector caps it at 1000).
+        params.append(("hnsw.ef_search", min(max(int(ef_search or settings.PG_HNSW_EF_SEARCH), k), 1000)))
+    if probes is not None or method == "ivfflat":
+        params.append(("ivfflat.probes", int(probes or settings.PG_IVFFLAT_PROBES)))
+    return params
+
+
+@contextmanager
+def _autocommit_connection():
+    # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction block.
+    with db_connection() as conn:
+        conn.autocommit = True
+        try:
+            yield conn
+        finally:
+            conn.autocommit = False
+
+
+def _index_validity(cur, name: str) -> Optional[bool]:
+    # None: no such index; False: left invalid by an interrupted concurrent build
+    cur.execute("SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE c.relname = %s", (name,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def index_is_valid(cur, name: str) -> bool:
+    """Whether index `name` exists and is usable (e.g. by ON CONFLICT)."""
+    return bool(_index_validity(cur, name))
+
+
+def create_index_concurrently(name: str, definition: str, unique: bool = False) -> str:
+    """
+    CREATE [UNIQUE] INDEX CONCURRENTLY `name` ON documents `definition`, without blocking
+    writes. An invalid leftover from an interrupted build is dropped and rebuilt.
+    """
+    with _autocommit_connection() as conn:
+        with conn.cursor() as cur:
+            valid = _index_validity(cur, name)
+            if valid:
+                return "exists"
+            if valid is not None:
+                cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            cur.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX CONCURRENTLY IF NOT EXISTS {name} "
+                        f"ON documents {definition}")
+            return "created"
+
+
+def index_status() -> List[dict]:
+    """Vector indexes on `documents` with their access method, definition, validity and size."""
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT c.relname, a.amname, pg_get_indexdef(i.indexrelid), i.indisvalid,
+                       pg_size_pretty(pg_relation_size(i.indexrelid))
+                FROM pg_index i
+                JOIN pg_class c ON c.oid = i.indexrelid
+                JOIN pg_am a ON a.oid = c.relam
+                WHERE i.indrelid = 'documents'::regclass AND a.amname IN ('hnsw', 'ivfflat')
+                ORDER BY c.relname
+            """)
+            return [
+                {"name": name, "method": method, "definition": definition, "valid": valid, "size": size}
+                for name, method, definition, valid, size in cur.fetchall()
+            ]
+
+
+def build_index(method: Optional[str] = None, concurrently: bool = True, rebuild: bool = False,
+                maintenance_work_mem: Optional[str] = None, **options) -> dict:
+    """
+    Create (or with `rebuild`, replace) the ANN indexes in ANN_INDEXES.
+
+    A rebuild builds each new index under a temporary name and then swaps it in, so
+    searches keep using the old index until the new one is ready. With `concurrently`,
+    writes are not blocked during the build either. An existing index of another method
+    is reported as "mismatch" (in `mismatched`, with its method) and kept unless `rebuild`.
+    """
+    from ultimaterag.Database.Schema import complete_task, ensure_schema
+
+    method = (method or settings.PG_INDEX_METHOD).lower()
+    if method not in INDEX_METHODS:
+        raise ValueError(f"Unsupported index method: {method} (expected one of {', '.join(INDEX_METHODS)})")
+    ensure_schema(report_pending=False)
+    concurrent = "CONCURRENTLY " if concurrently else ""
+    existing = {ix["name"]: ix for ix in index_status()}
+    actions, mismatched = {}, {}
+
+    start = time.perf_counter()
+    with _autocommit_connection() as conn:
+        with conn.cursor() as cur:
+            if maintenance_work_mem:
+                cur.execute("SET maintenance_work_mem = %s", (maintenance_work_mem,))
+
+            for name, where in ANN_INDEXES:
+                current = existing.get(name)
+                if method == "none":
+                    cur.execute(f"DROP INDEX {concurrent}IF EXISTS {name}")
+                    actions[name] = "dropped"
+                    continue
+
+                if current and current["valid"] and not rebuild:
+                    if current["method"] != method:
+                        actions[name] = "mismatch"
+                        mismatched[name] = current["method"]
+                    else:
+                        actions[name] = "exists"
+                    continue
+
+                if current and not current["valid"]:
+                    # Leftover from an interrupted concurrent build.
+                    cur.execute(f"DROP INDEX {concurrent}IF EXISTS {name}")
+                    current = None
+
+                if current is None:
+                    cur.execute(index_ddl(method, name, concurrently, where=where, **options))
+                    actions[name] = "created"
+                else:
+                    tmp_name = f"{name}_new"
+                    cur.execute(f"DROP INDEX {concurrent}IF EXISTS {tmp_name}")
+                    cur.execute(index_ddl(method, tmp_name, concurrently, where=where, **options))
+                    cur.execute(f"DROP INDEX {concurrent}IF EXISTS {name}")
+                    cur.execute(f"ALTER INDEX {tmp_name} RENAME TO {name}")
+                    actions[name] = "rebuilt"
+
+            cur.execute("ANALYZE documents")
+
+    # Any index build deferred by a migration is now done
+    complete_task("ann_indexes")
+    return {"method": method, "indexes": actions, "mismatched": mismatched,
+            "seconds": round(time.perf_counter() - start, 2)}
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    return round(float(np.percentile(values, pct)), 2) if values else 0.0
+
+
+def benchmark_recall(k: int = 10, queries: int = 50, sweep: Optional[Iterable[int]] = None,
+                     method: Optional[str] = None) -> List[dict]:
+    """
+    Recall@k and latency of ANN search against exact (sequential scan) search.
+
+    Query vectors are sampled from stored embeddings, so no embedding model is needed.
+    `sweep` lists the ef_search (HNSW) or probes (IVFFlat) values to try.
+    """
+    method = (method or settings.PG_INDEX_METHOD).lower()
+    if method not in ("hnsw", "ivfflat"):
+        raise ValueError("Benchmark needs an hnsw or ivfflat index")
+    if sweep is None:
+        sweep = (10, 20, 40, 80, 160, 320) if method == "hnsw" else (1, 5, 10, 20, 50, 100)
+    knob = "ef_search" if method == "hnsw" else "probes"
+
+    sql = "SELECT id FROM documents ORDER BY embedding <=> %s LIMIT %s"
+    results = []
+
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT embedding FROM documents ORDER BY random() LIMIT %s", (queries,))
+            vectors = [np.asarray(row[0]) for row in cur.fetchall()]
+        conn.rollback()
+        if not vectors:
+            raise ValueError("The documents table is empty")
+
+        def run(settings_sql: List[str]):
+            ids, latencies = [], []
+            for vector in vectors:
+                with conn.cursor() as cur:
+                    for statement in settings_sql:
+                        cur.execute(statement)
+                    started = time.perf_counter()
+                    cur.execute(sql, (vector, k))
+                    rows = cur.fetchall()
+                    latencies.append((time.perf_counter() - started) * 1000)
+                conn.rollback()  # ends the transaction, resetting SET LOCAL
+                ids.append({row[0] for row in rows})
+            return ids, latencies
+
+        exact_ids, exact_latency = run(["SET LOCAL enable_indexscan = off"])
+        results.append({"mode": "exact", "recall": 1.0,
+                        "p50_ms": _percentile(exact_latency, 50), "p95_ms": _percentile(exact_latency, 95)})
+
+        for value in sweep:
+            settings_sql = [f"SET LOCAL {name} = {val}"
+                            for name, val in search_params(k, method=method, **{knob: value})]
+            ann_ids, latency = run(settings_sql)
+            recall = np.mean([len(a & e) / max(len(e), 1) for a, e in zip(ann_ids, exact_ids)])
+            results.append({"mode": f"{knob}={value}", "recall": round(float(recall), 4),
+                            "p50_ms": _percentile(latency, 50), "p95_ms": _percentile(latency, 95)})
+
+    return results
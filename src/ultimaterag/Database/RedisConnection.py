@@ -0,0 +1,68 @@
+import os
+import threading
+from typing import Optional
+import redis
+import redis.asyncio as aredis
+from ultimaterag.config.settings import settings
+
+_client: Optional[redis.Redis] = None
+_async_client: Optional[aredis.Redis] = None
+_pid: Optional[int] = None
+_lock = threading.Lock()
+
+
+def _reset_if_forked():
+    # Caller holds _lock. Sockets inherited from a parent process must not be reused.
+    global _client, _async_client, _pid
+    if _pid != os.getpid():
+        _client = None
+        _async_client = None
+        _pid = os.getpid()
+
+
+def get_redis_client() -> redis.Redis:
+    """
+    Process-wide Redis client backed by one connection pool (max REDIS_MAX_CONNECTIONS).
+    Safe to share between threads.
+    """
+    global _client
+    with _lock:
+        _reset_if_forked()
+        if _client is None:
+            pool = redis.ConnectionPool.from_url(
+                settings.REDIS_URL,
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+                health_check_interval=30,
+            )
+            _client = redis.Redis(connection_pool=pool)
+        return _client
+
+
+def get_async_redis_client() -> aredis.Redis:
+    """Process-wide asyncio Redis client for use from the server's event loop."""
+    global _async_client
+    with _lock:
+        _reset_if_forked()
+        if _async_client is None:
+            pool = aredis.ConnectionPool.from_url(
+                settings.REDIS_URL,
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+                health_check_interval=30,
+            )
+            _async_client = aredis.Redis(connection_pool=pool)
+        return _async_client
+
+
+async def close_redis_clients():
+    """Release pooled Redis connections (e.g. on application shutdown)."""
+    global _client, _async_client
+    with _lock:
+        client, async_client = _client, _async_client
+        _client = _async_client = None
+        owned = _pid == os.getpid()
+    if not owned:
+        return
+    if client is not None:
+        client.connection_pool.disconnect()
+    if async_client is not None:
+        await async_client.aclose()
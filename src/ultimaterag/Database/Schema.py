@@ -0,0 +1,365 @@
+"""
+Versioned PostgreSQL schema for the pgvector backend.
+
+Each migration runs once and is recorded in `schema_migrations`. Add new changes as a
+new `@migration(<next version>, "...")` function; never edit one that has shipped.
+
+Migrations run at startup in every process (behind an advisory lock), so they must stay
+cheap: catalog-only DDL, or work on an empty table. Anything that scales with the table
+(backfills, index builds) is queued with `defer_task` when `documents` has rows, listed
+in `schema_tasks`, and run online by `ultimaterag migrate` (batched updates, indexes
+built CONCURRENTLY) while the application keeps serving.
+"""
+import threading
+from typing import Callable, Dict, List, Tuple
+from ultimaterag.config.settings import settings
+from ultimaterag.Database.Connection import db_connection
+
+# pg_advisory_xact_lock key: serializes migrations across workers/processes
+SCHEMA_LOCK_KEY = 7263540012
+
+MIGRATIONS: List[Tuple[int, str, Callable]] = []
+
+# Online maintenance tasks in run order: name -> func(batch_size) returning True when done
+TASKS: Dict[str, Callable[[int], bool]] = {}
+
+
+def migration(version: int, name: str):
+    def register(func: Callable):
+        MIGRATIONS.append((version, name, func))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return func
+    return register
+
+
+def task(name: str):
+    def register(func: Callable[[int], bool]):
+        TASKS[name] = func
+        return func
+    return register
+
+
+def defer_task(cur, name: str):
+    """Queue an online task for `ultimaterag migrate` (inside the migration transaction)."""
+    cur.execute("INSERT INTO schema_tasks (name) VALUES (%s) "
+                "ON CONFLICT (name) DO UPDATE SET completed_at = NULL", (name,))
+
+
+def _table_is_empty(cur) -> bool:
+    cur.execute("SELECT EXISTS (SELECT 1 FROM documents)")
+    return not cur.fetchone()[0]
+
+
+def _batched_update(assignments: str, condition: str, batch_size: int) -> int:
+    """
+    UPDATE documents SET `assignments` WHERE `condition`, one committed id range at a
+    time, so row locks and WAL stay bounded and writers are never blocked for long.
+    """
+    last_id, updated = 0, 0
+    while True:
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT max(id) FROM (SELECT id FROM documents WHERE id > %s "
+                            "ORDER BY id LIMIT %s) page", (last_id, batch_size))
+                upto = cur.fetchone()[0]
+                if upto is None:
+                    conn.rollback()
+                    return updated
+                cur.execute(f"UPDATE documents SET {assignments} WHERE id > %s AND id <= %s AND ({condition})",
+                            (last_id, upto))
+                updated += cur.rowcount
+            conn.commit()
+        last_id = upto
+
+
+@migration(1, "documents and long_term_memories tables")
+def _create_tables(cur):
+    cur.execute("CREATE EXTENSION IF NOT EXISTS vector")
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS documents (
+            id BIGSERIAL PRIMARY KEY,
+            content TEXT NOT NULL,
+            metadata JSONB NOT NULL DEFAULT '{{}}'::jsonb,
+            embedding VECTOR({int(settings.EMBEDDING_DIMENSION)}),
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS long_term_memories (
+            id BIGSERIAL PRIMARY KEY,
+            session_id TEXT NOT NULL,
+            summary_chunk TEXT,
+            key_concepts JSONB,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS long_term_memories_session_idx ON long_term_memories (session_id)")
+
+
+def _create_ann_index(cur, name: str, where: str = None):
+    from ultimaterag.Database.Indexes import index_ddl
+
+    method = settings.PG_INDEX_METHOD.lower()
+    if method == "none":
+        return
+    # HNSW on an empty table is instant and then maintained on insert. On a populated
+    # table the build takes minutes and blocks writes, and IVFFlat needs rows for its
+    # centroids: both are left to the online task (CONCURRENTLY, retried until built).
+    if method == "hnsw" and _table_is_empty(cur):
+        cur.execute(index_ddl(method, name, where=where))
+    else:
+        defer_task(cur, "ann_indexes")
+@migration(2, "ANN index on documents.embedding")
+def _create_embedding_index(cur):
+    from ultimaterag.Database.Indexes import INDEX_NAME
+    _create_ann_index(cur, INDEX_NAME)
+
+
+# Plain indexes on the typed RBAC columns as (name, definition)
+RBAC_INDEXES = [
+    ("documents_user_id_idx", "(user_id) WHERE user_id IS NOT NULL"),
+    ("documents_access_level_idx", "(access_level)"),
+]
+
+
+@migration(3, "typed RBAC columns and indexes on documents")
+def _promote_rbac_columns(cur):
+    from ultimaterag.Database.Indexes import COMMON_INDEX_NAME, COMMON_PREDICATE
+
+    # RBAC fields were only in metadata JSON, which no index can serve alongside
+    # the vector ordering. Typed columns let each access branch use its own index.
+    # Both ADD COLUMNs are catalog-only (nullable / constant default).
+    cur.execute("ALTER TABLE documents ADD COLUMN IF NOT EXISTS user_id TEXT")
+    cur.execute("ALTER TABLE documents ADD COLUMN IF NOT EXISTS access_level TEXT NOT NULL DEFAULT 'private'")
+    if _table_is_empty(cur):
+        for name, definition in RBAC_INDEXES:
+            cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON documents {definition}")
+    else:
+        # Until backfilled, existing rows carry the column defaults, so PostgresVectorDB
+        # filters RBAC on metadata JSON while this task is pending
+        defer_task(cur, "rbac_backfill")
+    _create_ann_index(cur, COMMON_INDEX_NAME, where=COMMON_PREDICATE)
+
+
+@task("rbac_backfill")
+def _backfill_rbac_columns(batch_size: int) -> bool:
+    from ultimaterag.Database.Indexes import create_index_concurrently
+
+    updated = _batched_update(
+        "user_id = metadata->>'user_id', access_level = COALESCE(metadata->>'access_level', 'private')",
+        "(metadata ? 'user_id' OR metadata ? 'access_level') AND "
+        "(user_id IS DISTINCT FROM metadata->>'user_id' "
+        "OR access_level <> COALESCE(metadata->>'access_level', 'private'))",
+        batch_size,
+    )
+    print(f"🛠️ Backfilled RBAC columns on {updated} rows")
+    for name, definition in RBAC_INDEXES:
+        create_index_concurrently(name, definition)
+    return True
+
+
+TSV_INDEX = ("documents_content_tsv_idx", "USING gin (content_tsv)")
+
+
+def _text_search_config(cur) -> str:
+    # Schema-qualified, as tsvector_update_trigger requires
+    cur.execute("SELECT n.nspname || '.' || c.cfgname FROM pg_ts_config c "
+                "JOIN pg_namespace n ON n.oid = c.cfgnamespace WHERE c.oid = %s::regconfig",
+                (settings.PG_TEXT_SEARCH_CONFIG,))
+    return cur.fetchone()[0]
+
+
+@migration(4, "full-text search column and GIN index on documents")
+def _add_full_text_search(cur):
+    # A plain column kept in sync by a trigger, so no insert path needs to change. (A
+    # STORED generated column would rewrite the whole table under an exclusive lock.)
+    config = _text_search_config(cur)
+    cur.execute("ALTER TABLE documents ADD COLUMN IF NOT EXISTS content_tsv TSVECTOR")
+    cur.execute("DROP TRIGGER IF EXISTS documents_content_tsv_update ON documents")
+    cur.execute(f"""
+        CREATE TRIGGER documents_content_tsv_update
+        BEFORE INSERT OR UPDATE OF content ON documents
+        FOR EACH ROW EXECUTE FUNCTION tsvector_update_trigger(content_tsv, '{config}', content)
+    """)
+    if _table_is_empty(cur):
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {TSV_INDEX[0]} ON documents {TSV_INDEX[1]}")
+    else:
+        # Existing rows have no tsvector (absent from keyword search) until backfilled
+        defer_task(cur, "tsv_backfill")
+
+
+@task("tsv_backfill")
+def _backfill_content_tsv(batch_size: int) -> bool:
+    from ultimaterag.Database.Indexes import create_index_concurrently
+
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            config = _text_search_config(cur)
+        conn.rollback()
+    updated = _batched_update(f"content_tsv = to_tsvector('{config}'::regconfig, content)",
+                              "content_tsv IS NULL", batch_size)
+    print(f"🛠️ Backfilled content_tsv on {updated} rows")
+    create_index_concurrently(*TSV_INDEX)
+    return True
+
+
+CHUNK_ID_INDEX = ("documents_chunk_id_key", "(chunk_id)")
+
+
+@migration(5, "deterministic chunk IDs on documents")
+def _add_chunk_ids(cur):
+    # Content-hash IDs make ingestion idempotent. Rows written before this migration keep
+    # a NULL chunk_id (NULLs never conflict) and are simply not deduplicated.
+    cur.execute("ALTER TABLE documents ADD COLUMN IF NOT EXISTS chunk_id TEXT")
+    if _table_is_empty(cur):
+        cur.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {CHUNK_ID_INDEX[0]} ON documents {CHUNK_ID_INDEX[1]}")
+    else:
+        # Until the index is valid, inserts skip stored chunks by lookup instead of ON CONFLICT
+        defer_task(cur, "chunk_id_index")
+
+
+@task("chunk_id_index")
+def _build_chunk_id_index(batch_size: int) -> bool:
+    from ultimaterag.Database.Indexes import create_index_concurrently
+
+    # Concurrent uploads of the same file can race past the lookup: keep the oldest copy
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM documents d USING documents o "
+                        "WHERE d.chunk_id = o.chunk_id AND d.id > o.id")
+            removed = cur.rowcount
+        conn.commit()
+    if removed:
+        print(f"🛠️ Removed {removed} duplicate chunks")
+    create_index_concurrently(*CHUNK_ID_INDEX, unique=True)
+    return True
+
+
+@migration(6, "corpus projection and per-chunk 3D coordinates")
+def _add_projection(cur):
+    # Coordinates are stored with the version of the basis that produced them, so rows
+    # written before the basis was frozen can be found and re-projected.
+    cur.execute("ALTER TABLE documents ADD COLUMN IF NOT EXISTS coords REAL[]")
+    cur.execute("ALTER TABLE documents ADD COLUMN IF NOT EXISTS projection TEXT")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS corpus_projection (
+            name TEXT PRIMARY KEY,
+            state BYTEA NOT NULL,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """)
+
+
+@task("ann_indexes")
+def _build_ann_indexes(batch_size: int) -> bool:
+    from ultimaterag.Database.Indexes import build_index
+
+    method = settings.PG_INDEX_METHOD.lower()
+    if method == "none":
+        return True
+    if method == "ivfflat":
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                empty = _table_is_empty(cur)
+            conn.rollback()
+        if empty:
+            print("ℹ️ IVFFlat index still waiting for documents; rerun `ultimaterag migrate` after loading.")
+            return False
+    build_index(method, concurrently=True)  # marks the task complete
+    return True
+
+
+def apply_migrations(conn) -> List[int]:
+    """Apply pending migrations in one transaction. Returns the versions applied."""
+    applied = []
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_advisory_xact_lock(%s)", (SCHEMA_LOCK_KEY,))
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+        """)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_tasks (
+                name TEXT PRIMARY KEY,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                completed_at TIMESTAMPTZ
+            )
+        """)
+        cur.execute("SELECT version FROM schema_migrations")
+        done = {row[0] for row in cur.fetchall()}
+
+        for version, name, func in MIGRATIONS:
+            if version in done:
+                continue
+            func(cur)
+            cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+            applied.append(version)
+            print(f"🗄️ Applied schema migration {version}: {name}")
+    conn.commit()
+    return applied
+
+
+def pending_tasks() -> List[str]:
+    """Deferred online tasks not yet completed, in run order."""
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT name FROM schema_tasks WHERE completed_at IS NULL")
+            pending = {row[0] for row in cur.fetchall()}
+        conn.rollback()
+    return [name for name in TASKS if name in pending]
+
+
+def complete_task(name: str):
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("UPDATE schema_tasks SET completed_at = now() WHERE name = %s AND completed_at IS NULL",
+                        (name,))
+        conn.commit()
+
+
+def run_pending_tasks(batch_size: int = 5000) -> Dict[str, str]:
+    """
+    Run deferred tasks online (no long locks: batched commits, CONCURRENTLY indexes).
+    Returns {task: "done" | "pending"}; a task that cannot finish yet stays queued.
+    """
+    ensure_schema(report_pending=False)
+    results = {}
+    for name in pending_tasks():
+        done = TASKS[name](batch_size)
+        if done:
+            complete_task(name)
+        results[name] = "done" if done else "pending"
+    return results
+
+
+_ensured = False
+_ensure_lock = threading.Lock()
+
+
+def ensure_schema(report_pending: bool = True) -> List[int]:
+    """Bring the database schema up to date (once per process)."""
+    global _ensured
+    with _ensure_lock:
+        if _ensured:
+            return []
+        with db_connection() as conn:
+            applied = apply_migrations(conn)
+        _ensured = True
+    pending = pending_tasks() if report_pending else []
+    if pending:
+        print(f"⚠️ Pending schema maintenance: {', '.join(pending)}. Run `ultimaterag migrate` "
+              "to complete it online.")
+    return applied
+
+
+def schema_version() -> int:
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass('schema_migrations') IS NOT NULL")
+            if not cur.fetchone()[0]:
+                return 0
+            cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+            return cur.fetchone()[0]
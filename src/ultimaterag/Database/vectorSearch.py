@@ -1,44 +1,31 @@
-from sentence_transformers import SentenceTransformer
-from ultimaterag.Database.Connection import get_db_connection
+from ultimaterag.Database.Connection import db_connection
+from ultimaterag.LLM.local_embeddings import get_local_embedding_engine
 
-# Load embedding model
-model = SentenceTransformer('all-MiniLM-L6-v2')
 
 def search_similar_documents(query: str, top_k: int = 5):
     """
     Searches for the most similar documents to the query string.
     Returns a list of (id, content, score) tuples.
     """
-    conn = get_db_connection()
-    if conn is None:
-        return []
-
     try:
         # Generate embedding for the query
-        query_embedding = model.encode(query).tolist()
-
-        cursor = conn.cursor()
-
-        # Search query using Cosine Distance (<=>)
-        # Note: We order by distance ascending (closest first)
-        cursor.execute(f"""
-            SELECT id, content, (embedding <=> %s::vector) as distance
-            FROM documents
-            ORDER BY distance ASC
-            LIMIT %s;
-        """, (query_embedding, top_k))
-
-        results = cursor.fetchall()
+        query_embedding = get_local_embedding_engine().embed_query(query)
 
-        cursor.close()
-        conn.close()
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                # Search query using Cosine Distance (<=>)
+                # Note: We order by distance ascending (closest first)
+                cursor.execute(f"""
+                    SELECT id, content, (embedding <=> %s::vector) as distance
+                    FROM documents
+                    ORDER BY distance ASC
+                    LIMIT %s;
+                """, (query_embedding, top_k))
 
-        return results
+                return cursor.fetchall()
 
     except Exception as e:
         print(f"❌ Error searching documents: {e}")
-        if conn:
-            conn.close()
         return []
 
 # if __name__ == "__main__":
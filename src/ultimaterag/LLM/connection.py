@@ -1,35 +1,132 @@
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
 from langchain_core.language_models import BaseChatModel
 from ultimaterag.config.settings import settings
 
-def get_llm() -> BaseChatModel:
-    """
-    Factory to get the Chat Model based on configuration.
-    """
-    provider = settings.LLM_PROVIDER
-    
+DEFAULT_TEMPERATURE = 0.7
+
+_clients: Dict[Tuple, BaseChatModel] = {}
+_http_client: Optional[httpx.Client] = None
+_async_http_client: Optional[httpx.AsyncClient] = None
+_pid: Optional[int] = None
+_lock = threading.RLock()
+
+
+def _reset_if_forked():
+    # Caller holds _lock. Keep-alive sockets inherited from a parent process must not be reused.
+    global _http_client, _async_http_client, _pid
+    if _pid != os.getpid():
+        _clients.clear()
+        _http_client = None
+        _async_http_client = None
+        _pid = os.getpid()
+
+
+def _http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def get_http_client() -> httpx.Client:
+    """Process-wide keep-alive HTTP pool for sync calls to LLM / embedding APIs."""
+    global _http_client
+    with _lock:
+        _reset_if_forked()
+        if _http_client is None:
+            _http_client = httpx.Client(limits=_http_limits(), timeout=settings.LLM_HTTP_TIMEOUT)
+        return _http_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Process-wide keep-alive HTTP pool for async calls from the server's event loop."""
+    global _async_http_client
+    with _lock:
+        _reset_if_forked()
+        if _async_http_client is None:
+            _async_http_client = httpx.AsyncClient(limits=_http_limits(), timeout=settings.LLM_HTTP_TIMEOUT)
+        return _async_http_client
+
+
+def _build_llm(provider: str, model: str, temperature: float, params: dict) -> BaseChatModel:
     if provider == "openai":
         from langchain_openai import ChatOpenAI
         return ChatOpenAI(
             api_key=settings.OPENAI_API_KEY,
-            model_name=settings.MODEL_NAME,
-            temperature=0.7
+            model_name=model,
+            temperature=temperature,
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client(),
+            **params
         )
-        
+
     elif provider == "ollama":
         from langchain_community.chat_models import ChatOllama
         return ChatOllama(
             base_url=settings.OLLAMA_BASE_URL,
-            model=settings.MODEL_NAME,
-            temperature=0.7
+            model=model,
+            temperature=temperature,
+            **params
         )
-        
+
     elif provider == "anthropic":
         from langchain_anthropic import ChatAnthropic
         return ChatAnthropic(
-            model_name=settings.MODEL_NAME,
-            temperature=0.7
+            model_name=model,
+            temperature=temperature,
+            **params
             # api_key is read from env ANTHROPIC_API_KEY automatically usually
         )
-        
+
     else:
         raise ValueError(f"Unsupported LLM_PROVIDER: {provider}")
+
+
+def get_llm(provider: Optional[str] = None, model: Optional[str] = None,
+            temperature: float = DEFAULT_TEMPERATURE, **params: Any) -> BaseChatModel:
+    """
+    Shared chat model for the given provider / model / params (defaults from settings).
+    Clients are built once per process and reused by every caller, so requests share
+    one keep-alive connection pool instead of opening a new one each time.
+    """
+    provider = provider or settings.LLM_PROVIDER
+    model = model or settings.MODEL_NAME
+    key = (provider, model, temperature, tuple(sorted((k, repr(v)) for k, v in params.items())))
+
+    with _lock:
+        _reset_if_forked()
+        llm = _clients.get(key)
+        if llm is None:
+            llm = _build_llm(provider, model, temperature, params)
+            _clients[key] = llm
+        return llm
+
+
+def llm_client_stats() -> dict:
+    with _lock:
+        return {
+            "clients": len(_clients),
+            "models": sorted({f"{key[0]}:{key[1]}" for key in _clients}),
+            "http_pool_open": _http_client is not None,
+        }
+
+
+async def close_llm_clients():
+    """Close the shared HTTP pools and drop cached clients (e.g. on application shutdown)."""
+    global _http_client, _async_http_client
+    with _lock:
+        http_client, async_http_client = _http_client, _async_http_client
+        _http_client = _async_http_client = None
+        _clients.clear()
+        owned = _pid == os.getpid()
+    if not owned:
+        return
+    if http_client is not None:
+        http_client.close()
+    if async_http_client is not None:
+        await async_http_client.aclose()
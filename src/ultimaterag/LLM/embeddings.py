@@ -1,23 +1,173 @@
-from typing import Any
+import hashlib
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Any, List, Optional
+from langchain_core.embeddings import Embeddings
 from ultimaterag.config.settings import settings
 
-def get_embedding_model() -> Any:
+
+class EmbeddingCache:
     """
-    Factory to get the embedding model based on configuration.
+    Two-tier cache for query embeddings: an in-process LRU and an optional Redis tier.
+    Keys are hashes of provider + model + text, so switching models never serves stale vectors.
     """
-    provider = settings.EMBEDDING_PROVIDER
-    
+
+    def __init__(self, max_size: int, use_redis: bool = False, ttl: Optional[int] = None):
+        self.max_size = max_size
+        self.use_redis = use_redis
+        self.ttl = ttl
+        self._lru: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.redis_errors = 0
+
+    @staticmethod
+    def make_key(namespace: str, text: str) -> str:
+        digest = hashlib.sha256(f"{namespace}\x00{text}".encode("utf-8")).hexdigest()
+        return f"emb:{digest}"
+
+    def _get_redis(self):
+        if not self.use_redis:
+            return None
+        from ultimaterag.Database.RedisConnection import get_redis_client
+        return get_redis_client()
+
+    def get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._lru.get(key)
+            if vector is not None:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return vector
+
+        client = self._get_redis()
+        if client is not None:
+            try:
+                raw = client.get(key)
+            except Exception as e:
+                self.redis_errors += 1
+                print(f"⚠️ Embedding cache Redis lookup failed: {e}")
+                raw = None
+            if raw:
+                vector = array("f", raw).tolist()
+                self._store_local(key, vector)
+                with self._lock:
+                    self.redis_hits += 1
+                return vector
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _store_local(self, key: str, vector: List[float]):
+        with self._lock:
+            self._lru[key] = vector
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_size:
+                self._lru.popitem(last=False)
+
+    def put(self, key: str, vector: List[float]):
+        self._store_local(key, vector)
+        client = self._get_redis()
+        if client is not None:
+            try:
+                client.set(key, array("f", vector).tobytes(), ex=self.ttl)
+            except Exception as e:
+                self.redis_errors += 1
+                print(f"⚠️ Embedding cache Redis write failed: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.redis_hits + self.misses
+            return {
+                "size": len(self._lru),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "redis_hits": self.redis_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.redis_hits) / lookups, 4) if lookups else 0.0,
+                "redis_enabled": self.use_redis,
+                "redis_errors": self.redis_errors,
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embedding model and serves repeated `embed_query` calls from the cache.
+    Document embedding is passed through untouched.
+    """
+
+    def __init__(self, inner: Any, cache: EmbeddingCache, provider: str, model: str):
+        self.inner = inner
+        self.cache = cache
+        self.namespace = f"{provider}:{model}"
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self.cache.make_key(self.namespace, text)
+        vector = self.cache.get(key)
+        if vector is None:
+            vector = self.inner.embed_query(text)
+            self.cache.put(key, vector)
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.inner.embed_documents(texts)
+
+    def __getattr__(self, name: str) -> Any:
+        # Expose attributes of the wrapped model (e.g. `model`, `model_name`).
+        return getattr(self.inner, name)
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Process-wide query embedding cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache(
+                max_size=settings.EMBEDDING_CACHE_SIZE,
+                use_redis=settings.EMBEDDING_CACHE_REDIS,
+                ttl=settings.EMBEDDING_CACHE_TTL,
+            )
+        return _cache
+
+
+def _model_name(model: Any) -> str:
+    for attr in ("model", "model_name"):
+        value = getattr(model, attr, None)
+        if isinstance(value, str) and value:
+            return value
+    return type(model).__name__
+
+
+def _build_embedding_model(provider: str) -> Any:
     if provider == "openai":
         from langchain_openai import OpenAIEmbeddings
-        return OpenAIEmbeddings(api_key=settings.OPENAI_API_KEY)
-    
+        from ultimaterag.LLM.connection import get_async_http_client, get_http_client
+        return OpenAIEmbeddings(
+            api_key=settings.OPENAI_API_KEY,
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client(),
+        )
+
     elif provider == "ollama":
         from langchain_community.embeddings import OllamaEmbeddings
         return OllamaEmbeddings(
             base_url=settings.OLLAMA_BASE_URL,
             model=settings.MODEL_NAME # Users likely use same model name var or we need a separate one
         )
-    
+
+    elif provider == "local":
+        # Shared in-process engine: one model per process, concurrent queries micro-batched
+        from ultimaterag.LLM.local_embeddings import get_local_embedding_engine
+        return get_local_embedding_engine()
+
     elif provider == "huggingface":
         # Example for local HuggingFace
         from langchain_community.embeddings import HuggingFaceEmbeddings
@@ -25,3 +175,16 @@ def get_embedding_model() -> Any:
 
     else:
         raise ValueError(f"Unsupported EMBEDDING_PROVIDER: {provider}")
+
+
+def get_embedding_model() -> Any:
+    """
+    Factory to get the embedding model based on configuration.
+    Query embeddings are cached unless EMBEDDING_CACHE_SIZE is 0.
+    """
+    provider = settings.EMBEDDING_PROVIDER
+    model = _build_embedding_model(provider)
+
+    if settings.EMBEDDING_CACHE_SIZE <= 0:
+        return model
+    return CachedEmbeddings(model, get_embedding_cache(), provider, _model_name(model))
@@ -0,0 +1,226 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional
+from langchain_core.embeddings import Embeddings
+from ultimaterag.config.settings import settings
+
+
+class LocalEmbeddingEngine(Embeddings):
+    """
+    In-process sentence-transformers embeddings, loaded once per process.
+
+    Concurrent `embed_query` calls (one per request thread) are queued and encoded together:
+    a single worker thread takes everything waiting, up to `batch_size`, waiting at most
+    `max_wait_ms` for more, and runs one forward pass for the lot. Document batches are
+    encoded in `batch_size` slices under the same inference lock, so queries interleave
+    with a large ingest instead of queuing behind it.
+    """
+
+    def __init__(self, model_name: str, device: str = "cpu", backend: str = "torch",
+                 onnx_file: str = "", quantize: bool = False, batch_size: int = 32,
+                 max_wait_ms: float = 2.0, normalize: bool = True):
+        self.model_name = model_name
+        self.device = device
+        self.backend = backend
+        self.onnx_file = onnx_file
+        self.quantize = quantize
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.normalize = normalize
+
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._worker_lock = threading.Lock()
+        self._inference_lock = threading.Lock()
+        self._queue: "queue.Queue" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.batches = 0
+        self.texts = 0
+        self.inference_seconds = 0.0
+
+    # --- Model ---
+
+    def _get_model(self):
+        with self._load_lock:
+            if self._model is None:
+                self._model = self._load_model()
+            return self._model
+
+    def _load_model(self):
+        from sentence_transformers import SentenceTransformer
+        print(f"🔁 Loading local embedding model {self.model_name} ({self.backend}"
+              f"{', int8' if self.quantize else ''}) on {self.device}")
+        kwargs = {"device": self.device}
+        if self.backend != "torch":
+            kwargs["backend"] = self.backend
+            # ONNX int8 uses pre-quantized weights published with the model
+            file_name = self.onnx_file or ("onnx/model_qint8_avx512_vnni.onnx" if self.quantize else "")
+            if file_name:
+                kwargs["model_kwargs"] = {"file_name": file_name}
+        model = SentenceTransformer(self.model_name, **kwargs)
+        if self.quantize and self.backend == "torch":
+            import torch
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return model
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        model = self._get_model()
+        with self._inference_lock:
+            start = time.perf_counter()
+            vectors = model.encode(texts, batch_size=len(texts), normalize_embeddings=self.normalize,
+                                   convert_to_numpy=True, show_progress_bar=False)
+            elapsed = time.perf_counter() - start
+        with self._stats_lock:
+            self.batches += 1
+            self.texts += len(texts)
+            self.inference_seconds += elapsed
+        return vectors.tolist()
+
+    # --- Micro-batching ---
+
+    def _submit(self, text: str) -> Future:
+        # Enqueued under the worker lock, so close() can never swap the queue between
+        # the check and the put (a query left on a stopped queue would wait forever)
+        future: Future = Future()
+        with self._worker_lock:
+            # The worker thread does not survive a fork: start a fresh one (and queue) per process
+            if self._worker is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._worker = threading.Thread(target=self._run, args=(self._queue,),
+                                                name="local-embeddings", daemon=True)
+                self._worker.start()
+                self._pid = os.getpid()
+            self._queue.put((text, future))
+        return future
+
+    def _collect(self, pending: "queue.Queue", first) -> list:
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            try:
+                item = pending.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = pending.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if item is None:
+                pending.put(None)  # keep the stop signal for the loop
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self, pending: "queue.Queue"):
+        while True:
+            first = pending.get()
+            if first is None:
+                return
+            batch = self._collect(pending, first)
+            # Identical queries in one batch are encoded once
+            unique = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                vectors = dict(zip(unique, self._encode(unique)))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for text, future in batch:
+                future.set_result(vectors[text])
+
+    # --- Embeddings interface ---
+
+    def embed_query(self, text: str) -> List[float]:
+        with self._stats_lock:
+            self.requests += 1
+        if self.batch_size == 1:
+            return self._encode([text])[0]
+        return self._submit(text).result()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors: List[List[float]] = []
+        for i in range(0, len(texts), self.batch_size):
+            vectors.extend(self._encode(list(texts[i:i + self.batch_size])))
+        return vectors
+
+    def close(self, timeout: float = 5.0):
+        """
+        Stop the batching thread. Queries already queued are answered first; any still
+        queued after `timeout` fail. A later query starts a new thread.
+        """
+        with self._worker_lock:
+            worker, pending = self._worker, self._queue
+            self._worker = None
+            self._queue = queue.Queue()
+            if worker is None or self._pid != os.getpid():
+                return
+            pending.put(None)
+        worker.join(timeout)
+
+        stopped = False
+        while True:
+            try:
+                item = pending.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                stopped = True
+            else:
+                item[1].set_exception(RuntimeError("Local embedding engine closed"))
+        if stopped:
+            pending.put(None)  # a worker still busy with its last batch exits after it
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "model": self.model_name,
+                "backend": self.backend,
+                "device": self.device,
+                "quantized": self.quantize,
+                "loaded": self._model is not None,
+                "queries": self.requests,
+                "batches": self.batches,
+                "texts_encoded": self.texts,
+                "avg_batch_size": round(self.texts / self.batches, 2) if self.batches else 0.0,
+                "embeddings_per_sec": round(self.texts / self.inference_seconds, 1) if self.inference_seconds else 0.0,
+                "queue_depth": self._queue.qsize(),
+            }
+
+
+_engine: Optional[LocalEmbeddingEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_local_embedding_engine() -> LocalEmbeddingEngine:
+    """Process-wide local embedding engine (the model itself loads on first use)."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = LocalEmbeddingEngine(
+                settings.EMBEDDING_LOCAL_MODEL,
+                device=settings.EMBEDDING_LOCAL_DEVICE,
+                backend=settings.EMBEDDING_LOCAL_BACKEND,
+                onnx_file=settings.EMBEDDING_LOCAL_ONNX_FILE,
+                quantize=settings.EMBEDDING_LOCAL_QUANTIZE,
+                batch_size=settings.EMBEDDING_LOCAL_BATCH_SIZE,
+                max_wait_ms=settings.EMBEDDING_LOCAL_MAX_WAIT_MS,
+            )
+        return _engine
+
+
+def local_embedding_stats() -> Optional[dict]:
+    """Engine counters, or None when the local engine has not been used in this process."""
+    return _engine.stats() if _engine is not None else None
+
+
+def close_local_embeddings():
+    if _engine is not None:
+        _engine.close()
@@ -1,5 +1,4 @@
 import typer
-import uvicorn
 from datetime import datetime
 from ultimaterag.config.settings import settings
 
@@ -29,23 +28,37 @@ def divider(char="═", length=48):
 def start(
     host: str = typer.Option("0.0.0.0", help="Host to bind the server to."),
     port: int = typer.Option(8000, help="Port to bind the server to."),
-    reload: bool = typer.Option(True, help="Enable auto-reload."),
+    reload: bool = typer.Option(False, help="Auto-reload on code changes (development, single worker)."),
+    workers: int = typer.Option(None, min=1, help="Worker processes. Defaults to SERVER_WORKERS."),
 ):
     """
     Start the UltimateRAG server.
     """
+    workers = workers or settings.SERVER_WORKERS
+    if reload and workers > 1:
+        raise typer.BadParameter("--reload runs a single process; drop it to use several workers.")
+    if workers > 1 and settings.VECTOR_DB_TYPE.lower() == "chroma":
+        # Chroma's PersistentClient (and its in-process BM25 index) cannot be shared between processes
+        raise typer.BadParameter("Chroma supports a single worker; set VECTOR_DB_TYPE=postgres to run several.")
+
     typer.secho(divider(), fg=typer.colors.BRIGHT_BLUE)
     typer.secho(f"🚀 Starting {settings.APP_NAME}", fg=typer.colors.GREEN, bold=True)
     typer.secho(f"🌐 URL     : http://{host}:{port}", fg=typer.colors.CYAN)
     typer.secho(f"🌐 URL     : http://localhost:{port}", fg=typer.colors.CYAN)
     typer.secho(f"🔁 Reload  : {'ON' if reload else 'OFF'}", fg=typer.colors.YELLOW)
+    typer.secho(f"🧵 Workers : {workers}", fg=typer.colors.YELLOW)
     typer.secho(divider(), fg=typer.colors.BRIGHT_BLUE)
 
+    # Each worker is a separate process that builds its own engine and client pools on
+    # startup (nothing is created at import), so workers never share sockets.
+    import uvicorn
     uvicorn.run(
         "ultimaterag.server:app",
         host=host,
         port=port,
         reload=reload,
+        workers=None if reload else workers,
+        timeout_graceful_shutdown=settings.SHUTDOWN_TIMEOUT,
     )
 
 
@@ -175,6 +188,11 @@ def help():
     typer.echo("  ▶ View License")
     typer.echo("    " + typer.style("ultimaterag license", fg=typer.colors.GREEN))
 
+    typer.echo("  ▶ Database Schema & ANN Index (PostgreSQL)")
+    typer.echo("    " + typer.style("ultimaterag migrate", fg=typer.colors.GREEN))
+    typer.echo("    " + typer.style("ultimaterag index build --rebuild", fg=typer.colors.GREEN))
+    typer.echo("    " + typer.style("ultimaterag index bench --k 10", fg=typer.colors.GREEN))
+
     typer.echo()
 
     # =====================================================
@@ -331,6 +349,152 @@ def help():
 
     typer.secho(divider(), fg=typer.colors.BRIGHT_CYAN)
 
+# -------------------------
+# Database
+# -------------------------
+
+index_app = typer.Typer(help="🧭 Manage the pgvector ANN index on documents.embedding.")
+app.add_typer(index_app, name="index")
+
+
+@app.command()
+def migrate(
+    tasks: bool = typer.Option(True, help="Also run deferred online maintenance (backfills, index builds)."),
+    batch_size: int = typer.Option(5000, help="Rows per backfill transaction."),
+):
+    """
+    Apply pending PostgreSQL schema migrations, then complete deferred maintenance online.
+    """
+    from ultimaterag.Database.Schema import ensure_schema, pending_tasks, run_pending_tasks, schema_version
+
+    applied = ensure_schema(report_pending=False)
+    typer.secho(divider(), fg=typer.colors.BRIGHT_BLUE)
+    if applied:
+        typer.secho(f"🗄️  Applied migrations: {', '.join(map(str, applied))}", fg=typer.colors.GREEN)
+    else:
+        typer.secho("🗄️  Schema already up to date", fg=typer.colors.GREEN)
+    typer.secho(f"📌 Schema version: {schema_version()}", fg=typer.colors.CYAN)
+
+    if tasks:
+        for name, state in run_pending_tasks(batch_size=batch_size).items():
+            color = typer.colors.GREEN if state == "done" else typer.colors.YELLOW
+            typer.secho(f"🛠️  {name}: {state}", fg=color)
+    else:
+        pending = pending_tasks()
+        if pending:
+            typer.secho(f"⏳ Pending maintenance: {', '.join(pending)}", fg=typer.colors.YELLOW)
+    typer.secho(divider(), fg=typer.colors.BRIGHT_BLUE)
+
+
+@index_app.command("status")
+def index_status():
+    """
+    Show vector indexes on the documents table.
+    """
+    from ultimaterag.Database.Indexes import index_status as get_index_status
+
+    indexes = get_index_status()
+    if not indexes:
+        typer.secho("⚠️  No ANN index: searches use a sequential scan.", fg=typer.colors.YELLOW)
+        return
+    for ix in indexes:
+        state = "valid" if ix["valid"] else "INVALID"
+        typer.secho(f"🧭 {ix['name']} ({ix['size']}, {state})", bold=True)
+        typer.echo(f"   {ix['definition']}")
+
+
+@index_app.command("build")
+def index_build(
+    method: str = typer.Option(None, help="hnsw, ivfflat or none (drop). Defaults to PG_INDEX_METHOD."),
+    rebuild: bool = typer.Option(False, help="Replace an existing index (built alongside, then swapped in)."),
+    concurrently: bool = typer.Option(True, help="Build without blocking writes."),
+    m: int = typer.Option(None, help="HNSW m. Defaults to PG_HNSW_M."),
+    ef_construction: int = typer.Option(None, help="HNSW ef_construction. Defaults to PG_HNSW_EF_CONSTRUCTION."),
+    lists: int = typer.Option(None, help="IVFFlat lists. Defaults to PG_IVFFLAT_LISTS."),
+    maintenance_work_mem: str = typer.Option(None, help="e.g. 2GB; faster builds when the graph fits in memory."),
+):
+    """
+    Build or rebuild the ANN index.
+    """
+    from ultimaterag.Database.Indexes import build_index
+
+    typer.secho(f"🔨 Building {method or settings.PG_INDEX_METHOD} index...", fg=typer.colors.CYAN)
+    result = build_index(method, concurrently=concurrently, rebuild=rebuild,
+                         maintenance_work_mem=maintenance_work_mem,
+                         m=m, ef_construction=ef_construction, lists=lists)
+    for name, action in result["indexes"].items():
+        if action == "mismatch":
+            typer.secho(f"⚠️ {name}: existing index is {result['mismatched'][name]}, not {result['method']}; "
+                        "rerun with --rebuild to replace it", fg=typer.colors.YELLOW)
+        else:
+            typer.secho(f"✅ {name}: {action} ({result['method']})", fg=typer.colors.GREEN)
+    typer.secho(f"⏱️  {result['seconds']}s", fg=typer.colors.CYAN)
+
+
+@index_app.command("bench")
+def index_bench(
+    k: int = typer.Option(10, help="Neighbours per query."),
+    queries: int = typer.Option(50, help="Query vectors sampled from stored embeddings."),
+    sweep: str = typer.Option(None, help="Comma-separated ef_search (HNSW) or probes (IVFFlat) values."),
+    method: str = typer.Option(None, help="hnsw or ivfflat. Defaults to PG_INDEX_METHOD."),
+):
+    """
+    Report recall@k and latency of ANN search against exact search.
+    """
+    from ultimaterag.Database.Indexes import benchmark_recall
+
+    values = [int(v) for v in sweep.split(",")] if sweep else None
+    rows = benchmark_recall(k=k, queries=queries, sweep=values, method=method)
+
+    typer.secho(divider(), fg=typer.colors.BRIGHT_BLUE)
+    typer.secho(f"{'mode':<16}{'recall@' + str(k):>10}{'p50 ms':>10}{'p95 ms':>10}", bold=True)
+    for row in rows:
+        typer.echo(f"{row['mode']:<16}{row['recall']:>10.3f}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}")
+    typer.secho(divider(), fg=typer.colors.BRIGHT_BLUE)
+
+# -------------------------
+# Visualization
+# -------------------------
+
+projection_app = typer.Typer(help="🗺️  Manage the corpus-wide 3D projection used by the visualizer.")
+app.add_typer(projection_app, name="projection")
+
+
+def _print_projection(stats: dict):
+    state = "frozen" if stats["frozen"] else "fitting"
+    typer.secho(f"🗺️  {stats['method']} basis {stats['version']} ({state})", bold=True)
+    typer.echo(f"   Fitted on {stats['samples_seen']}/{stats['fit_samples']} embeddings, dimension {stats['dimension']}")
+
+
+@projection_app.command("status")
+def projection_status():
+    """
+    Show the current projection basis.
+    """
+    from ultimaterag.core.vector_store import VectorManager
+
+    _print_projection(VectorManager().projection.stats())
+
+
+@projection_app.command("rebuild")
+def projection_rebuild(
+    refit: bool = typer.Option(False, help="Fit a new basis on stored embeddings first (moves every point)."),
+    page_size: int = typer.Option(1000, help="Chunks read and updated per page."),
+):
+    """
+    Store fresh 3D coordinates for chunks projected with an older basis.
+    """
+    from ultimaterag.core.vector_store import VectorManager
+
+    try:
+        result = VectorManager().rebuild_projection(refit=refit, page_size=page_size)
+    except ValueError as e:
+        typer.secho(f"❌ {e}", fg=typer.colors.RED)
+        raise typer.Exit(1)
+    _print_projection(result)
+    typer.secho(f"✅ Re-projected {result['updated']} of {result['scanned']} chunks", fg=typer.colors.GREEN)
+
+
 # -------------------------
 # Entry
 # -------------------------
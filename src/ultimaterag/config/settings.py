@@ -13,11 +13,19 @@ class Settings(BaseSettings):
     APP_NAME: str = Field("TheUltimateRAG", description="Name of the application")
     APP_ENV: str = Field("development", description="Environment: development, production")
     DEBUG: bool = Field(True, description="Debug mode")
+    BLOCKING_POOL_SIZE: int = Field(32, description="Threads for blocking work (vector DB, embeddings) offloaded from async handlers")
+    SERVER_WORKERS: int = Field(1, description="Worker processes for `ultimaterag start`; each has its own pools (size DB/Redis limits per worker). Postgres only: Chroma is single-process")
+    WARM_START: bool = Field(True, description="Build the RAG engine at server startup instead of on the first request")
+    SHUTDOWN_TIMEOUT: float = Field(30.0, description="Seconds shutdown waits for in-flight requests (uvicorn graceful timeout), then for background work (e.g. pending consolidations)")
     
     # --- LLM Provider ---
     LLM_PROVIDER: str = Field("openai", description="llm provider: openai, ollama, anthropic")
-    EMBEDDING_PROVIDER: str = Field("openai", description="embedding provider: openai, ollama, huggingface")
+    EMBEDDING_PROVIDER: str = Field("openai", description="embedding provider: openai, ollama, huggingface, local")
     MODEL_NAME: str = Field("gpt-3.5-turbo", description="Model name to use")
+    LLM_HTTP_MAX_CONNECTIONS: int = Field(100, description="Max connections in the shared HTTP pool for LLM / embedding APIs (per process)")
+    LLM_HTTP_MAX_KEEPALIVE: int = Field(20, description="Idle keep-alive connections kept in the shared HTTP pool")
+    LLM_HTTP_KEEPALIVE_EXPIRY: float = Field(30.0, description="Seconds an idle keep-alive connection is kept open")
+    LLM_HTTP_TIMEOUT: float = Field(120.0, description="Timeout in seconds for LLM / embedding HTTP requests")
     
     # --- API Keys ---
     OPENAI_API_KEY: str | None = Field(None, description="OpenAI API Key")
@@ -31,6 +39,47 @@ class Settings(BaseSettings):
     VECTOR_DB_PATH: str = Field("./chroma_db_data", description="Path for local ChromaDB")
     COLLECTION_NAME: str = Field("rag_collection", description="Unused currently but reserved")
     EMBEDDING_DIMENSION: int = Field(1536, description="Dimension of embeddings")
+    EMBEDDING_LOCAL_MODEL: str = Field("sentence-transformers/all-MiniLM-L6-v2", description="sentence-transformers model for the local provider")
+    EMBEDDING_LOCAL_DEVICE: str = Field("cpu", description="Device for the local embedding model (cpu, cuda, mps)")
+    EMBEDDING_LOCAL_BACKEND: str = Field("torch", description="Local inference backend: torch, onnx or openvino")
+    EMBEDDING_LOCAL_ONNX_FILE: str = Field("", description="ONNX weights file inside the model repo (e.g. onnx/model_qint8_avx512.onnx)")
+    EMBEDDING_LOCAL_QUANTIZE: bool = Field(False, description="int8 weights: dynamic quantization (torch) or the quantized ONNX file")
+    EMBEDDING_LOCAL_BATCH_SIZE: int = Field(32, description="Max texts per local forward pass (1 disables query micro-batching)")
+    EMBEDDING_LOCAL_MAX_WAIT_MS: float = Field(2.0, description="How long a query waits for others to share its forward pass")
+    EMBEDDING_CACHE_SIZE: int = Field(4096, description="Query embeddings kept in the in-process LRU (0 disables caching)")
+    EMBEDDING_CACHE_REDIS: bool = Field(False, description="Also cache query embeddings in Redis (shared across workers)")
+    EMBEDDING_CACHE_TTL: int = Field(604800, description="TTL in seconds for Redis-cached query embeddings")
+    CHAIN_CACHE_SIZE: int = Field(128, description="Compiled chat chains kept per process, keyed by system prompt + model params (0 disables)")
+    RETRIEVER_CACHE_SIZE: int = Field(256, description="Retriever objects kept per process, keyed by search kwargs (0 disables)")
+
+    # --- Retrieval ---
+    RETRIEVAL_MODE: str = Field("vector", description="Default retrieval: vector, keyword or hybrid (per-request override)")
+    HYBRID_CANDIDATES: int = Field(20, description="Candidates fetched from each of the dense and lexical legs before fusion")
+    HYBRID_RRF_K: int = Field(60, description="Reciprocal Rank Fusion constant (higher flattens rank differences)")
+    HYBRID_VECTOR_WEIGHT: float = Field(1.0, description="RRF weight of the dense (vector) ranking")
+    HYBRID_KEYWORD_WEIGHT: float = Field(1.0, description="RRF weight of the lexical (keyword) ranking")
+    RERANK_ENABLED: bool = Field(False, description="Rerank retrieved chunks with a local cross-encoder (needs sentence-transformers)")
+    RERANK_MODEL: str = Field("cross-encoder/ms-marco-MiniLM-L-6-v2", description="Cross-encoder model used for reranking")
+    RERANK_DEVICE: str = Field("cpu", description="Device for the reranker model (cpu, cuda, mps)")
+    RERANK_BATCH_SIZE: int = Field(32, description="(query, chunk) pairs scored per forward pass")
+    RERANK_CANDIDATES: int = Field(20, description="Chunks retrieved before reranking down to the context size")
+    RERANK_MIN_SCORE: float = Field(0.0, description="Workflow relevance cut-off on the raw cross-encoder score")
+    RERANK_CACHE_SIZE: int = Field(20000, description="Cached (query, chunk) scores (0 disables)")
+    ANSWER_CACHE_ENABLED: bool = Field(False, description="Serve near-identical standalone chat questions from the semantic answer cache")
+    ANSWER_CACHE_SIZE: int = Field(1000, description="Cached answers kept per process (LRU)")
+    ANSWER_CACHE_THRESHOLD: float = Field(0.95, description="Min cosine similarity between query embeddings for a cache hit")
+    ANSWER_CACHE_TTL: int = Field(3600, description="Seconds a cached answer stays valid")
+    ANSWER_CACHE_REDIS: bool = Field(False, description="Share ingest invalidations between workers through Redis generation counters")
+    VISUALIZATION_PAGE_SIZE: int = Field(10000, description="Default points per page of the corpus visualization export")
+    VISUALIZATION_MAX_PAGE_SIZE: int = Field(50000, description="Largest page a client may request from the visualization export")
+    PROJECTION_FIT_SAMPLES: int = Field(5000, description="Ingested embeddings the 3D visualization projection is fitted on before it is frozen")
+    WORKFLOW_GRADE_CONCURRENCY: int = Field(4, description="Max concurrent LLM grading calls in the self-correcting workflow")
+    WORKFLOW_GRADE_CANDIDATES: int = Field(8, description="Documents retrieved for LLM grading (more than the 3 kept, so grading can stop early)")
+    WORKFLOW_MIN_RELEVANT: int = Field(3, description="Workflow stops LLM grading once this many documents are relevant (in-flight calls still finish)")
+    WORKFLOW_MAX_RETRIES: int = Field(1, description="Query rewrites the self-correcting workflow may try before generating anyway")
+    WORKFLOW_MAX_STEPS: int = Field(25, description="Superstep limit for a workflow run (guards against runaway loops)")
+    EMBED_BATCH_SIZE: int = Field(128, description="Documents embedded and written per batch")
+    EMBED_QUEUE_DEPTH: int = Field(2, description="Embedded batches allowed to wait for the DB writer")
     
     # --- Postgres (PGVector) ---
     POSTGRES_HOST: str = Field("localhost", description="DB Host")
@@ -38,15 +87,35 @@ class Settings(BaseSettings):
     POSTGRES_USER: str = Field("postgres", description="DB User")
     POSTGRES_PASSWORD: str = Field("postgres", description="DB Password")
     POSTGRES_PORT: str = Field("5432", description="DB Port")
+    POSTGRES_POOL_MIN: int = Field(1, description="Connections opened when the pool is created")
+    POSTGRES_POOL_MAX: int = Field(10, description="Maximum pooled connections per process")
+    POSTGRES_POOL_TIMEOUT: float = Field(30.0, description="Seconds to wait for a free pooled connection")
+    POSTGRES_POOL_PING_INTERVAL: float = Field(30.0, description="Ping connections idle longer than this (seconds) before reuse")
+    PG_BULK_INSERT_MODE: str = Field("copy", description="Bulk insert path: copy, values, row")
+    PG_INDEX_METHOD: str = Field("hnsw", description="ANN index on documents.embedding: hnsw, ivfflat or none")
+    PG_HNSW_M: int = Field(16, description="HNSW max connections per layer (build time)")
+    PG_HNSW_EF_CONSTRUCTION: int = Field(64, description="HNSW candidate list size while building")
+    PG_HNSW_EF_SEARCH: int = Field(40, description="HNSW candidate list size per query (recall vs latency)")
+    PG_IVFFLAT_LISTS: int = Field(100, description="IVFFlat inverted lists (roughly rows / 1000)")
+    PG_IVFFLAT_PROBES: int = Field(10, description="IVFFlat lists scanned per query (recall vs latency)")
+    PG_TEXT_SEARCH_CONFIG: str = Field("simple", description="Full-text search config for keyword retrieval ('simple' keeps codes/IDs intact)")
     
     # --- Memory (Redis + Params) ---
     MEMORY_WINDOW_SIZE: int = Field(10, description="Chat history window size")
     MEMORY_WINDOW_LIMIT: int = Field(10, description="Memory window limit")
+    CONSOLIDATION_WORKERS: int = Field(2, description="Background threads that summarize and archive overflowing sessions")
+    CONSOLIDATION_MAX_PENDING: int = Field(10000, description="Max sessions waiting for consolidation (0 = unbounded)")
     REDIS_HOST: str = Field("localhost", description="Redis Host")
     REDIS_PORT: int = Field(6379, description="Redis Port")
     REDIS_PASSWORD: str | None = Field(None, description="Redis Password")
     REDIS_USER: str = Field("default", description="Redis User")
     REDIS_DB: str = Field("0", description="Redis DB Index")
+    REDIS_MAX_CONNECTIONS: int = Field(50, description="Max connections in the shared Redis pool (per client, per process)")
+
+    # --- Ingestion ---
+    INGEST_CHUNK_SIZE: int = Field(1000, description="Characters per chunk")
+    INGEST_CHUNK_OVERLAP: int = Field(200, description="Character overlap between chunks")
+    INGEST_BATCH_SIZE: int = Field(64, description="Chunks sent to the vector store per batch")
 
     @property
     def REDIS_URL(self) -> str:
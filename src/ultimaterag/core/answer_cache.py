@@ -0,0 +1,240 @@
+import hashlib
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from ultimaterag.config.settings import settings
+
+
+@dataclass
+class CachedAnswer:
+    answer: str
+    usage: dict = field(default_factory=dict)
+    sources: list = field(default_factory=list)
+    tokens: int = 0
+    created_at: float = field(default_factory=time.time)
+
+
+class SemanticAnswerCache:
+    """
+    In-process cache of chat answers, matched by query embedding similarity.
+
+    Entries are grouped in buckets of (RBAC scope, system prompt, model params, retrieval
+    mode); a lookup only compares against its own bucket, so answers never cross users or
+    prompts. Entries expire after `ttl` seconds and the oldest are evicted past `max_size`.
+    Ingestion bumps a generation counter for the scope it touches: "common" data
+    invalidates every bucket, private data only the owner's. With `use_redis` the counters
+    live in Redis, so an ingest on one worker also invalidates every other worker's entries
+    (checked when a generation is taken and again before storing).
+    """
+
+    def __init__(self, max_size: int, threshold: float, ttl: Optional[float] = None,
+                 use_redis: bool = False):
+        self.max_size = max_size
+        self.threshold = threshold
+        self.ttl = ttl
+        self.use_redis = use_redis
+        self._entries: "OrderedDict[int, Tuple[tuple, np.ndarray, CachedAnswer]]" = OrderedDict()
+        self._buckets: Dict[tuple, Dict[int, np.ndarray]] = {}
+        self._ids = itertools.count()
+        self._common_generation = 0
+        self._user_generations: Dict[Optional[str], int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.invalidations = 0
+        self.saved_tokens = 0
+        self.redis_errors = 0
+
+    @staticmethod
+    def bucket_key(user_id: Optional[str], system_prompt: Optional[str] = None,
+                   model_params: Optional[dict] = None, search_mode: Optional[str] = None) -> tuple:
+        prompt_hash = hashlib.sha256((system_prompt or "").encode("utf-8")).hexdigest()
+        params = tuple(sorted((k, repr(v)) for k, v in (model_params or {}).items()))
+        return user_id or None, prompt_hash, params, search_mode or settings.RETRIEVAL_MODE
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    @staticmethod
+    def generation_keys(user_id: Optional[str]) -> Tuple[str, str]:
+        return "answer_cache:gen:common", f"answer_cache:gen:user:{user_id or ''}"
+
+    def _get_redis(self):
+        if not self.use_redis:
+            return None
+        from ultimaterag.Database.RedisConnection import get_redis_client
+        return get_redis_client()
+
+    def _sync(self, user_id: Optional[str]):
+        """Adopt the shared counters, dropping entries another worker invalidated."""
+        client = self._get_redis()
+        if client is None:
+            return
+        try:
+            common, user = (int(v or 0) for v in client.mget(self.generation_keys(user_id)))
+        except Exception as e:
+            self.redis_errors += 1
+            print(f"⚠️ Answer cache Redis generation lookup failed: {e}")
+            return
+        scope = user_id or None
+        with self._lock:
+            if common != self._common_generation:
+                self._common_generation = common
+                doomed = list(self._entries)
+            elif user != self._user_generations.get(scope, 0):
+                doomed = [i for i, (bucket, _, _) in self._entries.items() if bucket[0] == scope]
+            else:
+                return
+            self._user_generations[scope] = user
+            for entry_id in doomed:
+                self._remove(entry_id)
+            self.invalidations += len(doomed)
+
+    def generation(self, user_id: Optional[str]) -> tuple:
+        """Token for the data visible to `user_id`; pass it back to `store`."""
+        self._sync(user_id)
+        with self._lock:
+            return self._common_generation, self._user_generations.get(user_id or None, 0)
+
+    def _remove(self, entry_id: int):
+        # Caller holds _lock
+        bucket, _, _ = self._entries.pop(entry_id)
+        vectors = self._buckets.get(bucket)
+        if vectors is not None:
+            vectors.pop(entry_id, None)
+            if not vectors:
+                del self._buckets[bucket]
+
+    def lookup(self, bucket: tuple, embedding: Sequence[float]) -> Optional[CachedAnswer]:
+        query = self._normalize(embedding)
+        now = time.time()
+        with self._lock:
+            vectors = self._buckets.get(bucket)
+            if vectors and self.ttl:
+                for entry_id in [i for i in vectors if now - self._entries[i][2].created_at > self.ttl]:
+                    self._remove(entry_id)
+                vectors = self._buckets.get(bucket)
+            if not vectors:
+                self.misses += 1
+                return None
+
+            ids = list(vectors)
+            similarities = np.stack([vectors[i] for i in ids]) @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            entry_id = ids[best]
+            self._entries.move_to_end(entry_id)
+            cached = self._entries[entry_id][2]
+            self.hits += 1
+            self.saved_tokens += cached.tokens
+            return cached
+
+    def store(self, bucket: tuple, embedding: Sequence[float], answer: CachedAnswer,
+              generation: Optional[tuple] = None):
+        """Cache an answer; skipped if the scope was re-ingested since `generation` was taken."""
+        if self.max_size <= 0:
+            return
+        vector = self._normalize(embedding)
+        if generation is not None:
+            self._sync(bucket[0])
+        with self._lock:
+            if generation is not None and generation != (
+                    self._common_generation, self._user_generations.get(bucket[0], 0)):
+                return
+            entry_id = next(self._ids)
+            self._entries[entry_id] = (bucket, vector, answer)
+            self._buckets.setdefault(bucket, {})[entry_id] = vector
+            self.stores += 1
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, user_id: Optional[str] = None, access_level: str = "private") -> int:
+        """Drop answers that could see data written for this scope. Returns entries removed."""
+        shared = None
+        client = self._get_redis()
+        if client is not None:
+            common_key, user_key = self.generation_keys(user_id)
+            try:
+                shared = client.incr(common_key if access_level == "common" else user_key)
+            except Exception as e:
+                self.redis_errors += 1
+                print(f"⚠️ Answer cache Redis invalidation failed: {e}")
+        with self._lock:
+            if access_level == "common":
+                self._common_generation = shared if shared is not None else self._common_generation + 1
+                doomed = list(self._entries)
+            else:
+                scope = user_id or None
+                self._user_generations[scope] = (shared if shared is not None
+                                                 else self._user_generations.get(scope, 0) + 1)
+                doomed = [i for i, (bucket, _, _) in self._entries.items() if bucket[0] == scope]
+            for entry_id in doomed:
+                self._remove(entry_id)
+            self.invalidations += len(doomed)
+            return len(doomed)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "stores": self.stores,
+                "invalidated": self.invalidations,
+                "saved_tokens": self.saved_tokens,
+                "redis_enabled": self.use_redis,
+                "redis_errors": self.redis_errors,
+            }
+
+
+def usage_tokens(usage: Optional[dict]) -> int:
+    """Total tokens from LangChain usage_metadata or an OpenAI-style token_usage block."""
+    if not usage:
+        return 0
+    if "total_tokens" in usage:
+        return int(usage.get("total_tokens") or 0)
+    return int((usage.get("token_usage") or {}).get("total_tokens") or 0)
+
+
+_cache: Optional[SemanticAnswerCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> Optional[SemanticAnswerCache]:
+    """Process-wide answer cache, or None when ANSWER_CACHE_ENABLED is off."""
+    global _cache
+    if not settings.ANSWER_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = SemanticAnswerCache(
+                max_size=settings.ANSWER_CACHE_SIZE,
+                threshold=settings.ANSWER_CACHE_THRESHOLD,
+                ttl=settings.ANSWER_CACHE_TTL,
+                use_redis=settings.ANSWER_CACHE_REDIS,
+            )
+        return _cache
@@ -0,0 +1,172 @@
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+from ultimaterag.config.settings import settings
+
+
+class ConsolidationQueue:
+    """
+    Background queue for memory consolidation jobs, keyed by session ID.
+
+    - Deduplicated: a session waiting in the queue is never queued twice. A submit that
+      arrives while the session is being consolidated marks it dirty, and it is re-queued
+      once, after the current run finishes (so new messages are still checked).
+    - Serialized per session: one session is never consolidated by two workers at once,
+      so handlers that re-check their precondition (as `enforce_memory_consolidation`
+      does) are idempotent.
+    - Worker threads start on first submit; `stop()` drains what is already queued.
+    """
+
+    def __init__(self, workers: int, max_pending: int = 0, name: str = "consolidation"):
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self.name = name
+        self.pid = os.getpid()
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._pending: Dict[str, Tuple[float, Callable[[str], None]]] = {}
+        self._running: Dict[str, float] = {}
+        self._dirty: Dict[str, Callable[[str], None]] = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        self.stopped = False
+
+        self.submitted = 0
+        self.deduplicated = 0
+        self.dropped = 0
+        self.completed = 0
+        self.failed = 0
+        self._lag_total = 0.0
+        self._last_lag = 0.0
+        self._max_lag = 0.0
+
+    def _ensure_workers(self):
+        # Caller holds self._lock
+        if self._threads:
+            return
+        for i in range(self.workers):
+            t = threading.Thread(target=self._work, name=f"{self.name}-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, key: str, func: Callable[[str], None]) -> bool:
+        """
+        Queue `func(key)`. Returns False if the job was merged into an existing one
+        or dropped because the queue is full or stopped.
+        """
+        with self._lock:
+            if self.stopped:
+                self.dropped += 1
+                return False
+            if key in self._pending:
+                self._pending[key] = (self._pending[key][0], func)
+                self.deduplicated += 1
+                return False
+            if key in self._running:
+                self._dirty[key] = func
+                self.deduplicated += 1
+                return False
+            if self.max_pending and len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                print(f"⚠️ {self.name}: queue full ({self.max_pending}), skipping {key}")
+                return False
+            self._pending[key] = (time.monotonic(), func)
+            self.submitted += 1
+            self._ensure_workers()
+            # Enqueued under the lock, so a key can never land behind stop()'s sentinels
+            self._queue.put(key)
+        return True
+
+    def _work(self):
+        while True:
+            key = self._queue.get()
+            if key is None:
+                return
+
+            with self._lock:
+                enqueued_at, func = self._pending.pop(key)
+                started_at = time.monotonic()
+                self._running[key] = started_at
+                lag = started_at - enqueued_at
+                self._lag_total += lag
+                self._last_lag = lag
+                self._max_lag = max(self._max_lag, lag)
+
+            try:
+                func(key)
+                ok = True
+            except Exception as e:
+                ok = False
+                print(f"❌ {self.name}: job for {key} failed: {e}")
+
+            with self._lock:
+                del self._running[key]
+                if ok:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+                func = self._dirty.pop(key, None)
+                if func is not None and not self.stopped:
+                    self._pending[key] = (time.monotonic(), func)
+                    self._queue.put(key)
+
+    def stop(self, wait: bool = True, timeout: Optional[float] = None):
+        """Stop accepting jobs; workers finish the jobs already queued, then exit."""
+        with self._lock:
+            if self.stopped:
+                return
+            self.stopped = True
+            threads = list(self._threads)
+            for _ in threads:
+                self._queue.put(None)
+        if wait:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            for t in threads:
+                t.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            oldest = min((t for t, _ in self._pending.values()), default=None)
+            started = self.completed + self.failed + len(self._running)
+            return {
+                "depth": len(self._pending),
+                "running": len(self._running),
+                "workers": self.workers,
+                "submitted": self.submitted,
+                "deduplicated": self.deduplicated,
+                "dropped": self.dropped,
+                "completed": self.completed,
+                "failed": self.failed,
+                # Lag = time a session waited in the queue before a worker picked it up
+                "current_lag_seconds": round(now - oldest, 3) if oldest is not None else 0.0,
+                "last_lag_seconds": round(self._last_lag, 3),
+                "avg_lag_seconds": round(self._lag_total / started, 3) if started else 0.0,
+                "max_lag_seconds": round(self._max_lag, 3),
+            }
+
+
+_queue: Optional[ConsolidationQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_consolidation_queue() -> ConsolidationQueue:
+    """Process-wide consolidation queue (re-created in a forked child)."""
+    global _queue
+    with _queue_lock:
+        if _queue is None or _queue.stopped or _queue.pid != os.getpid():
+            _queue = ConsolidationQueue(
+                workers=settings.CONSOLIDATION_WORKERS,
+                max_pending=settings.CONSOLIDATION_MAX_PENDING,
+            )
+        return _queue
+
+
+def stop_consolidation_queue(wait: bool = True, timeout: Optional[float] = None):
+    """Drain and stop the queue (e.g. on application shutdown)."""
+    global _queue
+    with _queue_lock:
+        q, _queue = _queue, None
+    if q is not None and q.pid == os.getpid():
+        q.stop(wait=wait, timeout=timeout)
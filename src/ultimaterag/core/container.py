@@ -1,5 +1,39 @@
-from ultimaterag.core.rag_engine import RAGPipeline
+import os
+import threading
+from typing import TYPE_CHECKING, Optional
 
-# Singleton instance of the RAG Pipeline
-# This ensures that all API endpoints share the same memory manager instance.
-rag_engine = RAGPipeline()
+if TYPE_CHECKING:
+    from ultimaterag.core.rag_engine import RAGPipeline
+
+# Process-wide RAG Pipeline, shared by all API endpoints (one memory manager, one set of clients).
+# Built on first use instead of at import, so importing the server or CLI needs no live
+# services; the server lifespan warms it up at startup.
+_rag_engine: Optional["RAGPipeline"] = None
+_pid: Optional[int] = None
+_lock = threading.Lock()
+
+
+def get_rag_engine() -> "RAGPipeline":
+    """
+    The shared RAGPipeline, constructed on first call (a failed build is retried next call).
+    A forked worker builds its own instead of reusing one created before the fork.
+    """
+    global _rag_engine, _pid
+    if _rag_engine is None or _pid != os.getpid():
+        with _lock:
+            if _rag_engine is None or _pid != os.getpid():
+                from ultimaterag.core.rag_engine import RAGPipeline
+                _rag_engine = RAGPipeline()
+                _pid = os.getpid()
+    return _rag_engine
+
+
+def rag_engine_ready() -> bool:
+    return _rag_engine is not None and _pid == os.getpid()
+
+
+def __getattr__(name: str):
+    # `from ultimaterag.core.container import rag_engine` keeps working (built on access)
+    if name == "rag_engine":
+        return get_rag_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,242 @@
+import os
+import sys
+import time
+from html.parser import HTMLParser
+from typing import Iterator, Iterable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_text_splitters import Language, RecursiveCharacterTextSplitter
+from ultimaterag.config.settings import settings
+
+# How much raw text we read from disk per step. Small enough to keep memory flat,
+# large enough that the splitter is not called for every line.
+READ_BLOCK_SIZE = 64 * 1024
+
+TEXT_EXTENSIONS = {".txt", ".text", ".log", ".csv"}
+MARKDOWN_EXTENSIONS = {".md", ".markdown"}
+HTML_EXTENSIONS = {".html", ".htm"}
+PDF_EXTENSIONS = {".pdf"}
+SUPPORTED_EXTENSIONS = TEXT_EXTENSIONS | MARKDOWN_EXTENSIONS | HTML_EXTENSIONS | PDF_EXTENSIONS
+
+
+def current_rss_bytes() -> int:
+    """
+    Resident set size of the current process in bytes (best effort, 0 if unknown).
+    """
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except Exception:
+        pass
+
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+
+    try:
+        import resource
+        # ru_maxrss is the lifetime peak: KB on Linux, bytes on macOS.
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage if sys.platform == "darwin" else usage * 1024
+    except ImportError:
+        return 0
+
+
+class _HTMLTextExtractor(HTMLParser):
+    """Incremental HTML -> text converter. Feed it blocks, then drain the collected text."""
+
+    SKIP_TAGS = {"script", "style", "noscript", "head"}
+    BLOCK_TAGS = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "section", "article"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._skip_depth = 0
+        self._parts: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self._parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag in self.BLOCK_TAGS:
+            self._parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self._parts.append(data)
+
+    def drain(self) -> str:
+        text = "".join(self._parts)
+        self._parts = []
+        return text
+
+
+class IngestionManager:
+    """
+    Streaming ingestion engine.
+
+    Files are read block by block (or page by page for PDFs) and split on the fly,
+    so chunks are produced as a generator and a large file is never fully in memory.
+    """
+
+    def __init__(self, chunk_size: Optional[int] = None, chunk_overlap: Optional[int] = None,
+                 batch_size: Optional[int] = None):
+        self.chunk_size = chunk_size or settings.INGEST_CHUNK_SIZE
+        self.chunk_overlap = chunk_overlap if chunk_overlap is not None else settings.INGEST_CHUNK_OVERLAP
+        self.batch_size = batch_size or settings.INGEST_BATCH_SIZE
+
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap
+        )
+        self.markdown_splitter = RecursiveCharacterTextSplitter.from_language(
+            Language.MARKDOWN, chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap
+        )
+
+    # --- Readers (yield (text, extra_metadata) segments) ---
+
+    def _read_text(self, file_path: str) -> Iterator[Tuple[str, dict]]:
+        with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+            while True:
+                block = f.read(READ_BLOCK_SIZE)
+                if not block:
+                    break
+                yield block, {}
+
+    def _read_html(self, file_path: str) -> Iterator[Tuple[str, dict]]:
+        parser = _HTMLTextExtractor()
+        for block, meta in self._read_text(file_path):
+            parser.feed(block)
+            text = parser.drain()
+            if text:
+                yield text, meta
+        parser.close()
+        tail = parser.drain()
+        if tail:
+            yield tail, {}
+
+    def _read_pdf(self, file_path: str) -> Iterator[Tuple[str, dict]]:
+        from pypdf import PdfReader
+
+        # Pass a file handle rather than the path: given a path, pypdf copies the
+        # whole file into memory, while a handle lets it seek to each page lazily.
+        with open(file_path, "rb") as f:
+            reader = PdfReader(f)
+            for page_number, page in enumerate(reader.pages):
+                text = page.extract_text() or ""
+                if text.strip():
+                    yield text, {"page": page_number}
+
+    def _get_reader(self, file_path: str):
+        ext = os.path.splitext(file_path)[1].lower()
+        if ext in PDF_EXTENSIONS:
+            return self._read_pdf, self.text_splitter
+        if ext in HTML_EXTENSIONS:
+            return self._read_html, self.text_splitter
+        if ext in MARKDOWN_EXTENSIONS:
+            return self._read_text, self.markdown_splitter
+        if ext in TEXT_EXTENSIONS:
+            return self._read_text, self.text_splitter
+        raise ValueError(f"Unsupported file type '{ext}'. Supported: {', '.join(sorted(SUPPORTED_EXTENSIONS))}")
+
+    # --- Chunking ---
+
+    def _split_stream(self, segments: Iterable[Tuple[str, dict]], splitter, base_metadata: dict) -> Iterator[Document]:
+        """
+        Split a stream of text segments into chunks.
+
+        Text is buffered until it spans several chunks; everything but the last chunk is
+        emitted and the last one is carried over so chunks never end on a block boundary.
+        A change in segment metadata (e.g. a new PDF page) flushes the buffer.
+        """
+        window = self.chunk_size * 8
+        buffer = ""
+        buffer_meta: dict = {}
+
+        def flush(final: bool) -> Iterator[Document]:
+            nonlocal buffer
+            chunks = splitter.split_text(buffer)
+            if not final and chunks:
+                # Carry the raw text from where the last chunk starts: the chunk itself is
+                # whitespace-stripped, and dropping its separator would glue words together
+                last = chunks.pop()
+                start = buffer.rfind(last)
+                buffer = buffer[start:] if start >= 0 else last
+            else:
+                buffer = ""
+            for chunk in chunks:
+                yield Document(page_content=chunk, metadata={**base_metadata, **buffer_meta})
+
+        for text, meta in segments:
+            if meta != buffer_meta and buffer:
+                yield from flush(final=True)
+            buffer_meta = meta
+            buffer += text
+            if len(buffer) >= window:
+                yield from flush(final=False)
+
+        if buffer.strip():
+            yield from flush(final=True)
+
+    def iter_chunks(self, file_path: str) -> Iterator[Document]:
+        """
+        Lazily yield chunked Documents for a PDF, Markdown, HTML or plain text file.
+        """
+        reader, splitter = self._get_reader(file_path)
+        base_metadata = {"source": os.path.basename(file_path)}
+        yield from self._split_stream(reader(file_path), splitter, base_metadata)
+
+    def process_and_split(self, file_path: str) -> List[Document]:
+        """
+        Load and split a file into a list of Documents.
+        Prefer `iter_chunks` / `ingest_file` for large files.
+        """
+        return list(self.iter_chunks(file_path))
+
+    def ingest_file(self, file_path: str, vector_manager, user_id: Optional[str] = None,
+                    access_level: str = "private") -> dict:
+        """
+        Stream a file into the vector store in bounded batches.
+
+        The chunk generator is handed straight to `add_documents`, whose pipelined
+        writer pulls `batch_size` chunks at a time. Returns ingestion stats for the
+        file, including the peak RSS sampled at every batch boundary.
+        """
+        start = time.perf_counter()
+        peak_rss = current_rss_bytes()
+        total_chunks = 0
+
+        def tracked_chunks() -> Iterator[Document]:
+            nonlocal peak_rss, total_chunks
+            for doc in self.iter_chunks(file_path):
+                total_chunks += 1
+                if total_chunks % self.batch_size == 0:
+                    peak_rss = max(peak_rss, current_rss_bytes())
+                yield doc
+
+        write_stats = vector_manager.add_documents(
+            tracked_chunks(), user_id=user_id, access_level=access_level, batch_size=self.batch_size
+        ) or {}
+        peak_rss = max(peak_rss, current_rss_bytes())
+
+        stats = {
+            "file": os.path.basename(file_path),
+            "chunks": total_chunks,
+            "batches": write_stats.get("batches", 0),
+            "written": write_stats.get("documents", 0),
+            "skipped": write_stats.get("skipped", 0),
+            "removed": write_stats.get("removed", 0),
+            "seconds": round(time.perf_counter() - start, 3),
+            "docs_per_sec": write_stats.get("docs_per_sec", 0.0),
+            "peak_rss_mb": round(peak_rss / (1024 * 1024), 1),
+        }
+        print(f"📥 Ingested {stats['chunks']} chunks from {stats['file']} in {stats['seconds']}s "
+              f"({stats['written']} written, {stats['skipped']} unchanged, {stats['removed']} removed, "
+              f"{stats['batches']} batches, "
+              f"peak RSS {stats['peak_rss_mb']} MB)")
+        return stats
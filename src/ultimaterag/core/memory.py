@@ -1,13 +1,120 @@
-from typing import Dict, List, Any
-from langchain_core.chat_history import InMemoryChatMessageHistory
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, BaseMessage
+from typing import Dict, List, Any, Optional, Sequence
+from langchain_core.chat_history import BaseChatMessageHistory, InMemoryChatMessageHistory
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, BaseMessage, message_to_dict, messages_from_dict
 from ultimaterag.config.settings import settings
-from ultimaterag.Database.Connection import get_db_connection
+from ultimaterag.Database.Connection import db_connection
+from ultimaterag.Database.RedisConnection import get_redis_client, get_async_redis_client
+from ultimaterag.core.consolidation import get_consolidation_queue
 from ultimaterag.LLM.connection import get_llm
 from psycopg2.extras import DictCursor
 import json
-from langchain_community.chat_message_histories import RedisChatMessageHistory
 import redis
+import redis.asyncio as aredis
+
+# Compare-and-set trim of the oldest messages. The list is newest-first, so the oldest
+# N messages are its tail. They are dropped only if the tail still holds exactly the
+# items that were archived; messages LPUSHed meanwhile sit at the head and are kept.
+TRIM_OLDEST_SCRIPT = """
+local n = tonumber(ARGV[1])
+local tail = redis.call('LRANGE', KEYS[1], -n, -1)
+if #tail ~= n then
+    return 0
+end
+for i = 1, n do
+    if tail[i] ~= ARGV[i + 1] then
+        return 0
+    end
+end
+redis.call('LTRIM', KEYS[1], 0, -(n + 1))
+return 1
+"""
+
+
+class RedisSessionHistory(BaseChatMessageHistory):
+    """
+    Redis-backed chat history with native async methods, so async chains never block
+    the event loop on history reads/writes.
+
+    Storage-compatible with langchain_community's RedisChatMessageHistory: messages are
+    JSON-serialized and LPUSHed onto "message_store:{session_id}" (index 0 is the newest).
+    """
+
+    def __init__(self, session_id: str, client: redis.Redis, async_client: Optional[aredis.Redis] = None,
+                 key_prefix: str = "message_store:", ttl: Optional[int] = None):
+        self.session_id = session_id
+        self.client = client
+        self.async_client = async_client
+        self.key_prefix = key_prefix
+        self.ttl = ttl
+
+    @property
+    def key(self) -> str:
+        return self.key_prefix + self.session_id
+
+    @staticmethod
+    def _decode(items: List[bytes]) -> List[BaseMessage]:
+        # Stored newest-first; return oldest-first.
+        return messages_from_dict([json.loads(m) for m in items[::-1]])
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        return self._decode(self.raw_messages())
+
+    def raw_messages(self) -> List[bytes]:
+        """Serialized messages as stored (newest first)."""
+        return self.client.lrange(self.key, 0, -1)
+
+    def trim_oldest(self, expected: List[bytes]) -> bool:
+        """
+        Atomically remove the oldest len(expected) messages, provided they are still
+        exactly `expected` (as returned by `raw_messages()[-n:]`). Returns False, and
+        changes nothing, if the history was modified underneath (cleared, trimmed).
+        """
+        if not expected:
+            return True
+        return bool(self.client.eval(TRIM_OLDEST_SCRIPT, 1, self.key, len(expected), *expected))
+
+    def add_message(self, message: BaseMessage) -> None:
+        self.add_messages([message])
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        if not messages:
+            return
+        pipe = self.client.pipeline()
+        pipe.lpush(self.key, *[json.dumps(message_to_dict(m)) for m in messages])
+        if self.ttl:
+            pipe.expire(self.key, self.ttl)
+        pipe.execute()
+
+    def clear(self) -> None:
+        self.client.delete(self.key)
+
+    async def aget_messages(self) -> List[BaseMessage]:
+        if self.async_client is None:
+            return await super().aget_messages()
+        return self._decode(await self.async_client.lrange(self.key, 0, -1))
+
+    async def alen(self) -> int:
+        """Number of stored messages (LLEN, no payload transfer)."""
+        if self.async_client is None:
+            return self.client.llen(self.key)
+        return await self.async_client.llen(self.key)
+
+    async def aadd_messages(self, messages: Sequence[BaseMessage]) -> None:
+        if self.async_client is None:
+            return await super().aadd_messages(messages)
+        if not messages:
+            return
+        async with self.async_client.pipeline() as pipe:
+            pipe.lpush(self.key, *[json.dumps(message_to_dict(m)) for m in messages])
+            if self.ttl:
+                pipe.expire(self.key, self.ttl)
+            await pipe.execute()
+
+    async def aclear(self) -> None:
+        if self.async_client is None:
+            return await super().aclear()
+        await self.async_client.delete(self.key)
 
 
 class MemoryManager:
@@ -16,49 +123,35 @@ class MemoryManager:
         self.redis_url = settings.REDIS_URL
         self.window_size = settings.MEMORY_WINDOW_SIZE
         self.threshold = settings.MEMORY_WINDOW_LIMIT # N
+        # Shared pooled clients; sessions borrow connections instead of opening their own.
+        self.redis = get_redis_client()
+        self.async_redis = get_async_redis_client()
         self._init_db()
 
     def _init_db(self):
-        """Initialize the long-term memory table if it doesn't exist."""
+        """Create/upgrade the long-term memory tables (versioned migrations)."""
         # Only initialize DB if we are using Postgres. 
         # If using Chroma, we simply skip long-term SQL memory for now or should implement valid fallback.
         if settings.VECTOR_DB_TYPE != "postgres":
             return
 
         try:
-            conn = get_db_connection()
-            if conn:
-                with conn.cursor() as cur:
-                    # Note: Path might need adjustment depending on where python is run
-                    # We assume running from root
-                    import os
-                    schema_path = "src/ultimaterag/Database/schema.sql"
-                    if not os.path.exists(schema_path):
-                         # Fallback for dev environment or different CWD
-                         schema_path = os.path.join(os.path.dirname(__file__), "../Database/schema.sql")
-                         
-                    if os.path.exists(schema_path):     
-                        with open(schema_path, "r") as f:
-                            schema_sql = f.read().replace("{{EMBEDDING_DIMENSION}}", str(settings.EMBEDDING_DIMENSION))
-                            cur.execute(schema_sql)
-                        conn.commit()
-                    else:
-                        print(f"Warning: Schema file not found at {schema_path}")
-                conn.close()
+            from ultimaterag.Database.Schema import ensure_schema
+            ensure_schema()
         except Exception as e:
             print(f"Warning: Failed to init DB: {e}")
 
-    def get_session_memory(self, session_id: str) -> RedisChatMessageHistory:
+    def get_session_memory(self, session_id: str) -> RedisSessionHistory:
         """
         Get or create a memory buffer for a specific session using Redis.
         """
-        return RedisChatMessageHistory(session_id=session_id, url=self.redis_url)
+        return RedisSessionHistory(session_id, self.redis, self.async_redis)
 
-    def _apply_window(self, memory: RedisChatMessageHistory):
+    def _apply_window(self, memory: RedisSessionHistory):
         """
         Enforce sliding window size on messages (handled by consolidation now, but kept for safety).
         """
-        # RedisChatMessageHistory doesn't strictly enforce window on add, 
+        # RedisSessionHistory doesn't strictly enforce window on add, 
         # so we rely on enforce_memory_consolidation.
         pass
 
@@ -96,33 +189,38 @@ class MemoryManager:
             
         # Also clear from DB if using postgres
         if settings.VECTOR_DB_TYPE == "postgres":
-            conn = get_db_connection()
-            if conn:
-                try:
+            try:
+                with db_connection() as conn:
                     with conn.cursor() as cur:
                         cur.execute("DELETE FROM long_term_memories WHERE session_id = %s", (session_id,))
                     conn.commit()
-                    print(f"Long-term memory cleared for {session_id}")
-                except Exception as e:
-                    print(f"Error clearing long-term memory: {e}")
-                finally:
-                    conn.close()
+                print(f"Long-term memory cleared for {session_id}")
+            except Exception as e:
+                print(f"Error clearing long-term memory: {e}")
+
+    def schedule_consolidation(self, session_id: str) -> bool:
+        """
+        Queue a consolidation check for the session on the background workers.
+        Returns immediately; repeated calls for the same session are merged.
+        """
+        return get_consolidation_queue().submit(session_id, self.enforce_memory_consolidation)
 
     def enforce_memory_consolidation(self, session_id: str):
         """
         Check if short-term memory exceeds limit N. If so, summarize oldest N and archive to DB.
         """
         memory = self.get_session_memory(session_id)
-        messages = memory.messages
+        # One snapshot of the stored list; the trim below is checked against it.
+        raw = memory.raw_messages()
         
         # Check against threshold N (Total messages)
         # Assuming threshold counts individual messages (Human + AI)
-        if len(messages) > self.threshold:
+        if len(raw) > self.threshold:
             print(f"Consolidating memory for session {session_id} (Size > {self.threshold})...")
             
-            # 1. Slice: Oldest N messages
-            messages_to_archive = messages[:self.threshold]
-            remaining_messages = messages[self.threshold:]
+            # 1. Slice: Oldest N messages (the tail of the newest-first list)
+            raw_to_archive = raw[-self.threshold:]
+            messages_to_archive = memory._decode(raw_to_archive)
             
             # 2. Transform: LLM Summarization
             llm = get_llm()
@@ -156,38 +254,22 @@ class MemoryManager:
                 if not summary:
                     summary = content # Fallback
                 
-                # 3. Persist to DB (Only if Postgres)
+                # 3. Persist to DB (Only if Postgres), 4. Trim the archived messages from Redis.
+                # The insert is committed only if the compare-and-set trim succeeds, so a
+                # concurrent clear/trim never leaves a summary for messages still in Redis.
                 if settings.VECTOR_DB_TYPE == "postgres":
-                    conn = get_db_connection()
-                    if conn:
+                    with db_connection() as conn:
                         with conn.cursor() as cur:
                             cur.execute(
                                 "INSERT INTO long_term_memories (session_id, summary_chunk, key_concepts) VALUES (%s, %s, %s)",
                                 (session_id, summary, json.dumps(key_concepts))
                             )
-                        conn.commit()
-                        conn.close()
-                        print("Summary and Key Concepts stored in DB.")
-                    
-                    print("Summary and Key Concepts stored in DB.")
-                    
-                    # 4. Flush & Reset: Remove the oldest N messages from Redis
-                    # RedisChatMessageHistory stores messages in a LIST at key "message_store:{session_id}" (default prefix is 'message_store:')
-                    # However, langchain-community's RedisChatMessageHistory might use a configurable key.
-                    # Default key is just session_id or with prefix. Let's inspect or use a separate redis client connection.
-                    
-                    # We can use the redis client inside the memory object if exposed, or create a new one.
-                    # Creating a lightweight connection here for the trim operation.
-                    r_client = redis.Redis.from_url(self.redis_url)
-                    redis_key = f"message_store:{session_id}" # Default langchain prefix
-                    
-                    # LPOP N times to remove the oldest N
-                    # (Redis List: Left is Oldest, Right is Newest usually in LangChain implementation? 
-                    # LangChain appends to the end (RPUSH), so index 0 is oldest. LPOP removes from left/oldest.)
-                    for _ in range(self.threshold):
-                        r_client.lpop(redis_key)
-                        
-                    print(f"Short-term memory flushed. Removed oldest {self.threshold} messages.")
+                        if memory.trim_oldest(raw_to_archive):
+                            conn.commit()
+                            print(f"Summary stored; removed oldest {self.threshold} messages from short-term memory.")
+                        else:
+                            conn.rollback()
+                            print(f"Session {session_id} changed during consolidation; skipped archive.")
                     
             except Exception as e:
                 print(f"Error during memory consolidation: {e}")
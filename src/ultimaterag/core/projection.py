@@ -0,0 +1,145 @@
+import hashlib
+import io
+import threading
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+N_COMPONENTS = 3
+RANDOM_SEED = 42
+
+
+class CorpusProjection:
+    """
+    Corpus-wide linear map from embedding space to 3D for the visualizer.
+
+    The basis is an IncrementalPCA updated with every ingested batch until
+    `fit_samples` embeddings have been seen, then frozen, so coordinates stay
+    comparable across queries and can be stored per chunk. Until the first PCA
+    update a seeded random projection is used. Projecting is `(X - mean) @ components.T`.
+    `version` identifies the current basis; coordinates stored under another version are stale.
+    """
+
+    def __init__(self, fit_samples: int):
+        self.fit_samples = fit_samples
+        self.dimension: Optional[int] = None
+        self.mean: Optional[np.ndarray] = None
+        self.components: Optional[np.ndarray] = None  # (3, dimension)
+        self.method = "none"
+        self.frozen = False
+        self.version = ""
+        self._ipca = None
+        self._buffer: List[np.ndarray] = []
+        self._lock = threading.Lock()
+
+    @property
+    def samples_seen(self) -> int:
+        return int(self._ipca.n_samples_seen_) if self._ipca is not None else 0
+
+    def _set_basis(self, mean: np.ndarray, components: np.ndarray, method: str):
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.components = np.asarray(components, dtype=np.float32)
+        self.method = method
+        digest = hashlib.sha256(self.mean.tobytes() + self.components.tobytes()).hexdigest()[:16]
+        self.version = f"{method}-{digest}"
+
+    def _random_basis(self, dimension: int):
+        rng = np.random.default_rng(RANDOM_SEED)
+        components = rng.standard_normal((N_COMPONENTS, dimension)) / np.sqrt(dimension)
+        self._set_basis(np.zeros(dimension), components, "random")
+
+    def _reset(self, dimension: int):
+        # Caller holds _lock. A different embedding size means a different model: start over.
+        self.dimension = dimension
+        self.frozen = False
+        self._ipca = None
+        self._buffer = []
+        self._random_basis(dimension)
+
+    def partial_fit(self, vectors: Sequence[Sequence[float]]) -> bool:
+        """Update the basis with ingested embeddings. Returns True if the basis changed."""
+        batch = np.asarray(vectors, dtype=np.float32)
+        if batch.ndim != 2 or not len(batch):
+            return False
+        with self._lock:
+            if self.dimension != batch.shape[1]:
+                self._reset(batch.shape[1])
+            if self.frozen:
+                return False
+
+            self._buffer.append(batch)
+            pending = np.concatenate(self._buffer)
+            # IncrementalPCA needs at least n_components rows per update
+            if len(pending) < N_COMPONENTS:
+                return False
+            self._buffer = []
+
+            if self._ipca is None:
+                from sklearn.decomposition import IncrementalPCA
+                self._ipca = IncrementalPCA(n_components=N_COMPONENTS)
+            self._ipca.partial_fit(pending.astype(np.float64))
+            self._set_basis(self._ipca.mean_, self._ipca.components_, "pca")
+            self.frozen = self.samples_seen >= self.fit_samples
+            return True
+
+    def transform(self, vectors: Sequence[Sequence[float]]) -> np.ndarray:
+        """(n, 3) float32 coordinates; a single matrix multiply."""
+        return self.transform_versioned(vectors)[0]
+
+    def transform_versioned(self, vectors: Sequence[Sequence[float]]) -> Tuple[np.ndarray, str]:
+        """Coordinates together with the version of the basis that produced them."""
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix[None, :]
+        with self._lock:
+            if self.dimension != matrix.shape[1]:
+                self._reset(matrix.shape[1])
+            mean, components, version = self.mean, self.components, self.version
+        return (matrix - mean) @ components.T, version
+
+    def to_bytes(self) -> bytes:
+        with self._lock:
+            if self.mean is None:
+                raise ValueError("Projection has no basis yet (no embeddings seen)")
+            arrays = {"mean": self.mean, "components": self.components,
+                      "frozen": np.array(self.frozen), "method": np.array(self.method)}
+            if self._ipca is not None:
+                for name in ("singular_values_", "var_", "n_samples_seen_"):
+                    arrays[name] = np.asarray(getattr(self._ipca, name))
+            buffer = io.BytesIO()
+            np.savez(buffer, **arrays)
+            return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes, fit_samples: int) -> "CorpusProjection":
+        projection = cls(fit_samples)
+        with np.load(io.BytesIO(data)) as arrays:
+            projection.dimension = int(arrays["mean"].shape[0])
+            projection._set_basis(arrays["mean"], arrays["components"], str(arrays["method"]))
+            projection.frozen = bool(arrays["frozen"])
+            if "n_samples_seen_" in arrays:
+                # Restore the attributes IncrementalPCA.partial_fit continues from
+                from sklearn.decomposition import IncrementalPCA
+                ipca = IncrementalPCA(n_components=N_COMPONENTS)
+                ipca.components_ = arrays["components"].astype(np.float64)
+                ipca.mean_ = arrays["mean"].astype(np.float64)
+                ipca.singular_values_ = arrays["singular_values_"]
+                ipca.var_ = arrays["var_"]
+                ipca.n_samples_seen_ = arrays["n_samples_seen_"]
+                ipca.n_components_ = N_COMPONENTS
+                ipca.n_features_in_ = projection.dimension
+                projection._ipca = ipca
+        # A smaller fit target than the one the basis was built with freezes it now
+        projection.frozen = projection.frozen or (
+            projection._ipca is not None and projection.samples_seen >= fit_samples)
+        return projection
+
+    def stats(self) -> dict:
+        return {
+            "method": self.method,
+            "version": self.version,
+            "dimension": self.dimension,
+            "samples_seen": self.samples_seen,
+            "fit_samples": self.fit_samples,
+            "frozen": self.frozen,
+        }
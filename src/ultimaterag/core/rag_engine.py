@@ -1,112 +1,292 @@
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.runnables import RunnableLambda, RunnablePassthrough
 from langchain_core.runnables.history import RunnableWithMessageHistory
+from langchain_core.messages import AIMessage, HumanMessage
+import hashlib
 
 from ultimaterag.core.vector_store import VectorManager
+from ultimaterag.core.vector_db.base import build_access_filter, project_points
 from ultimaterag.core.memory import MemoryManager
+from ultimaterag.core.concurrency import run_blocking
+from ultimaterag.core.rerank import get_reranker
+from ultimaterag.core.answer_cache import CachedAnswer, get_answer_cache, usage_tokens
 from ultimaterag.config.settings import settings
 from ultimaterag.LLM.connection import get_llm
-from ultimaterag.Prompts.SystemPrompt import SYSTEM_PROMPT
+from ultimaterag.Prompts.manager import PromptManager
+from ultimaterag.utils.LRU_Cache import LRUCache
+
+CONTEXT_K = 4 # Chunks passed to the LLM
+VISUALIZATION_K = 10 # Points returned for the vector space visualizer
 
 class RAGPipeline:
     def __init__(self):
         self.vector_manager = VectorManager()
         self.memory_manager = MemoryManager()
         self.llm = get_llm()
+        self.chain_cache = LRUCache(settings.CHAIN_CACHE_SIZE)
+        self.reranker = get_reranker()
+        self.answer_cache = get_answer_cache()
 
         # Retriever runnable (Default)
         # We will generate specific retrievers per query for filtering
         self.base_retriever = self.vector_manager.get_retriever()
 
-    def _retrieve_context(self, question: str, user_id: str = None):
-        # Create a dynamic retriever with filter
+    def _retrieve(self, question: str, user_id: str = None, k: int = CONTEXT_K, with_vectors: bool = False,
+                  search_mode: str = None):
+        """
+        Single retrieval pass under the RBAC filter.
+        Returns (documents, query_embedding, document_embeddings); embeddings are only
+        fetched when `with_vectors` is set (i.e. for visualization, which is always dense).
+        """
         # Logic: (user_id == current_user) OR (access_level == "common")
-        
-        filter_criteria = {}
-        
-        if user_id:
-            filter_criteria = {
-                "$or": [
-                    {"user_id": user_id},
-                    {"access_level": "common"}
-                ]
-            }
-        else:
-            # If no user_id, only show common data (public access)
-            filter_criteria = {"access_level": "common"}
-            
-        retriever = self.vector_manager.get_retriever(search_kwargs={"filter": filter_criteria})
-        docs = retriever.invoke(question)
+        filter_criteria = build_access_filter(user_id)
+        if with_vectors:
+            return self.vector_manager.similarity_search_with_vectors(question, k=k, filter=filter_criteria)
+        return self.vector_manager.search(question, k=k, filter=filter_criteria, mode=search_mode), None, []
+
+    def _retrieve_context(self, question: str, user_id: str = None, search_mode: str = None):
+        docs, _, _ = self._retrieve(question, user_id=user_id, search_mode=search_mode)
         return "\n\n".join(d.page_content for d in docs)
 
     def _get_session_history(self, session_id: str):
         return self.memory_manager.get_session_memory(session_id)
 
     def ingest_file(self, file_path: str, user_id: str = None, access_level: str = "private"):
+        return self.ingest_file_with_stats(file_path, user_id=user_id, access_level=access_level)["chunks"]
+
+    def ingest_file_with_stats(self, file_path: str, user_id: str = None, access_level: str = "private") -> dict:
+        """
+        Stream a file into the vector store and return ingestion stats (chunks, batches, peak RSS).
+        """
         from ultimaterag.core.ingestion import IngestionManager
         ingester = IngestionManager()
-        docs = ingester.process_and_split(file_path)
-        self.vector_manager.add_documents(docs, user_id=user_id, access_level=access_level)
-        return len(docs)
+        return ingester.ingest_file(file_path, self.vector_manager, user_id=user_id, access_level=access_level)
 
-    def query(self, session_id: str, query_text: str, system_prompt: str = None, 
-              user_id: str = None, model_params: dict = None) -> dict:
-        
-        # 0. Configure LLM with params
+    def _configure_llm(self, model_params: dict = None):
         _llm = self.llm
         if model_params:
             if "temperature" in model_params:
                 _llm = _llm.bind(temperature=model_params["temperature"])
             # Add other params like max_tokens if needed by the provider
             # OpenAI supports max_tokens via bind as well usually, or we recreate the object
-        
-        # 1. Build Prompt dynamically
-        from ultimaterag.Prompts.manager import PromptManager
-        prompt_template = PromptManager.get_chat_prompt(system_prompt)
+        return _llm
 
-        # 2. Define Chain
-        def retrieve(inputs):
-            context = self._retrieve_context(inputs["question"], user_id=user_id)
-            return {**inputs, "context": context}
+    @staticmethod
+    def _chain_key(system_prompt: str = None, model_params: dict = None) -> tuple:
+        prompt_hash = hashlib.sha256((system_prompt or "").encode("utf-8")).hexdigest()
+        params = tuple(sorted((k, repr(v)) for k, v in (model_params or {}).items()))
+        return prompt_hash, params
 
-        rag_chain = (
-            RunnablePassthrough()
-            | RunnableLambda(retrieve)
-            | prompt_template
-            | _llm
+    def _get_chain(self, system_prompt: str = None, model_params: dict = None) -> RunnableWithMessageHistory:
+        """
+        Compiled chain for this prompt + model params, reused across requests.
+        The chain holds no per-user state (retrieval and the session are passed per call),
+        so it is shared by all users with the same settings.
+        """
+        return self.chain_cache.get_or_create(
+            self._chain_key(system_prompt, model_params),
+            lambda: self._build_chain(system_prompt, model_params),
         )
 
-        rag_with_memory = RunnableWithMessageHistory(
+    def _build_chain(self, system_prompt: str = None, model_params: dict = None) -> RunnableWithMessageHistory:
+        prompt_template = PromptManager.get_chat_prompt(system_prompt)
+
+        # Context is retrieved before the chain runs, so the chain is prompt -> llm
+        rag_chain = prompt_template | self._configure_llm(model_params)
+
+        return RunnableWithMessageHistory(
             rag_chain,
             self._get_session_history,
             input_messages_key="question",
             history_messages_key="chat_history",
         )
 
+    def _select_context(self, query_text: str, docs: list) -> list:
+        """Top CONTEXT_K chunks, reordered by the cross-encoder when reranking is enabled."""
+        if self.reranker is not None:
+            return self.reranker.rerank(query_text, docs, top_n=CONTEXT_K)
+        return docs[:CONTEXT_K]
+
+    def _retrieve_for_query(self, query_text: str, user_id: str = None, include_visualization: bool = False,
+                            search_mode: str = None):
+        """
+        Returns (context_documents, visualization_retrieval or None).
+
+        Dense mode retrieves once: with visualization we fetch the wider neighbourhood
+        (with embeddings) and take the LLM context from it. Keyword/hybrid context
+        comes from its own search; the visualization still shows the dense neighbourhood.
+        With reranking, RERANK_CANDIDATES chunks are retrieved and reranked down to CONTEXT_K.
+        """
+        mode = (search_mode or settings.RETRIEVAL_MODE).lower()
+        candidates = settings.RERANK_CANDIDATES if self.reranker is not None else CONTEXT_K
+        visualization = None
+        if include_visualization:
+            visualization = self._retrieve(query_text, user_id=user_id, k=max(CONTEXT_K, VISUALIZATION_K),
+                                           with_vectors=True)
+            if mode == "vector":
+                return self._select_context(query_text, visualization[0]), visualization
+
+        docs, _, _ = self._retrieve(query_text, user_id=user_id, k=max(CONTEXT_K, candidates), search_mode=mode)
+        return self._select_context(query_text, docs), visualization
+
+    def _build_result(self, response, model_params: dict, query_text: str, visualization) -> dict:
+        result = {
+            "content": response.content,
+            "usage_metadata": response.response_metadata if hasattr(response, "response_metadata") else {},
+            "params": model_params
+        }
+
+        # Visualization data, projected from the same retrieval (only when requested)
+        if visualization is not None:
+            docs, query_embedding, doc_embeddings = visualization
+            result["visualization"] = project_points(query_text, query_embedding, docs, doc_embeddings,
+                                                     self.vector_manager.projection)
+
+        return result
+
+    async def _is_standalone(self, session_id: str) -> bool:
+        history = self._get_session_history(session_id)
+        if hasattr(history, "alen"):
+            return await history.alen() == 0
+        return not await history.aget_messages()
+
+    async def _cache_lookup(self, session_id: str, query_text: str, user_id: str = None,
+                            system_prompt: str = None, model_params: dict = None, search_mode: str = None):
+        """
+        Probe the semantic answer cache. Only standalone questions (empty session history)
+        are served or stored: a follow-up's answer depends on the conversation.
+        Returns (hit or None, pending) where `pending` is what `_cache_store` needs
+        (None when the cache does not apply).
+        """
+        cache = self.answer_cache
+        if cache is None or not await self._is_standalone(session_id):
+            return None, None
+        generation = cache.generation(user_id)
+        bucket = cache.bucket_key(user_id, system_prompt, model_params, search_mode)
+        embedding = await run_blocking(self.vector_manager.embed_query, query_text)
+        return cache.lookup(bucket, embedding), (bucket, embedding, generation)
+
+    def _cache_store(self, pending, answer: str, usage: dict, sources: list, tokens: int = None):
+        if pending is None:
+            return
+        bucket, embedding, generation = pending
+        if tokens is None:
+            tokens = usage_tokens(usage)
+        self.answer_cache.store(
+            bucket, embedding,
+            CachedAnswer(answer=answer, usage=usage or {}, sources=sources, tokens=tokens),
+            generation=generation,
+        )
+
+    async def _record_cached_turn(self, session_id: str, query_text: str, answer: str):
+        # A cached answer skips the chain, so write the turn to the session history ourselves
+        await self._get_session_history(session_id).aadd_messages(
+            [HumanMessage(content=query_text), AIMessage(content=answer)]
+        )
+
+    @staticmethod
+    def _sources(docs: list) -> list:
+        return [{"content": d.page_content, "metadata": d.metadata} for d in docs]
+
+    def query(self, session_id: str, query_text: str, system_prompt: str = None, 
+              user_id: str = None, model_params: dict = None, include_visualization: bool = False,
+              search_mode: str = None) -> dict:
+        
+        # 1. Retrieve
+        docs, visualization = self._retrieve_for_query(query_text, user_id, include_visualization, search_mode)
+        context = "\n\n".join(d.page_content for d in docs)
+
+        # 2. Build prompt + chain, 3. Generate
+        rag_with_memory = self._get_chain(system_prompt, model_params)
         response = rag_with_memory.invoke(
-            {"question": query_text},
+            {"question": query_text, "context": context},
             config={"configurable": {"session_id": session_id}},
         )
         
-        # 3. Get Visualization Data
-        # We perform a separate search to get the embeddings for visualization
-        # This ensures we get the exact points in vector space
-        viz_data = self.vector_manager.search_with_embeddings(
-            query=query_text,
-            user_id=user_id,
-            k=10 # Visualize top 10
+        # 4. Queue a memory consolidation check (summarization runs on background workers)
+        self.memory_manager.schedule_consolidation(session_id)
+
+        return self._build_result(response, model_params, query_text, visualization)
+
+    async def aquery(self, session_id: str, query_text: str, system_prompt: str = None,
+                     user_id: str = None, model_params: dict = None, include_visualization: bool = False,
+                     search_mode: str = None) -> dict:
+        """
+        Async version of `query` for request handlers.
+
+        The LLM call and Redis history use native async clients; retrieval (embedding +
+        vector search) runs on the bounded thread pool, so the event loop stays free to
+        serve other chats. Memory consolidation is queued to the background workers.
+        Near-identical standalone questions may be answered from the semantic answer cache.
+        """
+        hit, pending = None, None
+        if not include_visualization:
+            hit, pending = await self._cache_lookup(session_id, query_text, user_id, system_prompt,
+                                                    model_params, search_mode)
+        if hit is not None:
+            await self._record_cached_turn(session_id, query_text, hit.answer)
+            return {"content": hit.answer, "usage_metadata": hit.usage, "params": model_params, "cached": True}
+
+        docs, visualization = await run_blocking(self._retrieve_for_query, query_text, user_id,
+                                                 include_visualization, search_mode)
+        context = "\n\n".join(d.page_content for d in docs)
+
+        rag_with_memory = self._get_chain(system_prompt, model_params)
+        response = await rag_with_memory.ainvoke(
+            {"question": query_text, "context": context},
+            config={"configurable": {"session_id": session_id}},
         )
-        
-        # 4. Check & Consolidate Memory (Fire and forget, or sync)
-        # We do this after response generation to not latency the user (ideally async, but sync for now)
-        try:
-            self.memory_manager.enforce_memory_consolidation(session_id)
-        except Exception as e:
-            print(f"Memory consolidation failed: {e}")
-
-        return {
-            "content": response.content,
-            "usage_metadata": response.response_metadata if hasattr(response, "response_metadata") else {},
-            "params": model_params,
-            "visualization": viz_data
-        }
+
+        self.memory_manager.schedule_consolidation(session_id)
+
+        result = self._build_result(response, model_params, query_text, visualization)
+        self._cache_store(pending, response.content, result["usage_metadata"], self._sources(docs),
+                          tokens=usage_tokens(getattr(response, "usage_metadata", None) or result["usage_metadata"]))
+        result["cached"] = False
+        return result
+
+    async def astream_query(self, session_id: str, query_text: str, system_prompt: str = None,
+                            user_id: str = None, model_params: dict = None, include_sources: bool = True,
+                            search_mode: str = None):
+        """
+        Stream a chat turn as events: retrieved sources first, then LLM tokens as they
+        arrive, then a final "done" event. The assembled answer is written to the
+        session history by RunnableWithMessageHistory once the stream completes.
+
+        Yields dicts of the form {"event": "sources" | "token" | "done", "data": ...}.
+        A semantic answer cache hit is sent as a single token event.
+        """
+        hit, pending = await self._cache_lookup(session_id, query_text, user_id, system_prompt,
+                                                model_params, search_mode)
+        if hit is not None:
+            await self._record_cached_turn(session_id, query_text, hit.answer)
+            if include_sources:
+                yield {"event": "sources", "data": hit.sources}
+            yield {"event": "token", "data": hit.answer}
+            yield {"event": "done", "data": {"session_id": session_id, "usage": hit.usage,
+                                             "params": model_params, "cached": True}}
+            return
+
+        docs, _ = await run_blocking(self._retrieve_for_query, query_text, user_id, False, search_mode)
+        context = "\n\n".join(d.page_content for d in docs)
+        sources = self._sources(docs)
+
+        if include_sources:
+            yield {"event": "sources", "data": sources}
+
+        rag_with_memory = self._get_chain(system_prompt, model_params)
+        usage = {}
+        parts = []
+        async for chunk in rag_with_memory.astream(
+            {"question": query_text, "context": context},
+            config={"configurable": {"session_id": session_id}},
+        ):
+            if getattr(chunk, "usage_metadata", None):
+                usage = chunk.usage_metadata
+            if chunk.content:
+                parts.append(chunk.content)
+                yield {"event": "token", "data": chunk.content}
+
+        self.memory_manager.schedule_consolidation(session_id)
+        self._cache_store(pending, "".join(parts), usage, sources)
+
+        yield {"event": "done", "data": {"session_id": session_id, "usage": usage, "params": model_params,
+                                         "cached": False}}
@@ -0,0 +1,124 @@
+import hashlib
+import importlib.util
+import threading
+from typing import List, Optional, Sequence
+
+from langchain_core.documents import Document
+from ultimaterag.config.settings import settings
+from ultimaterag.utils.LRU_Cache import LRUCache
+
+
+def chunk_key(doc: Document) -> str:
+    """Stable chunk identity: the store's ID when present, else a hash of the content."""
+    doc_id = getattr(doc, "id", None) or (doc.metadata or {}).get("id")
+    if doc_id:
+        return str(doc_id)
+    return hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+
+
+class Reranker:
+    """
+    Scores (query, chunk) pairs and reorders retrieved chunks by relevance.
+    Only pairs missing from the score cache are sent to the model, in batches.
+    Subclasses implement `_predict`.
+    """
+
+    model_name = "reranker"
+
+    def __init__(self, batch_size: int = 32, cache_size: int = 0):
+        self.batch_size = batch_size
+        self.cache = LRUCache(cache_size)
+        self.pairs_scored = 0
+
+    def _predict(self, pairs: List[tuple]) -> List[float]:
+        raise NotImplementedError
+
+    def score(self, query: str, documents: Sequence[Document]) -> List[float]:
+        query_hash = hashlib.sha256(query.encode("utf-8")).hexdigest()
+        keys = [(self.model_name, query_hash, chunk_key(doc)) for doc in documents]
+        scores = [self.cache.get(key) for key in keys]
+
+        missing = [i for i, s in enumerate(scores) if s is None]
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            predicted = self._predict([(query, documents[i].page_content) for i in batch])
+            for i, value in zip(batch, predicted):
+                scores[i] = float(value)
+                self.cache.put(keys[i], scores[i])
+            self.pairs_scored += len(batch)
+        return scores
+
+    def rerank(self, query: str, documents: Sequence[Document], top_n: Optional[int] = None,
+               min_score: Optional[float] = None) -> List[Document]:
+        """
+        Documents sorted by score (best first), cut to `top_n` and to scores >= `min_score`.
+        Each returned document carries its score in metadata["rerank_score"].
+        """
+        if not documents:
+            return []
+        scored = sorted(zip(self.score(query, documents), documents), key=lambda item: item[0], reverse=True)
+        if min_score is not None:
+            scored = [item for item in scored if item[0] >= min_score]
+        if top_n is not None:
+            scored = scored[:top_n]
+        return [
+            Document(page_content=doc.page_content, metadata={**(doc.metadata or {}), "rerank_score": score})
+            for score, doc in scored
+        ]
+
+    def stats(self) -> dict:
+        return {"model": self.model_name, "pairs_scored": self.pairs_scored, "score_cache": self.cache.stats()}
+
+
+class CrossEncoderReranker(Reranker):
+    """
+    Local cross-encoder (sentence-transformers), e.g. ms-marco-MiniLM: one small forward
+    pass per batch of pairs instead of one LLM round-trip per chunk. Loaded on first use.
+    """
+
+    def __init__(self, model_name: str, device: str = "cpu", batch_size: int = 32, cache_size: int = 0):
+        super().__init__(batch_size=batch_size, cache_size=cache_size)
+        self.model_name = model_name
+        self.device = device
+        self._model = None
+        self._load_lock = threading.Lock()
+
+    def _get_model(self):
+        with self._load_lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+                print(f"🔁 Loading reranker {self.model_name} on {self.device}")
+                self._model = CrossEncoder(self.model_name, device=self.device)
+            return self._model
+
+    def _predict(self, pairs: List[tuple]) -> List[float]:
+        return self._get_model().predict(pairs, batch_size=self.batch_size, show_progress_bar=False).tolist()
+
+
+_reranker: Optional[Reranker] = None
+_reranker_unavailable = False
+_reranker_lock = threading.Lock()
+
+
+def get_reranker() -> Optional[Reranker]:
+    """
+    Process-wide reranker, or None when RERANK_ENABLED is off or sentence-transformers
+    is not installed (callers then keep their previous behaviour).
+    """
+    global _reranker, _reranker_unavailable
+    if not settings.RERANK_ENABLED or _reranker_unavailable:
+        return None
+    with _reranker_lock:
+        if _reranker is None:
+            if importlib.util.find_spec("sentence_transformers") is None:
+                _reranker_unavailable = True
+                print("⚠️ RERANK_ENABLED is set but sentence-transformers is not installed "
+                      "(pip install \"ultimaterag[rerank]\"); reranking disabled.")
+                return None
+            _reranker = CrossEncoderReranker(
+                settings.RERANK_MODEL,
+                device=settings.RERANK_DEVICE,
+                batch_size=settings.RERANK_BATCH_SIZE,
+                cache_size=settings.RERANK_CACHE_SIZE,
+            )
+        return _reranker
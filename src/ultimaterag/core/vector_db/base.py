@@ -1,22 +1,355 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional, Any
+from typing import Dict, Iterable, List, Optional, Any, Sequence, Set, Tuple
 from langchain_core.documents import Document
+from ultimaterag.config.settings import settings
+from ultimaterag.core.projection import CorpusProjection
+import hashlib
+import json
+import threading
+import numpy as np
+
+SEARCH_MODES = ("vector", "keyword", "hybrid")
+
+
+def build_access_filter(user_id: Optional[str] = None) -> dict:
+    """
+    RBAC filter: (user_id == current_user) OR (access_level == "common").
+    Without a user_id only common (public) data is visible.
+    """
+    if user_id:
+        return {"$or": [{"user_id": user_id}, {"access_level": "common"}]}
+    return {"access_level": "common"}
+
+
+def chunk_id(content: str, metadata: dict) -> str:
+    """
+    Deterministic chunk ID: sha256 of the content and its RBAC-stamped metadata, so the same
+    chunk re-ingested into the same scope maps to the same row, while identical text from
+    another file or owner stays separate.
+    """
+    payload = json.dumps({"content": content, "metadata": metadata}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _doc_key(doc: Document) -> tuple:
+    return doc.page_content, json.dumps(doc.metadata or {}, sort_keys=True, default=str)
+
+
+def reciprocal_rank_fusion(rankings: Sequence[List[Document]], k: int, rrf_k: int = 60,
+                           weights: Optional[Sequence[float]] = None) -> List[Document]:
+    """
+    Fuse ranked lists with (weighted) Reciprocal Rank Fusion: score = sum(w / (rrf_k + rank)).
+    Rank-based, so dense distances and lexical scores need no normalization.
+    """
+    weights = weights or [1.0] * len(rankings)
+    scores, docs = {}, {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, doc in enumerate(ranking, start=1):
+            key = _doc_key(doc)
+            scores[key] = scores.get(key, 0.0) + weight / (rrf_k + rank)
+            docs.setdefault(key, doc)
+    ordered = sorted(scores, key=scores.get, reverse=True)
+    return [docs[key] for key in ordered[:k]]
+
+
+def snippet(text: str, length: int = 100) -> str:
+    return text[:length] + "..." if len(text) > length else text
+
+
+def project_points(query: str, query_embedding: List[float], documents: List[Document],
+                   embeddings: List[List[float]], projection: CorpusProjection) -> dict:
+    """
+    Map the query and document vectors to 3D with the corpus projection for the visualizer.
+    The basis is shared by every request, so maps from different queries line up.
+    """
+    if not documents:
+        return {"query_point": [0,0,0], "points": []}
+
+    reduced_vectors = projection.transform([list(query_embedding)] + [list(v) for v in embeddings]).tolist()
+
+    query_point = {
+        "x": reduced_vectors[0][0], "y": reduced_vectors[0][1], "z": reduced_vectors[0][2],
+        "type": "query", "text": query
+    }
+
+    doc_points = []
+    for vec, doc in zip(reduced_vectors[1:], documents):
+        doc_points.append({
+            "x": vec[0], "y": vec[1], "z": vec[2],
+            "type": "doc",
+            "text": snippet(doc.page_content),
+            "metadata": doc.metadata or {}
+        })
+
+    return {"query_point": query_point, "points": doc_points}
+
 
 class VectorDBBase(ABC):
+    _projection: Optional[CorpusProjection] = None
+    _projection_stamp: Any = None
+    _projection_lock = threading.Lock()
+
     @abstractmethod
-    def add_documents(self, documents: List[Document], user_id: Optional[str] = None, access_level: str = "private"):
-        """Add documents to the vector store."""
+    def add_documents(self, documents: Iterable[Document], user_id: Optional[str] = None,
+                      access_level: str = "private", batch_size: Optional[int] = None) -> dict:
+        """
+        Upsert documents in pipelined batches: each `source` in the upload replaces that
+        source's chunks in the same scope (see `_remove_stale_chunks`). Returns write stats.
+        """
         pass
 
+    @staticmethod
+    def _check_access(user_id: Optional[str], access_level: str):
+        if access_level == "private" and not user_id:
+            raise ValueError("User ID must be provided for private documents.")
+
+    @staticmethod
+    def _access_metadata(doc: Document, user_id: Optional[str], access_level: str) -> dict:
+        """Copy of the document metadata stamped with RBAC fields."""
+        metadata = doc.metadata.copy()
+        if access_level == "private":
+            metadata["user_id"] = user_id
+        metadata["access_level"] = access_level
+        return metadata
+
+    def _prepare_chunks(self, docs: List[Document], user_id: Optional[str], access_level: str,
+                        seen: Dict[str, Optional[str]]) -> List[Document]:
+        """
+        RBAC-stamped copies of `docs` carrying their chunk ID, minus chunks already stored
+        or already seen in this upload (`seen` maps chunk ID -> source and is updated).
+        Runs before embedding, so unchanged chunks are never re-embedded.
+        """
+        chunks = []
+        for doc in docs:
+            metadata = self._access_metadata(doc, user_id, access_level)
+            doc_id = chunk_id(doc.page_content, metadata)
+            if doc_id not in seen:
+                seen[doc_id] = metadata.get("source")
+                chunks.append(Document(id=doc_id, page_content=doc.page_content, metadata=metadata))
+        if not chunks:
+            return []
+        existing = self._existing_chunk_ids([c.id for c in chunks])
+        return [c for c in chunks if c.id not in existing]
+
+    def _existing_chunk_ids(self, ids: List[str]) -> Set[str]:
+        """Which of these chunk IDs are already stored."""
+        return set()
+
+    def _remove_stale_chunks(self, seen: Dict[str, Optional[str]], user_id: Optional[str],
+                             access_level: str) -> int:
+        """
+        After a complete upload, delete each uploaded source's chunks in this scope that the
+        upload did not produce (the previous version of a modified file). Returns rows removed.
+        """
+        by_source: Dict[str, Set[str]] = {}
+        for doc_id, source in seen.items():
+            if source is not None:
+                by_source.setdefault(source, set()).add(doc_id)
+        return sum(self._delete_stale_chunks(source, user_id, access_level, keep)
+                   for source, keep in by_source.items())
+
+    def _delete_stale_chunks(self, source: str, user_id: Optional[str], access_level: str,
+                             keep: Set[str]) -> int:
+        """Delete chunks of `source` in this scope whose ID is not in `keep`."""
+        return 0
+
+    # --- Corpus projection (3D coordinates for the visualizer) ---
+
+    @property
+    def projection(self) -> CorpusProjection:
+        """The corpus projection, loaded from the store on first use."""
+        with self._projection_lock:
+            if self._projection is None:
+                projection = None
+                try:
+                    # Stamp first: a replacement saved meanwhile is then picked up next refresh
+                    self._projection_stamp = self._projection_state_stamp()
+                    state = self._load_projection_state()
+                    if state:
+                        projection = CorpusProjection.from_bytes(state, settings.PROJECTION_FIT_SAMPLES)
+                except Exception as e:
+                    # Unreadable state must not break ingestion: start from a fresh basis
+                    print(f"⚠️ Could not load corpus projection: {e}")
+                self._projection = projection or CorpusProjection(settings.PROJECTION_FIT_SAMPLES)
+            return self._projection
+
+    def _refresh_projection(self):
+        """Reload the basis if another process replaced it (e.g. `projection rebuild --refit`)."""
+        if self._projection is None:
+            return
+        try:
+            stamp = self._projection_state_stamp()
+        except Exception:
+            return
+        if stamp is not None and stamp != self._projection_stamp:
+            with self._projection_lock:
+                self._projection = None
+
+    def _store_projection(self, projection: CorpusProjection):
+        self._save_projection_state(projection.to_bytes())
+        self._projection_stamp = self._projection_state_stamp()
+
+    def _load_projection_state(self) -> Optional[bytes]:
+        """Persisted projection (CorpusProjection.to_bytes), or None."""
+        return None
+
+    def _save_projection_state(self, state: bytes):
+        """Persist the projection so other processes and restarts reuse the same basis."""
+
+    def _projection_state_stamp(self) -> Any:
+        """Cheap token that changes whenever the persisted projection is replaced (None: unknown)."""
+        return None
+
+    def _project_batch(self, embeddings: List[List[float]]) -> Tuple[np.ndarray, str]:
+        """
+        Feed an ingested batch to the projection (until it is frozen) and return the
+        batch's 3D coordinates with the basis version they were computed under.
+        """
+        self._refresh_projection()
+        projection = self.projection
+        if projection.partial_fit(embeddings):
+            try:
+                self._store_projection(projection)
+            except Exception as e:
+                print(f"⚠️ Could not save corpus projection: {e}")
+        return projection.transform_versioned(embeddings)
+
+    def _iter_embeddings(self, page_size: int) -> Iterable[Tuple[List[Any], List[List[float]], List[Optional[str]]]]:
+        """Pages of (row ids, embeddings, stored projection versions) over the whole store."""
+        raise NotImplementedError(f"{type(self).__name__} does not support projection rebuilds")
+
+    def _write_coords(self, ids: List[Any], coords: np.ndarray, version: str):
+        """Store 3D coordinates (computed under `version`) for these rows."""
+        raise NotImplementedError(f"{type(self).__name__} does not support projection rebuilds")
+
+    def _scan_points(self, filter: Optional[dict], cursor: Optional[str], limit: int,
+                     version: str) -> Tuple[List[dict], Optional[str]]:
+        """
+        One page of chunks visible through `filter`, after `cursor`. Each row is a dict with
+        key (row key for _write_coords), id, text, metadata, coords (stored coordinates, or
+        None when missing or not from `version`) and embedding (only set when coords is None).
+        Returns (rows, next cursor or None at the end).
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support point export")
+
+    def export_points(self, user_id: Optional[str] = None, cursor: Optional[str] = None,
+                      limit: int = 1000) -> dict:
+        """
+        A page of projected chunk coordinates in the user's RBAC scope, for full-corpus maps.
+        Uses the stored coordinates; stale ones are re-projected and written back.
+        """
+        self._refresh_projection()
+        projection = self.projection
+        rows, next_cursor = self._scan_points(build_access_filter(user_id), cursor, limit, projection.version)
+
+        coords = np.zeros((len(rows), 3), dtype=np.float32)
+        stale = []
+        for i, row in enumerate(rows):
+            if row["coords"] is None:
+                stale.append(i)
+            else:
+                coords[i] = row["coords"]
+        if stale:
+            projected, version = projection.transform_versioned([rows[i]["embedding"] for i in stale])
+            coords[stale] = projected
+            try:
+                self._write_coords([rows[i]["key"] for i in stale], projected, version)
+            except Exception as e:
+                print(f"⚠️ Could not store re-projected coordinates: {e}")
+
+        return {
+            "ids": [row["id"] for row in rows],
+            "coords": coords,
+            "texts": [snippet(row["text"]) for row in rows],
+            "metadatas": [row["metadata"] for row in rows],
+            "next_cursor": next_cursor,
+            "projection": projection.version,
+        }
+
+    def rebuild_projection(self, refit: bool = False, page_size: int = 1000) -> dict:
+        """
+        Re-project stored chunks whose coordinates are missing or from an older basis.
+        With `refit`, first fit a fresh basis on up to PROJECTION_FIT_SAMPLES stored embeddings
+        (running servers reload it on their next ingest or export).
+        """
+        if refit:
+            projection = CorpusProjection(settings.PROJECTION_FIT_SAMPLES)
+            for _, embeddings, _ in self._iter_embeddings(page_size):
+                projection.partial_fit(embeddings)
+                if projection.samples_seen >= settings.PROJECTION_FIT_SAMPLES:
+                    break
+            if not projection.samples_seen:
+                raise ValueError("Cannot refit the projection: fewer than 3 embeddings are stored")
+            projection.frozen = True
+            with self._projection_lock:
+                self._projection = projection
+            self._store_projection(projection)
+        else:
+            self._refresh_projection()
+            projection = self.projection
+
+        updated = scanned = 0
+        for ids, embeddings, versions in self._iter_embeddings(page_size):
+            scanned += len(ids)
+            stale = [i for i, version in enumerate(versions) if version != projection.version]
+            if stale:
+                self._write_coords([ids[i] for i in stale],
+                                   projection.transform([embeddings[i] for i in stale]), projection.version)
+                updated += len(stale)
+        return {"scanned": scanned, "updated": updated, **projection.stats()}
+
     @abstractmethod
-    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None) -> List[Document]:
-        """Search for similar documents."""
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None,
+                          **search_params) -> List[Document]:
+        """
+        Search for similar documents.
+        `search_params` are backend-specific tuning knobs (e.g. ef_search / probes for
+        pgvector); backends ignore the ones they do not support.
+        """
         pass
 
     @abstractmethod
+    def similarity_search_with_vectors(self, query: str, k: int = 4, filter: Optional[dict] = None,
+                                       **search_params) -> Tuple[List[Document], List[float], List[List[float]]]:
+        """
+        Single-pass search returning (documents, query_embedding, document_embeddings),
+        so one retrieval can feed both the LLM context and the visualization.
+        """
+        pass
+
+    def keyword_search(self, query: str, k: int = 4, filter: Optional[dict] = None) -> List[Document]:
+        """Lexical (full-text) search, for exact terms such as product codes or error IDs."""
+        raise NotImplementedError(f"{type(self).__name__} does not support keyword search")
+
+    def hybrid_search(self, query: str, k: int = 4, filter: Optional[dict] = None,
+                      **search_params) -> List[Document]:
+        """Dense + lexical candidates fused with RRF (HYBRID_* settings)."""
+        candidates = max(k, settings.HYBRID_CANDIDATES)
+        dense = self.similarity_search(query, k=candidates, filter=filter, **search_params)
+        lexical = self.keyword_search(query, k=candidates, filter=filter)
+        return reciprocal_rank_fusion(
+            [dense, lexical], k=k, rrf_k=settings.HYBRID_RRF_K,
+            weights=[settings.HYBRID_VECTOR_WEIGHT, settings.HYBRID_KEYWORD_WEIGHT],
+        )
+
+    def search(self, query: str, k: int = 4, filter: Optional[dict] = None,
+               mode: Optional[str] = None, **search_params) -> List[Document]:
+        """Retrieve with the given mode: "vector", "keyword" or "hybrid" (default RETRIEVAL_MODE)."""
+        mode = (mode or settings.RETRIEVAL_MODE).lower()
+        if mode == "vector":
+            return self.similarity_search(query, k=k, filter=filter, **search_params)
+        if mode == "keyword":
+            return self.keyword_search(query, k=k, filter=filter)
+        if mode == "hybrid":
+            return self.hybrid_search(query, k=k, filter=filter, **search_params)
+        raise ValueError(f"Unsupported search mode: {mode} (expected one of {', '.join(SEARCH_MODES)})")
+
     def search_with_embeddings(self, query: str, user_id: str = None, k: int = 10) -> dict:
         """Search and return documents with embeddings for visualization."""
-        pass
+        docs, query_embedding, embeddings = self.similarity_search_with_vectors(
+            query, k=k, filter=build_access_filter(user_id)
+        )
+        return project_points(query, query_embedding, docs, embeddings, self.projection)
     
     @abstractmethod
     def get_retriever(self, search_kwargs: Optional[dict] = None):
@@ -1,4 +1,4 @@
-from typing import List, Optional, Any
+from typing import Iterable, List, Optional, Any, Tuple
 from langchain_core.documents import Document
 from langchain_core.retrievers import BaseRetriever
 from langchain_core.callbacks import CallbackManagerForRetrieverRun
@@ -6,8 +6,11 @@ from ultimaterag.config.settings import settings
 import chromadb
 from chromadb.config import Settings as ChromaSettings
 from .base import VectorDBBase
-from sklearn.decomposition import PCA
+from .writer import PipelinedWriter
+from .keyword_index import BM25Index
 import numpy as np
+import os
+import threading
 from ultimaterag.LLM.embeddings import get_embedding_model
 
 class CustomChromaRetriever(BaseRetriever):
@@ -19,47 +22,148 @@ class CustomChromaRetriever(BaseRetriever):
     ) -> List[Document]:
         return self.vector_manager.similarity_search(query, **self.search_kwargs)
 
+# Per-chunk 3D coordinates live in reserved metadata keys, hidden from search results
+COORD_KEYS = ("_proj_x", "_proj_y", "_proj_z")
+PROJECTION_VERSION_KEY = "_proj_version"
+PROJECTION_KEYS = COORD_KEYS + (PROJECTION_VERSION_KEY,)
+
+
+def _coords_metadata(point, version: str) -> dict:
+    metadata = {key: float(value) for key, value in zip(COORD_KEYS, point)}
+    metadata[PROJECTION_VERSION_KEY] = version
+    return metadata
+
+
+def _public_metadata(metadata: Optional[dict]) -> dict:
+    return {k: v for k, v in (metadata or {}).items() if k not in PROJECTION_KEYS}
+
+
 class ChromaVectorDB(VectorDBBase):
+    # Built from the collection on the first keyword search, then kept in sync on add.
+    _keyword_index: Optional[BM25Index] = None
+    _keyword_lock = threading.Lock()
+    KEYWORD_INDEX_PAGE = 1000
+
     def __init__(self):
-        self.client = chromadb.PersistentClient(path=settings.VECTOR_DB_PATH or "./chroma_db_data")
+        path = settings.VECTOR_DB_PATH or "./chroma_db_data"
+        name = settings.COLLECTION_NAME or "rag_collection"
+        self.client = chromadb.PersistentClient(path=path)
         self.embeddings = get_embedding_model()
         self.collection = self.client.get_or_create_collection(
-            name=settings.COLLECTION_NAME or "rag_collection",
+            name=name,
             metadata={"hnsw:space": "cosine"} # OpenAI embeddings are normalized
         )
+        self.projection_path = os.path.join(path, f"{name}.projection.npz")
 
-    def add_documents(self, documents: List[Document], user_id: Optional[str] = None, access_level: str = "private"):
-        if not documents:
-            return
-        
-        ids = [str(i) for i in range(len(documents))] # TODO: Use better IDs
-        documents_content = [doc.page_content for doc in documents]
-        
-        # Prepare metadata
-        metadatas = []
-        for doc in documents:
-            m = doc.metadata.copy()
-            if access_level == "private":
-                if not user_id:
-                    raise ValueError("User ID must be provided for private documents.")
-                m["user_id"] = user_id
-            m["access_level"] = access_level
-            metadatas.append(m)
-            
-        # Embeddings are handled by Chroma if we don't provide them, OR we can provide them.
-        # VectorManager uses OpenAIEmbeddings explicitly.
-        embeddings = self.embeddings.embed_documents(documents_content)
-        
-        self.collection.add(
-            ids=ids, # Chroma needs unique IDs. This is weak. Should use UUIDs or doc IDs.
-            documents=documents_content,
-            metadatas=metadatas,
-            embeddings=embeddings
-        )
+    def add_documents(self, documents: Iterable[Document], user_id: Optional[str] = None,
+                      access_level: str = "private", batch_size: Optional[int] = None) -> dict:
+        self._check_access(user_id, access_level)
+        seen = {}
 
-    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None) -> List[Document]:
-        query_embedding = self.embeddings.embed_query(query)
-        
+        def write_batch(docs: List[Document], embeddings: List[List[float]]):
+            ids = [doc.id for doc in docs] # Deterministic chunk IDs (see _prepare_chunks)
+            metadatas = [doc.metadata for doc in docs]
+            coords, version = self._project_batch(embeddings)
+
+            # Embeddings are handled by Chroma if we don't provide them, OR we can provide them.
+            # VectorManager uses OpenAIEmbeddings explicitly.
+            self.collection.upsert(
+                ids=ids,
+                documents=[doc.page_content for doc in docs],
+                metadatas=[{**metadata, **_coords_metadata(point, version)}
+                           for metadata, point in zip(metadatas, coords)],
+                embeddings=embeddings
+            )
+            with self._keyword_lock:
+                if self._keyword_index is not None:
+                    self._keyword_index.add_many(zip(ids, (doc.page_content for doc in docs), metadatas))
+
+        writer = PipelinedWriter(self.embeddings.embed_documents, write_batch,
+                                 batch_size=batch_size, name="chroma-writer",
+                                 prepare_fn=lambda docs: self._prepare_chunks(docs, user_id, access_level, seen))
+        stats = writer.run(documents)
+        stats["removed"] = self._remove_stale_chunks(seen, user_id, access_level)
+        return stats
+
+    def _existing_chunk_ids(self, ids: List[str]) -> set:
+        return set(self.collection.get(ids=ids, include=[])["ids"])
+
+    def _delete_stale_chunks(self, source: str, user_id: Optional[str], access_level: str,
+                             keep: set) -> int:
+        conditions = [{"source": source}, {"access_level": access_level}]
+        if access_level == "private":
+            conditions.append({"user_id": user_id})
+        stored = self.collection.get(where={"$and": conditions}, include=[])["ids"]
+        stale = [i for i in stored if i not in keep]
+        if stale:
+            self.collection.delete(ids=stale)
+            with self._keyword_lock:
+                if self._keyword_index is not None:
+                    for doc_id in stale:
+                        self._keyword_index.remove(doc_id)
+        return len(stale)
+
+    def _load_projection_state(self) -> Optional[bytes]:
+        if not os.path.exists(self.projection_path):
+            return None
+        with open(self.projection_path, "rb") as f:
+            return f.read()
+
+    def _projection_state_stamp(self):
+        # os.replace swaps in a new file on every save
+        try:
+            st = os.stat(self.projection_path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _save_projection_state(self, state: bytes):
+        # Write-then-rename so a concurrent reader never sees a partial file
+        tmp_path = f"{self.projection_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(state)
+        os.replace(tmp_path, self.projection_path)
+
+    def _iter_embeddings(self, page_size: int):
+        offset = 0
+        while True:
+            page = self.collection.get(include=["embeddings", "metadatas"], limit=page_size, offset=offset)
+            ids = page["ids"]
+            if not ids:
+                return
+            metadatas = page["metadatas"] or [{}] * len(ids)
+            yield ids, [np.asarray(v).tolist() for v in page["embeddings"]], \
+                [(m or {}).get(PROJECTION_VERSION_KEY) for m in metadatas]
+            offset += len(ids)
+
+    def _scan_points(self, filter: Optional[dict], cursor: Optional[str], limit: int, version: str):
+        offset = int(cursor or 0)
+        page = self.collection.get(where=self._to_chroma_filter(filter), include=["documents", "metadatas"],
+                                   limit=limit, offset=offset)
+        ids = page["ids"]
+        metadatas = [m or {} for m in page["metadatas"] or [{}] * len(ids)]
+
+        stale = [i for i, m in zip(ids, metadatas) if m.get(PROJECTION_VERSION_KEY) != version]
+        embeddings = {}
+        if stale:
+            fetched = self.collection.get(ids=stale, include=["embeddings"])
+            embeddings = dict(zip(fetched["ids"], fetched["embeddings"]))
+
+        rows = []
+        for i, text, metadata in zip(ids, page["documents"], metadatas):
+            fresh = i not in embeddings
+            rows.append({
+                "key": i, "id": i, "text": text or "", "metadata": _public_metadata(metadata),
+                "coords": [metadata[key] for key in COORD_KEYS] if fresh else None,
+                "embedding": None if fresh else embeddings[i],
+            })
+        return rows, (str(offset + len(ids)) if len(ids) == limit else None)
+
+    def _write_coords(self, ids: List[str], coords: np.ndarray, version: str):
+        # update() merges these keys into the existing metadata
+        self.collection.update(ids=ids, metadatas=[_coords_metadata(point, version) for point in coords])
+
+    def _to_chroma_filter(self, filter: Optional[dict]) -> Optional[dict]:
         # Convert filter to Chroma format if possible
         # Chroma supports simple "where" dict.
         # Our filter format: {$or: [...], key: value}
@@ -76,72 +180,62 @@ class ChromaVectorDB(VectorDBBase):
                 if key != "$or":
                     chroma_filter[key] = value
                     
-        if not chroma_filter:
-            chroma_filter = None
+        return chroma_filter or None
+
+    def _search(self, query: str, k: int, filter: Optional[dict], with_vectors: bool):
+        query_embedding = self.embeddings.embed_query(query)
+        include = ["documents", "metadatas", "embeddings"] if with_vectors else ["documents", "metadatas"]
 
         results = self.collection.query(
             query_embeddings=[query_embedding],
             n_results=k,
-            where=chroma_filter
+            where=self._to_chroma_filter(filter),
+            include=include
         )
         
-        docs = []
+        docs, vectors = [], []
         if results["documents"]:
             for i in range(len(results["documents"][0])):
                 content = results["documents"][0][i]
                 metadata = results["metadatas"][0][i] if results["metadatas"] else {}
-                docs.append(Document(page_content=content, metadata=metadata))
+                docs.append(Document(page_content=content, metadata=_public_metadata(metadata)))
+            if with_vectors and results.get("embeddings") is not None and len(results["embeddings"]):
+                vectors = [np.asarray(v).tolist() for v in results["embeddings"][0]]
                 
-        return docs
+        return docs, query_embedding, vectors
 
-    def get_retriever(self, search_kwargs: Optional[dict] = None):
-        return CustomChromaRetriever(vector_manager=self, search_kwargs=search_kwargs or {})
+    def _get_keyword_index(self) -> BM25Index:
+        # The lock is held for the whole build so concurrent writers cannot slip past it.
+        with self._keyword_lock:
+            if self._keyword_index is None:
+                index = BM25Index()
+                offset = 0
+                while True:
+                    page = self.collection.get(include=["documents", "metadatas"],
+                                               limit=self.KEYWORD_INDEX_PAGE, offset=offset)
+                    ids = page["ids"]
+                    if not ids:
+                        break
+                    metadatas = [_public_metadata(m) for m in page["metadatas"] or [{}] * len(ids)]
+                    index.add_many(zip(ids, page["documents"], metadatas))
+                    offset += len(ids)
+                self._keyword_index = index
+                print(f"🔎 Built keyword index over {len(index)} chunks")
+            return self._keyword_index
 
-    def search_with_embeddings(self, query: str, user_id: str = None, k: int = 10) -> dict:
-        # Chroma query includes embeddings if include=['embeddings']
-        query_embedding = self.embeddings.embed_query(query)
-        
-        where = None
-        if user_id:
-             where = {"$or": [{"user_id": user_id}, {"access_level": "common"}]}
-        else:
-             where = {"access_level": "common"}
+    def keyword_search(self, query: str, k: int = 4, filter: Optional[dict] = None) -> List[Document]:
+        """BM25 search over a local inverted index of the collection."""
+        hits = self._get_keyword_index().search(query, k, filter)
+        return [Document(page_content=text, metadata=metadata) for _, _, text, metadata in hits]
 
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=k,
-            where=where,
-            include=["documents", "metadatas", "embeddings"]
-        )
-        
-        if not results["embeddings"]:
-             return {"query_point": [0,0,0], "points": []} 
-             
-        retrieved_embeddings = results["embeddings"][0]
-        documents = results["documents"][0]
-        metadatas = results["metadatas"][0]
-        
-        all_vectors = [query_embedding] + retrieved_embeddings
-        
-        # PCA
-        pca = PCA(n_components=3)
-        if len(all_vectors) >= 3:
-             reduced_vectors = pca.fit_transform(np.array(all_vectors)).tolist()
-        else:
-             reduced_vectors = all_vectors # Fallback
-
-        query_point = {
-            "x": reduced_vectors[0][0], "y": reduced_vectors[0][1], "z": reduced_vectors[0][2] if len(reduced_vectors[0]) > 2 else 0,
-            "type": "query", "text": query
-        }
-        
-        doc_points = []
-        for i, (vec, doc_text, meta) in enumerate(zip(reduced_vectors[1:], documents, metadatas)):
-            doc_points.append({
-                "x": vec[0], "y": vec[1], "z": vec[2] if len(vec) > 2 else 0,
-                "type": "doc",
-                "text": doc_text[:100] + "...",
-                "metadata": meta
-            })
-            
-        return {"query_point": query_point, "points": doc_points}
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None,
+                          **search_params) -> List[Document]:
+        # Chroma's HNSW settings are per collection; per-query tuning params are ignored.
+        return self._search(query, k, filter, with_vectors=False)[0]
+
+    def similarity_search_with_vectors(self, query: str, k: int = 4, filter: Optional[dict] = None,
+                                       **search_params) -> Tuple[List[Document], List[float], List[List[float]]]:
+        return self._search(query, k, filter, with_vectors=True)
+
+    def get_retriever(self, search_kwargs: Optional[dict] = None):
+        return CustomChromaRetriever(vector_manager=self, search_kwargs=search_kwargs or {})
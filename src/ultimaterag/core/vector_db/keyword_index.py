@@ -0,0 +1,112 @@
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_TOKEN_RE = re.compile(r"\w+(?:[-_./:]\w+)*")
+_PART_RE = re.compile(r"[-_./:]")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased word tokens. Compound identifiers ("ERR-4021", "v2.3.1") are kept whole
+    and also split into their parts, so both the exact code and its pieces match.
+    """
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        parts = _PART_RE.split(token)
+        if len(parts) > 1:
+            tokens.extend(p for p in parts if p)
+    return tokens
+
+
+def matches_filter(metadata: dict, filter: Optional[dict]) -> bool:
+    """Evaluate our filter format ({key: value, "$or": [{...}, ...]}) against metadata."""
+    if not filter:
+        return True
+    for key, value in filter.items():
+        if key == "$or":
+            if not any(matches_filter(metadata, sub) for sub in value):
+                return False
+        elif metadata.get(key) != value:
+            return False
+    return True
+
+
+class BM25Index:
+    """
+    In-memory Okapi BM25 inverted index, for keyword retrieval on backends without
+    native full-text search (Chroma). Thread-safe; documents are keyed by ID.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, int]] = defaultdict(dict)  # term -> {doc_id: tf}
+        self._lengths: Dict[str, int] = {}
+        self._docs: Dict[str, Tuple[str, dict]] = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(self, doc_id: str, text: str, metadata: Optional[dict] = None):
+        with self._lock:
+            if doc_id in self._docs:
+                self.remove(doc_id)
+            counts = Counter(tokenize(text))
+            for term, tf in counts.items():
+                self._postings[term][doc_id] = tf
+            length = sum(counts.values())
+            self._lengths[doc_id] = length
+            self._total_length += length
+            self._docs[doc_id] = (text, metadata or {})
+
+    def add_many(self, items: Iterable[Tuple[str, str, dict]]):
+        with self._lock:
+            for doc_id, text, metadata in items:
+                self.add(doc_id, text, metadata)
+
+    def remove(self, doc_id: str):
+        with self._lock:
+            if doc_id not in self._docs:
+                return
+            text, _ = self._docs.pop(doc_id)
+            for term in set(tokenize(text)):
+                postings = self._postings.get(term)
+                if postings is not None:
+                    postings.pop(doc_id, None)
+                    if not postings:
+                        del self._postings[term]
+            self._total_length -= self._lengths.pop(doc_id)
+
+    def search(self, query: str, k: int, filter: Optional[dict] = None) -> List[Tuple[str, float, str, dict]]:
+        """Top-k (doc_id, score, text, metadata) for the query, restricted by `filter`."""
+        with self._lock:
+            n = len(self._docs)
+            if not n:
+                return []
+            avg_length = self._total_length / n
+            scores: Dict[str, float] = defaultdict(float)
+
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / avg_length)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+            results = []
+            for doc_id, score in ranked:
+                text, metadata = self._docs[doc_id]
+                if matches_filter(metadata, filter):
+                    results.append((doc_id, score, text, metadata))
+                    if len(results) >= k:
+                        break
+            return results
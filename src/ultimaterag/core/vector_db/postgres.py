@@ -1,16 +1,37 @@
-from typing import List, Optional, Any, Tuple
+from typing import Iterable, List, Optional, Any, Tuple
 from langchain_core.documents import Document
 from langchain_core.retrievers import BaseRetriever
 from langchain_core.callbacks import CallbackManagerForRetrieverRun
 from ultimaterag.config.settings import settings
 import numpy as np
-from sklearn.decomposition import PCA
-from ultimaterag.Database.Connection import get_db_connection
-from pgvector.psycopg2 import register_vector
+from ultimaterag.Database.Connection import db_connection
+from ultimaterag.Database.BulkInsert import copy_rows, values_insert
+from ultimaterag.Database.Indexes import index_is_valid, search_params
+from ultimaterag.Database.Schema import CHUNK_ID_INDEX, ensure_schema, pending_tasks
+import psycopg2
+from psycopg2.extras import execute_values
 import json
+import time
 from .base import VectorDBBase
+from .writer import PipelinedWriter
 from ultimaterag.LLM.embeddings import get_embedding_model
 
+DOCUMENT_COLUMNS = ["content", "metadata", "embedding", "user_id", "access_level", "chunk_id",
+                    "coords", "projection"]
+DOCUMENT_COLUMN_TYPES = ["text", "jsonb", "vector", "text", "text", "text", "float4[]", "text"]
+
+# Row of corpus_projection holding this table's projection basis (Schema migration 6)
+PROJECTION_NAME = "documents"
+
+# Chunks already stored (same deterministic chunk_id) are left untouched
+ON_CHUNK_CONFLICT = " ON CONFLICT (chunk_id) DO NOTHING"
+
+# Filter keys served by typed, indexed columns instead of metadata JSON (Schema migration 3)
+TYPED_FILTER_COLUMNS = ("user_id", "access_level")
+
+# How often a process waiting on the RBAC backfill checks whether `ultimaterag migrate` finished it
+RBAC_RECHECK_SECONDS = 30.0
+
 class CustomPostgresRetriever(BaseRetriever):
     vector_manager: Any
     search_kwargs: dict = {}
@@ -21,157 +42,354 @@ class CustomPostgresRetriever(BaseRetriever):
         return self.vector_manager.similarity_search(query, **self.search_kwargs)
 
 class PostgresVectorDB(VectorDBBase):
+    # Set once the chunk_id unique index is valid (built online on existing tables)
+    _chunk_index_ready = False
+    # False while the typed RBAC columns still await their backfill (see _rbac_columns_ready)
+    _rbac_ready = True
+    _rbac_checked_at = float("-inf")
+
     def __init__(self):
         self.embeddings = get_embedding_model()
-
-    def _get_conn(self):
-        conn = get_db_connection()
-        if not conn:
-            raise ConnectionError("Failed to connect to PostgreSQL")
-        return conn
-
-    def add_documents(self, documents: List[Document], user_id: Optional[str] = None, access_level: str = "private"):
-        if not documents:
-            return
-        
-        texts = [doc.page_content for doc in documents]
-        embeddings = self.embeddings.embed_documents(texts)
-        
-        conn = self._get_conn()
         try:
+            ensure_schema()
+        except Exception as e:
+            print(f"⚠️ Could not apply database schema: {e}")
+        self._rbac_ready = False
+        if not self._rbac_columns_ready():
+            print("⚠️ RBAC columns not backfilled yet: access filters use metadata JSON (unindexed) "
+                  "until `ultimaterag migrate` completes.")
+
+    def _rbac_columns_ready(self) -> bool:
+        """
+        Whether the typed user_id/access_level columns hold every row's RBAC fields. Until
+        the rbac_backfill task has run, pre-existing rows carry the column defaults.
+        """
+        if self._rbac_ready:
+            return True
+        now = time.monotonic()
+        if now - self._rbac_checked_at >= RBAC_RECHECK_SECONDS:
+            self._rbac_checked_at = now
+            try:
+                self._rbac_ready = "rbac_backfill" not in pending_tasks()
+            except Exception as e:
+                print(f"⚠️ Could not check schema tasks: {e}")
+        return self._rbac_ready
+
+    def add_documents(self, documents: Iterable[Document], user_id: Optional[str] = None,
+                      access_level: str = "private", batch_size: Optional[int] = None) -> dict:
+        self._check_access(user_id, access_level)
+        seen = {}
+
+        def write_batch(docs: List[Document], embeddings: List[List[float]]):
+            coords, version = self._project_batch(embeddings)
+            rows = []
+            for doc, embedding, point in zip(docs, embeddings, coords):
+                rows.append((doc.page_content, json.dumps(doc.metadata), embedding,
+                             doc.metadata.get("user_id"), access_level, doc.id, point.tolist(), version))
+            # One transaction per batch keeps locks and WAL bounded during large loads.
+            with db_connection() as conn:
+                self._insert_rows(conn, rows)
+                conn.commit()
+
+        writer = PipelinedWriter(self.embeddings.embed_documents, write_batch,
+                                 batch_size=batch_size, name="postgres-writer",
+                                 prepare_fn=lambda docs: self._prepare_chunks(docs, user_id, access_level, seen))
+        stats = writer.run(documents)
+        stats["removed"] = self._remove_stale_chunks(seen, user_id, access_level)
+        return stats
+
+    def _existing_chunk_ids(self, ids: List[str]) -> set:
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT chunk_id FROM documents WHERE chunk_id = ANY(%s)", (ids,))
+                return {row[0] for row in cur.fetchall()}
+
+    def _delete_stale_chunks(self, source: str, user_id: Optional[str], access_level: str,
+                             keep: set) -> int:
+        # Scope from metadata JSON: it is authoritative even before the RBAC column backfill.
+        # Rows without a chunk_id predate deterministic IDs and are replaced too.
+        scope = {"source": source, "access_level": access_level}
+        if access_level == "private":
+            scope["user_id"] = user_id
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "DELETE FROM documents WHERE metadata @> %s::jsonb "
+                    "AND (chunk_id IS NULL OR chunk_id <> ALL(%s))",
+                    (json.dumps(scope), list(keep)),
+                )
+                removed = cur.rowcount
+            conn.commit()
+        return removed
+
+    def _load_projection_state(self) -> Optional[bytes]:
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT state FROM corpus_projection WHERE name = %s", (PROJECTION_NAME,))
+                row = cur.fetchone()
+                return bytes(row[0]) if row else None
+
+    def _projection_state_stamp(self):
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT updated_at FROM corpus_projection WHERE name = %s", (PROJECTION_NAME,))
+                row = cur.fetchone()
+                return row[0] if row else None
+
+    def _save_projection_state(self, state: bytes):
+        with db_connection() as conn:
             with conn.cursor() as cur:
-                for i, doc in enumerate(documents):
-                    metadata = doc.metadata.copy()
-                    if access_level == "private":
-                        if not user_id:
-                            raise ValueError("User ID must be provided for private documents.")
-                        metadata["user_id"] = user_id
-                    metadata["access_level"] = access_level
-                    
+                cur.execute("""
+                    INSERT INTO corpus_projection (name, state) VALUES (%s, %s)
+                    ON CONFLICT (name) DO UPDATE SET state = EXCLUDED.state, updated_at = now()
+                """, (PROJECTION_NAME, psycopg2.Binary(state)))
+            conn.commit()
+
+    def _iter_embeddings(self, page_size: int):
+        # Keyset pagination on the primary key: stable while coordinates are being updated
+        last_id = 0
+        while True:
+            with db_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT id, embedding, projection FROM documents WHERE id > %s "
+                                "ORDER BY id LIMIT %s", (last_id, page_size))
+                    rows = cur.fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield ([row[0] for row in rows],
+                   [json.loads(row[1]) if isinstance(row[1], str) else np.asarray(row[1]).tolist() for row in rows],
+                   [row[2] for row in rows])
+
+    def _scan_points(self, filter: Optional[dict], cursor: Optional[str], limit: int, version: str):
+        """Keyset page on the primary key; embeddings are only read for rows with stale coordinates."""
+        where_clause, filter_params = self._build_filter_clause(filter)
+        filter_sql = f" AND ({where_clause[len(' WHERE '):]})" if where_clause else ""
+        sql = f"""
+            SELECT id, chunk_id, left(content, 101), metadata,
+                   CASE WHEN projection = %s THEN coords END,
+                   CASE WHEN projection IS DISTINCT FROM %s THEN embedding END
+            FROM documents
+            WHERE id > %s{filter_sql}
+            ORDER BY id
+            LIMIT %s
+        """
+        params = [version, version, int(cursor or 0)] + filter_params + [limit]
+
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(sql, tuple(params))
+                records = cur.fetchall()
+
+        rows = []
+        for row_id, doc_id, text, metadata, coords, embedding in records:
+            if embedding is not None and isinstance(embedding, str):
+                embedding = json.loads(embedding)
+            rows.append({
+                "key": row_id, "id": doc_id or str(row_id), "text": text, "metadata": metadata or {},
+                "coords": list(coords) if coords is not None else None,
+                "embedding": embedding if coords is None else None,
+            })
+        return rows, (str(records[-1][0]) if len(records) == limit else None)
+
+    def _write_coords(self, ids: List[int], coords: np.ndarray, version: str):
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                execute_values(cur, """
+                    UPDATE documents AS d SET coords = v.coords, projection = v.projection
+                    FROM (VALUES %s) AS v (id, coords, projection) WHERE d.id = v.id
+                """, [(row_id, point.tolist(), version) for row_id, point in zip(ids, coords)],
+                    template="(%s, %s::real[], %s)")
+            conn.commit()
+
+    def _chunk_conflict_clause(self, conn) -> str:
+        # ON CONFLICT (chunk_id) needs the unique index; until then _prepare_chunks'
+        # lookup is what skips stored chunks
+        if not self._chunk_index_ready:
+            with conn.cursor() as cur:
+                self._chunk_index_ready = index_is_valid(cur, CHUNK_ID_INDEX[0])
+        return ON_CHUNK_CONFLICT if self._chunk_index_ready else ""
+
+    def _insert_rows(self, conn, rows: List[tuple], mode: Optional[str] = None):
+        """
+        Insert rows ordered as DOCUMENT_COLUMNS (content, metadata_json, embedding,
+        user_id, access_level, chunk_id, coords, projection) using the configured bulk mode:
+        "copy" streams binary COPY (falls back to "values" if the server rejects it,
+        e.g. when a concurrent upload already wrote one of the chunks),
+        "values" sends multi-row INSERTs, "row" issues one INSERT per row.
+        "values" and "row" skip chunks that already exist.
+        """
+        mode = (mode or settings.PG_BULK_INSERT_MODE).lower()
+        on_conflict = self._chunk_conflict_clause(conn)
+
+        if mode == "copy":
+            try:
+                with conn.cursor() as cur:
+                    copy_rows(cur, "documents", DOCUMENT_COLUMNS, DOCUMENT_COLUMN_TYPES, rows)
+                return
+            except psycopg2.errors.UniqueViolation:
+                conn.rollback()
+                print("ℹ️ Some chunks were written concurrently; retrying batch with ON CONFLICT DO NOTHING.")
+                mode = "values"
+            except psycopg2.Error as e:
+                conn.rollback()
+                print(f"⚠️ Binary COPY failed ({e.__class__.__name__}: {e}); falling back to execute_values.")
+                mode = "values"
+
+        with conn.cursor() as cur:
+            if mode == "values":
+                values_insert(cur, "documents", DOCUMENT_COLUMNS,
+                              ((content, metadata, np.asarray(embedding), *rest)
+                               for content, metadata, embedding, *rest in rows),
+                              suffix=on_conflict)
+            else:
+                for content, metadata, embedding, *rest in rows:
                     cur.execute(
-                        "INSERT INTO documents (content, metadata, embedding) VALUES (%s, %s, %s)",
-                        (doc.page_content, json.dumps(metadata), embeddings[i])
+                        f"INSERT INTO documents ({', '.join(DOCUMENT_COLUMNS)}) "
+                        f"VALUES ({', '.join(['%s'] * len(DOCUMENT_COLUMNS))})" + on_conflict,
+                        (content, metadata, np.asarray(embedding), *rest)
                     )
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            conn.close()
 
-    def _build_filter_clause(self, filter: Optional[dict]) -> Tuple[str, List[Any]]:
-        if not filter:
-            return "", []
-        
-        conditions = []
-        params = []
-        
-        if "$or" in filter:
-            or_conditions = []
-            for sub_filter in filter["$or"]:
-                for key, value in sub_filter.items():
-                    or_conditions.append(f"metadata->>'{key}' = %s")
-                    params.append(value)
-            if or_conditions:
-                conditions.append(f"({' OR '.join(or_conditions)})")
-        
+    @staticmethod
+    def _compile_conditions(filter: dict, typed: bool = True) -> Tuple[List[str], List[Any]]:
+        """
+        AND-ed equality conditions; RBAC keys hit typed columns (with `typed`), the rest
+        metadata JSON.
+        """
+        conditions, params = [], []
         for key, value in filter.items():
-            if key == "$or":
-                continue
-            conditions.append(f"metadata->>'{key}' = %s")
-            params.append(value)
-            
-        if not conditions:
+            if typed and key in TYPED_FILTER_COLUMNS:
+                conditions.append(f"{key} = %s")
+                params.append(value)
+            else:
+                conditions.append("metadata->>%s = %s")
+                params.extend([key, value])
+        return conditions, params
+
+    def _filter_branches(self, filter: Optional[dict]) -> List[Tuple[str, List[Any]]]:
+        """
+        Compile a filter into OR-ed branches of AND-ed conditions: one branch per `$or`
+        alternative (each combined with the top-level keys), or a single branch.
+        """
+        if not filter:
+            return []
+        # Before the backfill, only metadata JSON has the RBAC fields of pre-existing rows
+        typed = self._rbac_columns_ready()
+        base_conditions, base_params = self._compile_conditions(
+            {k: v for k, v in filter.items() if k != "$or"}, typed)
+        alternatives = filter.get("$or") or [{}]
+
+        branches = []
+        for alternative in alternatives:
+            conditions, params = self._compile_conditions(alternative, typed)
+            conditions, params = conditions + base_conditions, params + base_params
+            if not conditions:
+                return []  # an unconstrained branch matches every row
+            branches.append((" AND ".join(conditions), params))
+        return branches
+
+    def _build_filter_clause(self, filter: Optional[dict]) -> Tuple[str, List[Any]]:
+        """Single WHERE clause for the filter (branches OR-ed together)."""
+        branches = self._filter_branches(filter)
+        if not branches:
             return "", []
-            
-        return " WHERE " + " AND ".join(conditions), params
+        if len(branches) == 1:
+            return " WHERE " + branches[0][0], branches[0][1]
+        params = [p for _, branch_params in branches for p in branch_params]
+        return " WHERE " + " OR ".join(f"({where})" for where, _ in branches), params
+
+    def _build_search_query(self, query_embedding: List[float], k: int, filter: Optional[dict],
+                            with_vectors: bool) -> Tuple[str, List[Any]]:
+        """
+        Nearest-neighbour SQL for the filter.
+
+        An OR filter (e.g. RBAC: own documents OR common) becomes a UNION ALL of per-branch
+        top-k queries. Each branch can then use its own index (user_id btree, or the
+        partial ANN index on common rows) instead of post-filtering one big scan, so
+        latency does not grow with the number of tenants.
+        """
+        vector = np.asarray(query_embedding)
+        columns = "id, content, metadata" + (", embedding" if with_vectors else "") + ", (embedding <=> %s) AS distance"
+        branches = self._filter_branches(filter)
+
+        if len(branches) <= 1:
+            where, params = branches[0] if branches else ("", [])
+            where_clause = f" WHERE {where}" if where else ""
+            return (f"SELECT {columns} FROM documents{where_clause} ORDER BY distance ASC LIMIT %s",
+                    [vector] + params + [k])
 
-    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None) -> List[Document]:
+        parts, params = [], []
+        for where, branch_params in branches:
+            parts.append(f"(SELECT {columns} FROM documents WHERE {where} ORDER BY distance ASC LIMIT %s)")
+            params += [vector] + branch_params + [k]
+        # A row matching several branches is returned once.
+        sql = f"""
+            SELECT * FROM (
+                SELECT DISTINCT ON (id) * FROM ({" UNION ALL ".join(parts)}) AS branches
+                ORDER BY id, distance
+            ) AS hits
+            ORDER BY distance ASC
+            LIMIT %s
+        """
+        return sql, params + [k]
+
+    def _search(self, query: str, k: int, filter: Optional[dict], with_vectors: bool,
+                ef_search: Optional[int] = None, probes: Optional[int] = None):
         query_embedding = self.embeddings.embed_query(query)
-        where_clause, filter_params = self._build_filter_clause(filter)
-        
-        conn = self._get_conn()
-        results = []
-        try:
-            register_vector(conn)
+        sql, params = self._build_search_query(query_embedding, k, filter, with_vectors)
+
+        docs, vectors = [], []
+        with db_connection() as conn:
             with conn.cursor() as cur:
-                sql = f"""
-                    SELECT content, metadata, (embedding <=> %s) as distance
-                    FROM documents
-                    {where_clause}
-                    ORDER BY distance ASC
-                    LIMIT %s
-                """
-                params = [np.array(query_embedding)] + filter_params + [k]
+                # Index tuning is transaction-scoped; the pool rolls back on release.
+                for name, value in search_params(k, ef_search=ef_search, probes=probes):
+                    cur.execute(f"SET LOCAL {name} = %s", (value,))
+
                 cur.execute(sql, tuple(params))
-                
-                rows = cur.fetchall()
-                for row in rows:
-                    content, metadata, distance = row
-                    results.append(Document(page_content=content, metadata=metadata or {}))
-        finally:
-            conn.close()
-            
-        return results
 
-    def get_retriever(self, search_kwargs: Optional[dict] = None):
-        return CustomPostgresRetriever(vector_manager=self, search_kwargs=search_kwargs or {})
+                # Row: id, content, metadata[, embedding], distance
+                for row in cur.fetchall():
+                    docs.append(Document(page_content=row[1], metadata=row[2] or {}))
+                    if with_vectors:
+                        vectors.append(json.loads(row[3]) if isinstance(row[3], str) else np.asarray(row[3]).tolist())
 
-    def perform_pca(self, vectors: List[List[float]], n_components: int = 2) -> List[List[float]]:
-        if len(vectors) < n_components:
-            return vectors 
-        pca = PCA(n_components=n_components)
-        reduced = pca.fit_transform(np.array(vectors))
-        return reduced.tolist()
+        return docs, query_embedding, vectors
 
-    def search_with_embeddings(self, query: str, user_id: str = None, k: int = 10) -> dict:
-        query_embedding = self.embeddings.embed_query(query)
-        conn = self._get_conn()
-        try:
-            register_vector(conn)
+    def keyword_search(self, query: str, k: int = 4, filter: Optional[dict] = None) -> List[Document]:
+        """
+        Full-text search on the GIN-indexed `content_tsv` column, ranked by ts_rank_cd.
+        Query terms are OR-ed so partial matches still rank; rows with more matches rank higher.
+        """
+        where_clause, filter_params = self._build_filter_clause(filter)
+        filter_sql = f" AND ({where_clause[len(' WHERE '):]})" if where_clause else ""
+        sql = f"""
+            SELECT id, content, metadata, ts_rank_cd(content_tsv, q) AS rank
+            FROM documents,
+                 (SELECT replace(plainto_tsquery(%s::regconfig, %s)::text, ' & ', ' | ')::tsquery AS q) AS query
+            WHERE content_tsv @@ q{filter_sql}
+            ORDER BY rank DESC
+            LIMIT %s
+        """
+        params = [settings.PG_TEXT_SEARCH_CONFIG, query] + filter_params + [k]
+
+        with db_connection() as conn:
             with conn.cursor() as cur:
-                sql = "SELECT content, metadata, embedding, (embedding <=> %s) as distance FROM documents"
-                params = [np.array(query_embedding)]
-                
-                if user_id:
-                    sql += " WHERE (metadata->>'user_id' = %s OR metadata->>'access_level' = 'common')"
-                    params.append(user_id)
-                else:
-                    sql += " WHERE metadata->>'access_level' = 'common'"
-                
-                sql += " ORDER BY distance ASC LIMIT %s"
-                params.append(k)
-                
                 cur.execute(sql, tuple(params))
-                results = cur.fetchall()
-                
-                if not results:
-                     return {"query_point": [0,0,0], "points": []} 
-
-                documents = [r[0] for r in results]
-                metadatas = [r[1] for r in results]
-                retrieved_embeddings = [json.loads(r[2]) if isinstance(r[2], str) else np.array(r[2]).tolist() for r in results]
-                retrieved_embeddings = [v.tolist() if hasattr(v, 'tolist') else v for v in retrieved_embeddings]
-
-                all_vectors = [query_embedding] + retrieved_embeddings
-                reduced_vectors = self.perform_pca(all_vectors, n_components=3) 
-                
-                query_point = {
-                    "x": reduced_vectors[0][0], "y": reduced_vectors[0][1],
-                    "z": reduced_vectors[0][2] if len(reduced_vectors[0]) > 2 else 0,
-                    "type": "query", "text": query
-                }
-                
-                doc_points = []
-                for i, (vec, doc_text, meta) in enumerate(zip(reduced_vectors[1:], documents, metadatas)):
-                    doc_points.append({
-                        "x": vec[0], "y": vec[1],
-                        "z": vec[2] if len(vec) > 2 else 0,
-                        "type": "doc",
-                        "text": doc_text[:100] + "..." if len(doc_text) > 100 else doc_text,
-                        "metadata": meta or {}
-                    })
-                    
-                return {"query_point": query_point, "points": doc_points}
-        finally:
-            conn.close()
+                return [Document(page_content=row[1], metadata=row[2] or {}) for row in cur.fetchall()]
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None,
+                          ef_search: Optional[int] = None, probes: Optional[int] = None,
+                          **search_params) -> List[Document]:
+        """
+        `ef_search` (HNSW) / `probes` (IVFFlat) trade recall for latency on this query;
+        they default to PG_HNSW_EF_SEARCH / PG_IVFFLAT_PROBES.
+        """
+        return self._search(query, k, filter, with_vectors=False, ef_search=ef_search, probes=probes)[0]
+
+    def similarity_search_with_vectors(self, query: str, k: int = 4, filter: Optional[dict] = None,
+                                       ef_search: Optional[int] = None, probes: Optional[int] = None,
+                                       **search_params) -> Tuple[List[Document], List[float], List[List[float]]]:
+        return self._search(query, k, filter, with_vectors=True, ef_search=ef_search, probes=probes)
+
+    def get_retriever(self, search_kwargs: Optional[dict] = None):
+        return CustomPostgresRetriever(vector_manager=self, search_kwargs=search_kwargs or {})
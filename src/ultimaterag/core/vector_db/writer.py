@@ -0,0 +1,116 @@
+import queue
+import threading
+import time
+from typing import Callable, Iterable, Iterator, List, Optional
+
+from langchain_core.documents import Document
+from ultimaterag.config.settings import settings
+
+_SENTINEL = object()
+
+
+class PipelinedWriter:
+    """
+    Embeds and writes documents in batches, overlapping the two stages.
+
+    The calling thread embeds batch N+1 while a background thread writes batch N
+    to the database. Batches are handed over through a bounded queue, so when the
+    database falls behind, embedding blocks (back-pressure) and at most
+    `max_pending` embedded batches are held in memory at any time.
+
+    An optional `prepare_fn` maps each batch to the documents that actually need
+    writing (e.g. dropping chunks already stored) before anything is embedded.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[List[str]], List[List[float]]],
+        write_fn: Callable[[List[Document], List[List[float]]], None],
+        batch_size: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        name: str = "vector-writer",
+        prepare_fn: Optional[Callable[[List[Document]], List[Document]]] = None,
+    ):
+        self.embed_fn = embed_fn
+        self.write_fn = write_fn
+        self.prepare_fn = prepare_fn
+        self.batch_size = batch_size or settings.EMBED_BATCH_SIZE
+        self.max_pending = max_pending or settings.EMBED_QUEUE_DEPTH
+        self.name = name
+
+    def _batches(self, documents: Iterable[Document]) -> Iterator[List[Document]]:
+        batch: List[Document] = []
+        for doc in documents:
+            batch.append(doc)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def run(self, documents: Iterable[Document]) -> dict:
+        """
+        Embed and write all documents. Accepts a list or any iterable (e.g. a chunk generator).
+        Returns throughput stats; re-raises the first write error.
+        """
+        pending: queue.Queue = queue.Queue(maxsize=self.max_pending)
+        errors: List[BaseException] = []
+        timings = {"embed": 0.0, "write": 0.0}
+        counts = {"documents": 0, "batches": 0, "skipped": 0}
+
+        def consume():
+            while True:
+                item = pending.get()
+                if item is _SENTINEL:
+                    return
+                if errors:
+                    continue  # keep draining so the producer never blocks on a dead consumer
+                docs, embeddings = item
+                t0 = time.perf_counter()
+                try:
+                    self.write_fn(docs, embeddings)
+                except BaseException as e:
+                    errors.append(e)
+                    continue
+                timings["write"] += time.perf_counter() - t0
+                counts["documents"] += len(docs)
+                counts["batches"] += 1
+
+        writer = threading.Thread(target=consume, name=self.name, daemon=True)
+        start = time.perf_counter()
+        writer.start()
+        try:
+            for docs in self._batches(documents):
+                if errors:
+                    break
+                if self.prepare_fn is not None:
+                    prepared = self.prepare_fn(docs)
+                    counts["skipped"] += len(docs) - len(prepared)
+                    docs = prepared
+                    if not docs:
+                        continue
+                t0 = time.perf_counter()
+                embeddings = self.embed_fn([d.page_content for d in docs])
+                timings["embed"] += time.perf_counter() - t0
+                pending.put((docs, embeddings))  # blocks while `max_pending` batches are waiting
+        finally:
+            pending.put(_SENTINEL)
+            writer.join()
+
+        if errors:
+            raise errors[0]
+
+        elapsed = time.perf_counter() - start
+        stats = {
+            "documents": counts["documents"],
+            "batches": counts["batches"],
+            "skipped": counts["skipped"],
+            "seconds": round(elapsed, 3),
+            "embed_seconds": round(timings["embed"], 3),
+            "write_seconds": round(timings["write"], 3),
+            "docs_per_sec": round(counts["documents"] / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+        if stats["documents"] or stats["skipped"]:
+            print(f"🧮 {self.name}: wrote {stats['documents']} docs in {stats['batches']} batches "
+                  f"({stats['docs_per_sec']} docs/s), skipped {stats['skipped']} unchanged")
+        return stats
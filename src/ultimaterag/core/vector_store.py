@@ -1,30 +1,76 @@
-from typing import List, Optional, Any
+from typing import Iterable, List, Optional, Any, Tuple
+import json
 from langchain_core.documents import Document
 from ultimaterag.config.settings import settings
+from ultimaterag.utils.LRU_Cache import LRUCache
+from .answer_cache import get_answer_cache
+from .projection import CorpusProjection
 from .vector_db.base import VectorDBBase
-from .vector_db.postgres import PostgresVectorDB
-from .vector_db.chroma import ChromaVectorDB
 
 class VectorManager:
     def __init__(self):
         db_type = settings.VECTOR_DB_TYPE.lower()
         self.db: VectorDBBase
         
+        # Backends are imported on demand: chromadb / psycopg2 are slow to import
         if db_type == "postgres":
+            from .vector_db.postgres import PostgresVectorDB
             self.db = PostgresVectorDB()
         elif db_type == "chroma":
+            from .vector_db.chroma import ChromaVectorDB
             self.db = ChromaVectorDB()
         else:
             raise ValueError(f"Unsupported VECTOR_DB_TYPE: {db_type}")
 
-    def add_documents(self, documents: List[Document], user_id: Optional[str] = None, access_level: str = "private"):
-        return self.db.add_documents(documents, user_id, access_level)
+        self.retriever_cache = LRUCache(settings.RETRIEVER_CACHE_SIZE)
 
-    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None) -> List[Document]:
-        return self.db.similarity_search(query, k, filter)
+    def add_documents(self, documents: Iterable[Document], user_id: Optional[str] = None,
+                      access_level: str = "private", batch_size: Optional[int] = None) -> dict:
+        try:
+            return self.db.add_documents(documents, user_id, access_level, batch_size=batch_size)
+        finally:
+            # Cached answers for this scope may now be stale (even after a partial write)
+            answer_cache = get_answer_cache()
+            if answer_cache is not None:
+                answer_cache.invalidate(user_id, access_level)
+
+    def embed_query(self, query: str) -> List[float]:
+        """Query embedding from the store's model (served by the embedding cache when warm)."""
+        return self.db.embeddings.embed_query(query)
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None,
+                          **search_params) -> List[Document]:
+        return self.db.similarity_search(query, k, filter, **search_params)
+
+    def similarity_search_with_vectors(self, query: str, k: int = 4, filter: Optional[dict] = None,
+                                       **search_params) -> Tuple[List[Document], List[float], List[List[float]]]:
+        return self.db.similarity_search_with_vectors(query, k, filter, **search_params)
+
+    def keyword_search(self, query: str, k: int = 4, filter: Optional[dict] = None) -> List[Document]:
+        return self.db.keyword_search(query, k, filter)
+
+    def search(self, query: str, k: int = 4, filter: Optional[dict] = None,
+               mode: Optional[str] = None, **search_params) -> List[Document]:
+        """Retrieve with mode "vector", "keyword" or "hybrid" (defaults to RETRIEVAL_MODE)."""
+        return self.db.search(query, k, filter, mode=mode, **search_params)
 
     def get_retriever(self, search_kwargs: Optional[dict] = None):
-        return self.db.get_retriever(search_kwargs)
+        """Retriever for these search kwargs (k, filter, ...), reused across requests."""
+        key = json.dumps(search_kwargs or {}, sort_keys=True, default=str)
+        return self.retriever_cache.get_or_create(key, lambda: self.db.get_retriever(search_kwargs))
 
     def search_with_embeddings(self, query: str, user_id: str = None, k: int = 10) -> dict:
         return self.db.search_with_embeddings(query, user_id, k)
+
+    @property
+    def projection(self) -> CorpusProjection:
+        """Corpus-wide 3D projection used for visualization coordinates."""
+        return self.db.projection
+
+    def export_points(self, user_id: Optional[str] = None, cursor: Optional[str] = None,
+                      limit: int = 1000) -> dict:
+        """A page of projected chunk coordinates in the user's scope (see VectorDBBase.export_points)."""
+        return self.db.export_points(user_id=user_id, cursor=cursor, limit=limit)
+
+    def rebuild_projection(self, refit: bool = False, page_size: int = 1000) -> dict:
+        return self.db.rebuild_projection(refit=refit, page_size=page_size)
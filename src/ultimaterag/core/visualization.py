@@ -0,0 +1,67 @@
+"""
+Binary encoding of exported visualization points (see VectorDBBase.export_points).
+
+A page is laid out as (little-endian):
+
+    magic     4 bytes   b"RVZ1"
+    length    uint32    byte length of the header, a multiple of 8 (space padded)
+    header    JSON      count, next_cursor, projection, label_field, labels[, texts][, ids]
+    coords    float16   count * 3 values (x, y, z per point), zero padded to 4 bytes
+    labels    uint32    count indices into header["labels"] (dictionary-encoded label_field)
+
+Coordinates and labels are plain typed-array buffers, so a browser can view them
+without parsing; only per-page strings (labels, optional texts / ids) are JSON.
+"""
+import json
+import struct
+
+import numpy as np
+
+MAGIC = b"RVZ1"
+MEDIA_TYPE = "application/octet-stream"
+
+
+def encode_points_page(page: dict, label_field: str = "source", include_text: bool = False,
+                       include_ids: bool = False) -> bytes:
+    count = len(page["ids"])
+    labels, label_index = [], {}
+    codes = np.empty(count, dtype="<u4")
+    for i, metadata in enumerate(page["metadatas"]):
+        label = str(metadata.get(label_field, ""))
+        if label not in label_index:
+            label_index[label] = len(labels)
+            labels.append(label)
+        codes[i] = label_index[label]
+
+    header = {
+        "count": count,
+        "next_cursor": page["next_cursor"],
+        "projection": page["projection"],
+        "label_field": label_field,
+        "labels": labels,
+    }
+    if include_text:
+        header["texts"] = page["texts"]
+    if include_ids:
+        header["ids"] = page["ids"]
+
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    header_bytes += b" " * (-len(header_bytes) % 8)
+    coords = np.asarray(page["coords"], dtype="<f2").reshape(count, 3).tobytes()
+    coords += b"\0" * (-len(coords) % 4)
+    return MAGIC + struct.pack("<I", len(header_bytes)) + header_bytes + coords + codes.tobytes()
+
+
+def decode_points_page(data: bytes) -> dict:
+    """Inverse of encode_points_page (coords as float32 (n, 3), labels as indices)."""
+    if data[:4] != MAGIC:
+        raise ValueError("Not a visualization points page")
+    header_length = struct.unpack_from("<I", data, 4)[0]
+    header = json.loads(data[8:8 + header_length])
+    count = header["count"]
+
+    offset = 8 + header_length
+    coords = np.frombuffer(data, dtype="<f2", count=count * 3, offset=offset).astype(np.float32)
+    offset += count * 6 + (-(count * 6) % 4)
+    codes = np.frombuffer(data, dtype="<u4", count=count, offset=offset)
+    return {**header, "coords": coords.reshape(count, 3), "label_codes": codes}
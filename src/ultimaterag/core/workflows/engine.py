@@ -1,82 +1,193 @@
-from typing import Dict, TypedDict, List, Any
-from ultimaterag.core.container import rag_engine
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, TypedDict, List, Any, Optional
+from langchain_core.documents import Document
+from langchain_core.messages import HumanMessage
+from ultimaterag.core.container import get_rag_engine
+from ultimaterag.core.rerank import get_reranker
+from ultimaterag.core.vector_db.base import reciprocal_rank_fusion
+from ultimaterag.config.settings import settings
 from .chains import get_retrieval_grader, get_query_rewriter
+from .graph import END, WorkflowGraph
 
 # Define Graph State
-class GraphState(TypedDict):
+class GraphState(TypedDict, total=False):
     """
     Represents the state of our graph.
     """
     question: str
     generation: str
     documents: List[str]
-    steps: List[str]
+    relevant_documents: List[str]
+    rewritten_documents: List[str]
+    retries: int
+    steps: List[dict] # One record per node execution: node, step, seconds, tokens
+
+WORKFLOW_K = 3 # Documents kept for generation
 
 class WorkflowEngine:
     def __init__(self):
-        self.grader = get_retrieval_grader()
+        self.reranker = get_reranker()
+        # The LLM grader is only needed when no cross-encoder is available
+        self.grader = get_retrieval_grader() if self.reranker is None else None
         self.rewriter = get_query_rewriter()
+        self.workflows: Dict[str, WorkflowGraph] = {
+            "self-correcting": self._self_correcting_graph(),
+            "multi-query": self._multi_query_graph(),
+        }
 
-    def run(self, query: str) -> Dict[str, Any]:
+    def _grade_documents(self, query: str, documents: List[str]) -> List[str]:
+        """
+        Keep the documents relevant to the query. With a reranker this is one batched
+        cross-encoder pass (scores >= RERANK_MIN_SCORE, best first); otherwise concurrent
+        LLM grading calls.
         """
-        Executes the Self-Correcting RAG workflow.
+        if self.reranker is not None:
+            from langchain_core.documents import Document
+            ranked = self.reranker.rerank(query, [Document(page_content=d) for d in documents],
+                                          top_n=WORKFLOW_K, min_score=settings.RERANK_MIN_SCORE)
+            return [d.page_content for d in ranked]
+
+        return self._llm_grade(query, documents)
+
+    def _llm_grade(self, query: str, documents: List[str]) -> List[str]:
         """
+        Grade documents with concurrent LLM calls (at most WORKFLOW_GRADE_CONCURRENCY in
+        flight) and keep the first WORKFLOW_K relevant ones, in retrieval order.
+
+        WORKFLOW_GRADE_CANDIDATES documents are retrieved for grading, more than are kept,
+        so grading can stop early: once WORKFLOW_MIN_RELEVANT documents are relevant, calls
+        not yet started are cancelled. Calls already in flight cannot be cancelled; they
+        finish in the background (their tokens are spent) and their verdicts are ignored.
+        """
+        if not documents:
+            return []
+        enough = min(settings.WORKFLOW_MIN_RELEVANT, WORKFLOW_K, len(documents))
+        workers = max(1, min(settings.WORKFLOW_GRADE_CONCURRENCY, len(documents)))
+        relevant = set()
+
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rag-grader")
+        try:
+            futures = {
+                # Copy the caller's context so token accounting follows the calls into the pool
+                pool.submit(contextvars.copy_context().run, self.grader.invoke,
+                            {"question": query, "document": doc}): i
+                for i, doc in enumerate(documents)
+            }
+            for future in as_completed(futures):
+                if future.result().binary_score == "yes":
+                    relevant.add(futures[future])
+                    if len(relevant) >= enough:
+                        break
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        return [documents[i] for i in sorted(relevant)][:WORKFLOW_K]
+
+    # --- Nodes (each returns a state update) ---
+
+    def _search(self, question: str) -> List[str]:
+        k = settings.RERANK_CANDIDATES if self.reranker is not None else settings.WORKFLOW_GRADE_CANDIDATES
+        retriever = get_rag_engine().vector_manager.get_retriever(search_kwargs={"k": k})
+        return [d.page_content for d in retriever.invoke(question)]
+
+    def retrieve(self, state: GraphState) -> dict:
+        return {"documents": self._search(state["question"])}
+
+    def retrieve_rewritten(self, state: GraphState) -> dict:
+        return {"rewritten_documents": self._search(state["question"])}
+
+    def grade(self, state: GraphState) -> dict:
+        return {"relevant_documents": self._grade_documents(state["question"], state["documents"])}
+
+    def transform_query(self, state: GraphState) -> dict:
+        better_question = self.rewriter.invoke({"question": state["question"]})
+        return {"question": better_question.content, "retries": state.get("retries", 0) + 1}
+
+    def fuse(self, state: GraphState) -> dict:
+        rankings = [[Document(page_content=d) for d in state.get(key, [])]
+                    for key in ("documents", "rewritten_documents")]
+        fused = reciprocal_rank_fusion(rankings, k=WORKFLOW_K, rrf_k=settings.HYBRID_RRF_K)
+        return {"relevant_documents": [d.page_content for d in fused]}
+
+    def generate(self, state: GraphState) -> dict:
+        # Fall back to the best retrieved documents when nothing passed grading
+        docs = state.get("relevant_documents") or state.get("documents", [])[:WORKFLOW_K]
+        context = "\n\n".join(docs)
+        prompt = f"Answer the question based only on the following context:\n\n{context}\n\nQuestion: {state['question']}"
+        response = get_rag_engine().llm.invoke([HumanMessage(content=prompt)])
+        return {"generation": response.content}
+
+    def _route_after_grade(self, state: GraphState) -> str:
+        if state["relevant_documents"]:
+            return "generate"
+        if state.get("retries", 0) < settings.WORKFLOW_MAX_RETRIES:
+            # All documents irrelevant: rewrite the query and retry
+            return "transform_query"
+        return "generate"
+
+    # --- Graphs ---
+
+    def _self_correcting_graph(self) -> WorkflowGraph:
+        """retrieve -> grade -> generate, or rewrite the query and retry (WORKFLOW_MAX_RETRIES times)."""
+        graph = WorkflowGraph("self-correcting", max_steps=settings.WORKFLOW_MAX_STEPS)
+        graph.add_node("retrieve", self.retrieve)
+        graph.add_node("grade", self.grade)
+        graph.add_node("transform_query", self.transform_query, max_visits=settings.WORKFLOW_MAX_RETRIES)
+        graph.add_node("generate", self.generate)
+        graph.set_entry("retrieve")
+        graph.add_edge("retrieve", "grade")
+        graph.add_conditional_edges("grade", self._route_after_grade)
+        graph.add_edge("transform_query", "retrieve")
+        graph.add_edge("generate", END)
+        return graph
+
+    def _multi_query_graph(self) -> WorkflowGraph:
+        """
+        Retrieve the original question while it is rewritten, retrieve the rewrite,
+        then fuse both rankings (RRF) and generate.
+        """
+        graph = WorkflowGraph("multi-query", max_steps=settings.WORKFLOW_MAX_STEPS)
+        graph.add_node("retrieve", self.retrieve)
+        graph.add_node("transform_query", self.transform_query)
+        graph.add_node("retrieve_rewritten", self.retrieve_rewritten)
+        graph.add_node("fuse", self.fuse)
+        graph.add_node("generate", self.generate)
+        graph.set_entry("retrieve", "transform_query")
+        graph.add_edge("transform_query", "retrieve_rewritten")
+        graph.add_edge(["retrieve", "retrieve_rewritten"], "fuse")
+        graph.add_edge("fuse", "generate")
+        return graph
+
+    def run(self, query: str, workflow_type: str = "self-correcting") -> Dict[str, Any]:
+        """
+        Executes the given workflow (default: Self-Correcting RAG).
+        Raises ValueError for an unknown workflow type.
+        """
+        graph = self.workflows.get(workflow_type)
+        if graph is None:
+            raise ValueError(f"Unknown workflow_type '{workflow_type}'. Available: {sorted(self.workflows)}")
+
         state: GraphState = {
             "question": query,
             "generation": "",
             "documents": [],
+            "relevant_documents": [],
+            "retries": 0,
             "steps": []
         }
-        
-        # 1. Retrieve
-        state["steps"].append("retrieve")
-        print("---RETRIEVE---")
-        # Reuse existing RAG engine logic for retrieval
-        retriever = rag_engine.vector_manager.get_retriever(search_kwargs={"k": 3})
-        documents = retriever.invoke(query)
-        state["documents"] = [d.page_content for d in documents]
-        
-        # 2. Grade Documents
-        print("---CHECK DOCUMENT RELEVANCE---")
-        relevant_docs = []
-        for doc in state["documents"]:
-            score = self.grader.invoke({"question": query, "document": doc})
-            if score.binary_score == "yes":
-                print("---GRADE: DOCUMENT RELEVANT---")
-                relevant_docs.append(doc)
-            else:
-                print("---GRADE: DOCUMENT NOT RELEVANT---")
-        
-        # 3. Decision
-        if not relevant_docs:
-            print("---DECISION: ALL DOCS IRRELEVANT, REWRITE QUERY---")
-            state["steps"].append("transform_query")
-            
-            # Rewrite
-            better_question = self.rewriter.invoke({"question": query})
-            print(f"---REWRITTEN QUERY: {better_question.content}---")
-            state["question"] = better_question.content
-            
-            # Retry Retrieval (One-time loop for simplicity)
-            state["steps"].append("retry_retrieve")
-            documents = retriever.invoke(better_question.content)
-            state["documents"] = [d.page_content for d in documents]
-            # Ideally we grade again, but for speed we assume improvement
-            relevant_docs = state["documents"] # Take whatever we got
-            
-        
-        # 4. Generate
-        print("---GENERATE---")
-        state["steps"].append("generate")
-        # Context join
-        context = "\n\n".join(relevant_docs)
-        
-        # Call RAG Engine's LLM generation manually or reuse method
-        # We reuse part of rag_engine logic but customized
-        from langchain_core.messages import HumanMessage, SystemMessage
-        prompt = f"Answer the question based only on the following context:\n\n{context}\n\nQuestion: {state['question']}"
-        
-        response = rag_engine.llm.invoke([HumanMessage(content=prompt)])
-        state["generation"] = response.content
-        
-        return state
+        return graph.run(state)
+
+
+_engine: Optional[WorkflowEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_workflow_engine() -> WorkflowEngine:
+    """Process-wide WorkflowEngine; its chains hold no per-request state."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = WorkflowEngine()
+        return _engine
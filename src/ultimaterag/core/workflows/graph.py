@@ -0,0 +1,188 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.tracers.context import register_configure_hook
+
+END = "__end__"
+
+NodeFunc = Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]
+Router = Callable[[Dict[str, Any]], Union[str, Sequence[str]]]
+
+
+class TokenCounter(BaseCallbackHandler):
+    """Sums token usage of every chat model call made while it is active."""
+
+    def __init__(self):
+        super().__init__()
+        self.tokens = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+        self._lock = threading.Lock()
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if not usage:
+                    continue
+                with self._lock:
+                    for key in self.tokens:
+                        self.tokens[key] += usage.get(key, 0) or 0
+
+
+# Every LangChain call made inside a node picks up the node's counter from this context var
+_token_counter: contextvars.ContextVar[Optional[TokenCounter]] = contextvars.ContextVar(
+    "workflow_token_counter", default=None
+)
+register_configure_hook(_token_counter, inheritable=True)
+
+
+class WorkflowError(RuntimeError):
+    """Raised for invalid graphs, conflicting parallel updates or exceeded step limits."""
+
+
+@dataclass
+class _Node:
+    name: str
+    func: NodeFunc
+    max_visits: Optional[int] = None
+
+
+class WorkflowGraph:
+    """
+    Small declarative workflow runtime.
+
+    Execution proceeds in supersteps: every active node runs (in parallel when there
+    are several), their returned updates are merged into the state, and the edges of
+    the nodes that ran decide the next active set. A join edge (several sources) only
+    fires once all of its sources have run. Each node execution is recorded in
+    state["steps"] with its wall time and LLM token usage.
+    """
+
+    def __init__(self, name: str, max_steps: int = 25):
+        self.name = name
+        self.max_steps = max_steps
+        self._nodes: Dict[str, _Node] = {}
+        self._edges: Dict[str, List[str]] = {}
+        self._routers: Dict[str, Router] = {}
+        self._joins: List[Tuple[frozenset, str]] = []
+        self._entry: List[str] = []
+
+    def add_node(self, name: str, func: NodeFunc, max_visits: Optional[int] = None) -> "WorkflowGraph":
+        """`func(state)` returns a dict of state updates (or None). `max_visits` bounds loops."""
+        if name in self._nodes or name == END:
+            raise WorkflowError(f"Duplicate or reserved node name: {name}")
+        self._nodes[name] = _Node(name, func, max_visits)
+        return self
+
+    def set_entry(self, *names: str) -> "WorkflowGraph":
+        """Nodes run in the first superstep (in parallel when several)."""
+        self._entry = list(names)
+        return self
+
+    def add_edge(self, source: Union[str, Sequence[str]], target: str) -> "WorkflowGraph":
+        """source -> target. With several sources, target waits until all of them have run."""
+        if isinstance(source, str):
+            self._edges.setdefault(source, []).append(target)
+        else:
+            self._joins.append((frozenset(source), target))
+        return self
+
+    def add_conditional_edges(self, source: str, router: Router) -> "WorkflowGraph":
+        """After `source` runs, `router(state)` names the next node(s), or END."""
+        self._routers[source] = router
+        return self
+
+    def _validate(self):
+        referenced = set(self._entry)
+        for targets in self._edges.values():
+            referenced.update(targets)
+        for sources, target in self._joins:
+            referenced.add(target)
+            referenced.update(sources)
+        referenced.update(self._edges, self._routers)
+        unknown = referenced - set(self._nodes) - {END}
+        if unknown:
+            raise WorkflowError(f"Unknown node(s) in workflow {self.name}: {sorted(unknown)}")
+        if not self._entry:
+            raise WorkflowError(f"Workflow {self.name} has no entry node")
+
+    def _execute(self, node: _Node, state: Dict[str, Any], step: int) -> Tuple[Dict[str, Any], dict]:
+        counter = TokenCounter()
+        token = _token_counter.set(counter)
+        start = time.perf_counter()
+        try:
+            update = node.func(dict(state)) or {}
+        finally:
+            seconds = time.perf_counter() - start
+            _token_counter.reset(token)
+        tokens = dict(counter.tokens)
+        return update, {"node": node.name, "step": step, "seconds": round(seconds, 4), "tokens": tokens}
+
+    def _next_nodes(self, ran: Iterable[str], state: Dict[str, Any], fired: set) -> List[str]:
+        active: List[str] = []
+        for name in ran:
+            targets = list(self._edges.get(name, []))
+            router = self._routers.get(name)
+            if router is not None:
+                routed = router(state)
+                targets.extend([routed] if isinstance(routed, str) else routed)
+            active.extend(targets)
+
+        fired.update(ran)
+        for sources, target in self._joins:
+            if sources <= fired and sources & set(ran):
+                active.append(target)
+                fired.difference_update(sources)
+
+        # Deduplicate while keeping declaration order
+        return [name for name in dict.fromkeys(active) if name != END]
+
+    def run(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        self._validate()
+        state = dict(state)
+        state["steps"] = list(state.get("steps", []))
+        visits: Dict[str, int] = {}
+        fired: set = set()
+        active = list(self._entry)
+        step = 0
+
+        while active:
+            if step >= self.max_steps:
+                raise WorkflowError(f"Workflow {self.name} exceeded {self.max_steps} steps")
+            nodes = [self._nodes[name] for name in active]
+            for node in nodes:
+                visits[node.name] = visits.get(node.name, 0) + 1
+                if node.max_visits is not None and visits[node.name] > node.max_visits:
+                    raise WorkflowError(f"Node {node.name} exceeded {node.max_visits} visits")
+
+            if len(nodes) == 1:
+                results = [self._execute(nodes[0], state, step)]
+            else:
+                # Each branch gets its own copy of the context (token callbacks are context-local)
+                with ThreadPoolExecutor(max_workers=len(nodes), thread_name_prefix="rag-workflow") as pool:
+                    futures = [
+                        pool.submit(contextvars.copy_context().run, self._execute, node, state, step)
+                        for node in nodes
+                    ]
+                    results = [future.result() for future in futures]
+
+            written: Dict[str, str] = {}
+            for node, (update, record) in zip(nodes, results):
+                for key in update:
+                    if key == "steps":
+                        raise WorkflowError(f"Node {node.name} may not write 'steps'")
+                    if key in written:
+                        raise WorkflowError(f"Nodes {written[key]} and {node.name} both updated '{key}'")
+                    written[key] = node.name
+                state.update(update)
+                state["steps"].append(record)
+
+            active = self._next_nodes(active, state, fired)
+            step += 1
+
+        return state
@@ -2,8 +2,45 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from ultimaterag.config.settings import settings
 from ultimaterag.API.v1.router import api_router
+from ultimaterag.core.concurrency import run_blocking, shutdown_blocking_executor
+from ultimaterag.core.container import get_rag_engine
 from contextlib import asynccontextmanager
 
+
+async def shutdown_services():
+    """
+    Release process-wide clients and worker threads. Runs from the lifespan, which uvicorn
+    only reaches after in-flight requests (including open streams) finished or were
+    cancelled at timeout_graceful_shutdown.
+    """
+    from ultimaterag.core.consolidation import stop_consolidation_queue
+    from ultimaterag.Database.Connection import close_pool
+    from ultimaterag.Database.RedisConnection import close_redis_clients
+    from ultimaterag.LLM.connection import close_llm_clients
+    from ultimaterag.LLM.local_embeddings import close_local_embeddings
+
+    # Pending consolidations still need Redis, Postgres and the LLM: stop them next
+    await run_blocking(stop_consolidation_queue, wait=True, timeout=settings.SHUTDOWN_TIMEOUT)
+    await close_redis_clients()
+    await close_llm_clients()
+    close_local_embeddings()
+    close_pool()
+    shutdown_blocking_executor(wait=False)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Nothing is built at import time; warm the engine up here, off the event loop
+    if settings.WARM_START:
+        try:
+            await run_blocking(get_rag_engine)
+            print("✅ RAG engine ready")
+        except Exception as e:
+            print(f"⚠️ RAG engine not ready at startup ({e}); it will be built on the first request.")
+    yield
+    await shutdown_services()
+
+
 def create_app() -> FastAPI:
     """
     Factory function to create the FastAPI application.
@@ -13,7 +50,8 @@ def create_app() -> FastAPI:
         description="A Ultimate RAG system with memory and vector storage.",
         version="0.1.0",
         docs_url="/docs",
-        redoc_url="/redoc"
+        redoc_url="/redoc",
+        lifespan=lifespan
     )
 
     # CORS Middleware
@@ -23,6 +61,7 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "X-Point-Count", "X-Projection"],
     )
 
     # Include Routers
@@ -42,4 +81,7 @@ def start():
     Entry point for CLI.
     """
     import uvicorn
-    uvicorn.run("ultimaterag.server:app", host="0.0.0.0", reload=True)
+    if settings.SERVER_WORKERS > 1 and settings.VECTOR_DB_TYPE.lower() == "chroma":
+        raise ValueError("Chroma supports a single worker; set VECTOR_DB_TYPE=postgres to run several.")
+    uvicorn.run("ultimaterag.server:app", host="0.0.0.0", workers=settings.SERVER_WORKERS,
+                timeout_graceful_shutdown=settings.SHUTDOWN_TIMEOUT)
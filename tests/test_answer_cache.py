@@ -0,0 +1,182 @@
+import time
+
+from ultimaterag.core.answer_cache import CachedAnswer, SemanticAnswerCache, usage_tokens
+
+Q = [1.0, 0.0, 0.0]
+NEAR = [0.99, 0.05, 0.0]
+FAR = [0.0, 1.0, 0.0]
+
+
+def make_cache(**kwargs):
+    options = {"max_size": 10, "threshold": 0.95, "ttl": 3600}
+    options.update(kwargs)
+    return SemanticAnswerCache(**options)
+
+
+def test_similar_query_hits_in_same_bucket_only():
+    cache = make_cache()
+    alice = cache.bucket_key("alice", "prompt", {"temperature": 0.7}, "vector")
+    cache.store(alice, Q, CachedAnswer("42", tokens=120))
+
+    assert cache.lookup(alice, NEAR).answer == "42"
+    assert cache.lookup(alice, FAR) is None
+    assert cache.lookup(cache.bucket_key("bob", "prompt", {"temperature": 0.7}, "vector"), Q) is None
+    assert cache.lookup(cache.bucket_key("alice", "other prompt", {"temperature": 0.7}, "vector"), Q) is None
+    assert cache.lookup(cache.bucket_key("alice", "prompt", {"temperature": 0.0}, "vector"), Q) is None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["saved_tokens"]) == (1, 4, 120)
+
+
+def test_common_ingestion_invalidates_everyone_private_only_owner():
+    cache = make_cache()
+    alice, bob, anon = (cache.bucket_key(u) for u in ("alice", "bob", None))
+    for bucket in (alice, bob, anon):
+        cache.store(bucket, Q, CachedAnswer("a"))
+
+    assert cache.invalidate("alice", "private") == 1
+    assert cache.lookup(alice, Q) is None
+    assert cache.lookup(bob, Q) is not None
+
+    assert cache.invalidate(None, "common") == 2
+    assert len(cache) == 0
+
+
+def test_answer_computed_before_ingestion_is_not_stored():
+    cache = make_cache()
+    bucket = cache.bucket_key("alice")
+    generation = cache.generation("alice")
+    cache.invalidate("alice", "private")  # documents written while the LLM was answering
+    cache.store(bucket, Q, CachedAnswer("stale"), generation=generation)
+    assert len(cache) == 0
+
+    cache.store(bucket, Q, CachedAnswer("fresh"), generation=cache.generation("alice"))
+    assert cache.lookup(bucket, Q).answer == "fresh"
+
+
+class FakeRedis:
+    """The two commands the shared generation counters use, over a dict shared by "workers"."""
+
+    def __init__(self):
+        self.values = {}
+
+    def mget(self, keys):
+        return [self.values.get(k) for k in keys]
+
+    def incr(self, key):
+        self.values[key] = self.values.get(key, 0) + 1
+        return self.values[key]
+
+
+def test_ingest_on_one_worker_invalidates_the_others_through_redis(monkeypatch):
+    redis = FakeRedis()
+    worker_a, worker_b = make_cache(use_redis=True), make_cache(use_redis=True)
+    for cache in (worker_a, worker_b):
+        monkeypatch.setattr(cache, "_get_redis", lambda: redis)
+    alice, bob = worker_b.bucket_key("alice"), worker_b.bucket_key("bob")
+    worker_b.store(alice, Q, CachedAnswer("a"), generation=worker_b.generation("alice"))
+    worker_b.store(bob, Q, CachedAnswer("b"), generation=worker_b.generation("bob"))
+
+    # Worker B answers for bob while worker A ingests bob's documents
+    racing = worker_b.generation("bob")
+    worker_a.invalidate("bob", "private")
+    worker_b.store(bob, FAR, CachedAnswer("stale"), generation=racing)
+    worker_b.generation("bob")
+    assert worker_b.lookup(bob, Q) is None and worker_b.lookup(bob, FAR) is None
+    assert worker_b.lookup(alice, Q).answer == "a"
+
+    worker_a.invalidate(None, "common")
+    worker_b.generation("alice")
+    assert len(worker_b) == 0
+
+
+def test_ttl_and_lru_eviction():
+    cache = make_cache(max_size=2, ttl=60)
+    bucket = cache.bucket_key(None)
+    cache.store(bucket, Q, CachedAnswer("old", created_at=time.time() - 120))
+    assert cache.lookup(bucket, Q) is None
+    assert len(cache) == 0
+
+    cache.store(bucket, Q, CachedAnswer("q"))
+    cache.store(bucket, FAR, CachedAnswer("far"))
+    cache.lookup(bucket, Q)  # refresh "q"
+    cache.store(bucket, [0.0, 0.0, 1.0], CachedAnswer("z"))  # evicts "far"
+    assert cache.lookup(bucket, FAR) is None
+    assert cache.lookup(bucket, Q).answer == "q"
+
+
+def test_usage_tokens_reads_both_shapes():
+    assert usage_tokens({"input_tokens": 3, "output_tokens": 2, "total_tokens": 5}) == 5
+    assert usage_tokens({"token_usage": {"total_tokens": 7}, "model_name": "x"}) == 7
+    assert usage_tokens(None) == 0
+
+
+# --- Pipeline integration (RAGPipeline.aquery / astream_query) ---
+
+import asyncio
+
+from test_chat_stream import make_pipeline
+
+
+def collect(agen):
+    async def run():
+        return [item async for item in agen]
+    return asyncio.run(run())
+
+
+def test_aquery_serves_repeat_standalone_question_and_records_turn():
+    pipeline = make_pipeline(["Generated once.", "Generated twice."], answer_cache=make_cache())
+    first = asyncio.run(pipeline.aquery("s1", "what is rag?"))
+    second = asyncio.run(pipeline.aquery("s2", "what is rag?"))
+
+    assert (first["cached"], second["cached"]) == (False, True)
+    assert second["content"] == "Generated once."
+    assert pipeline.vector_manager.searches == 1  # no retrieval or generation on the hit
+    # A hit skips the chain, so the turn is written to the new session's history directly
+    assert [m.content for m in pipeline.memory_manager.sessions["s2"].messages] == [
+        "what is rag?", "Generated once."]
+
+
+def test_follow_up_questions_are_neither_served_nor_stored():
+    cache = make_cache()
+    pipeline = make_pipeline(["First.", "Follow-up answer."], answer_cache=cache)
+    asyncio.run(pipeline.aquery("s1", "what is rag?"))
+    assert len(cache) == 1
+
+    # Same words, but the session has history: the answer depends on the conversation
+    follow_up = asyncio.run(pipeline.aquery("s1", "what is rag?"))
+    assert follow_up["cached"] is False and follow_up["content"] == "Follow-up answer."
+    assert len(cache) == 1
+
+
+def test_streamed_answer_is_stored_joined_and_replayed():
+    pipeline = make_pipeline(["Streamed answer."], answer_cache=make_cache())
+    events = collect(pipeline.astream_query("s1", "what is rag?"))
+    assert [e["event"] for e in events][-1] == "done"
+
+    hit = asyncio.run(pipeline.aquery("s2", "what is rag?"))
+    assert hit["cached"] is True and hit["content"] == "Streamed answer."
+
+    replay = collect(pipeline.astream_query("s3", "what is rag?"))
+    assert [e["event"] for e in replay] == ["sources", "token", "done"]
+    assert replay[0]["data"][0]["metadata"] == {"source": "a.txt"}
+    assert replay[1]["data"] == "Streamed answer." and replay[2]["data"]["cached"] is True
+    assert len(pipeline.memory_manager.sessions["s3"].messages) == 2
+
+
+def test_answer_racing_an_ingest_is_not_cached():
+    cache = make_cache()
+    pipeline = make_pipeline(["Answer from old data.", "Answer from new data."], answer_cache=cache)
+    search = pipeline.vector_manager.search
+
+    def search_during_ingest(*args, **kwargs):
+        cache.invalidate(None, "common")  # documents written while this answer is produced
+        return search(*args, **kwargs)
+
+    pipeline.vector_manager.search = search_during_ingest
+    asyncio.run(pipeline.aquery("s1", "what is rag?"))
+    assert len(cache) == 0
+
+    pipeline.vector_manager.search = search
+    fresh = asyncio.run(pipeline.aquery("s2", "what is rag?"))
+    assert fresh["cached"] is False and fresh["content"] == "Answer from new data."
@@ -0,0 +1,41 @@
+import struct
+
+from ultimaterag.Database.BulkInsert import COPY_HEADER, COPY_TRAILER, _StreamReader, encode_copy_binary
+
+
+def test_copy_binary_layout():
+    stream = b"".join(encode_copy_binary([("hi", {"a": 1}, [1.0, 2.0]), (None, "{}", [0.5])],
+                                         ["text", "jsonb", "vector"]))
+
+    assert stream.startswith(COPY_HEADER)
+    assert stream.endswith(COPY_TRAILER)
+
+    body = stream[len(COPY_HEADER):-len(COPY_TRAILER)]
+    # first row: 3 fields
+    assert struct.unpack("!h", body[:2])[0] == 3
+    assert body[2:6] == struct.pack("!i", 2) and body[6:8] == b"hi"
+    jsonb = b'\x01{"a": 1}'
+    assert body[8:12] == struct.pack("!i", len(jsonb)) and body[12:12 + len(jsonb)] == jsonb
+    offset = 12 + len(jsonb)
+    assert body[offset:offset + 4] == struct.pack("!i", 4 + 8)
+    assert body[offset + 4:offset + 16] == struct.pack("!HH", 2, 0) + struct.pack("!ff", 1.0, 2.0)
+    # second row starts with a NULL text field
+    second = body[offset + 16:]
+    assert second[2:6] == struct.pack("!i", -1)
+
+
+def test_copy_binary_float4_array():
+    stream = b"".join(encode_copy_binary([([1.0, -2.5],)], ["float4[]"]))
+    body = stream[len(COPY_HEADER):-len(COPY_TRAILER)]
+
+    expected = struct.pack("!iiiii", 1, 0, 700, 2, 1) + struct.pack("!if", 4, 1.0) + struct.pack("!if", 4, -2.5)
+    assert body[2:6] == struct.pack("!i", len(expected))
+    assert body[6:] == expected
+
+
+def test_stream_reader_serves_exact_sizes():
+    reader = _StreamReader([b"abc", b"defg", b"h"])
+    assert reader.read(2) == b"ab"
+    assert reader.read(4) == b"cdef"
+    assert reader.read(-1) == b"gh"
+    assert reader.read(8) == b""
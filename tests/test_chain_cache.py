@@ -0,0 +1,41 @@
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from ultimaterag.core.rag_engine import RAGPipeline
+from ultimaterag.utils.LRU_Cache import LRUCache
+
+
+def make_pipeline(cache_size=4):
+    rag = RAGPipeline.__new__(RAGPipeline)
+    rag.llm = FakeListChatModel(responses=["ok"])
+    rag.chain_cache = LRUCache(cache_size)
+    return rag
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.get_or_create("a", lambda: 1)
+    cache.get_or_create("b", lambda: 2)
+    cache.get_or_create("a", lambda: -1)  # refresh "a"
+    cache.get_or_create("c", lambda: 3)   # evicts "b"
+
+    assert cache.get_or_create("a", lambda: -1) == 1
+    assert cache.get_or_create("b", lambda: 20) == 20
+    assert cache.stats()["hits"] == 2
+
+
+def test_zero_size_disables_caching():
+    cache = LRUCache(0)
+    built = []
+    cache.get_or_create("k", lambda: built.append(1))
+    cache.get_or_create("k", lambda: built.append(1))
+    assert len(built) == 2
+    assert len(cache) == 0
+
+
+def test_chain_is_reused_for_same_prompt_and_params():
+    rag = make_pipeline()
+    first = rag._get_chain("Be brief.", {"temperature": 0.2})
+    assert rag._get_chain("Be brief.", {"temperature": 0.2}) is first
+    assert rag._get_chain("Be verbose.", {"temperature": 0.2}) is not first
+    assert rag._get_chain("Be brief.", {"temperature": 0.9}) is not first
+    assert rag._get_chain(None, None) is rag._get_chain(None, {})
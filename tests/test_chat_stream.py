@@ -0,0 +1,134 @@
+import json
+import threading
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from langchain_core.chat_history import InMemoryChatMessageHistory
+from langchain_core.documents import Document
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+
+from ultimaterag.API.v1.endpoints import chat, memory
+from ultimaterag.core.rag_engine import RAGPipeline
+from ultimaterag.utils.LRU_Cache import LRUCache
+
+
+class FakeVectorManager:
+    def __init__(self):
+        self.searches = 0
+        self.docs = [Document(page_content="RAG retrieves context.", metadata={"source": "a.txt"})]
+
+    def search(self, query, k=4, filter=None, mode=None, **search_params):
+        self.searches += 1
+        return self.docs
+
+    def embed_query(self, text):
+        return [1.0, float(len(text) % 3), 0.0]
+
+
+class FakeMemoryManager:
+    def __init__(self):
+        self.sessions = {}
+        self.scheduled = []
+
+    def get_session_memory(self, session_id):
+        return self.sessions.setdefault(session_id, InMemoryChatMessageHistory())
+
+    def get_history(self, session_id):
+        return self.get_session_memory(session_id).messages
+
+    def schedule_consolidation(self, session_id):
+        self.scheduled.append(session_id)
+        return True
+
+
+def make_pipeline(responses, answer_cache=None, **llm_options):
+    """A RAGPipeline over in-memory stores and a scripted chat model."""
+    pipeline = RAGPipeline.__new__(RAGPipeline)
+    pipeline.vector_manager = FakeVectorManager()
+    pipeline.memory_manager = FakeMemoryManager()
+    pipeline.llm = FakeListChatModel(responses=responses, **llm_options)
+    pipeline.chain_cache = LRUCache(8)
+    pipeline.reranker = None
+    pipeline.answer_cache = answer_cache
+    return pipeline
+
+
+def parse_sse(body: str) -> list:
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def stream(pipeline, monkeypatch, **payload):
+    monkeypatch.setattr(chat, "get_rag_engine", lambda: pipeline)
+    app = FastAPI()
+    app.include_router(chat.router, prefix="/chat")
+    response = TestClient(app).post("/chat/stream", json={"session_id": "s1", "query": "what is rag?", **payload})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    return parse_sse(response.text)
+
+
+def test_stream_sends_sources_tokens_then_done_and_saves_history(monkeypatch):
+    pipeline = make_pipeline(["Retrieval augmented generation."])
+    events = stream(pipeline, monkeypatch)
+
+    names = [name for name, _ in events]
+    assert names[0] == "sources" and names[-1] == "done"
+    assert set(names[1:-1]) == {"token"}
+    assert events[0][1][0]["metadata"] == {"source": "a.txt"}
+    assert "".join(data for name, data in events if name == "token") == "Retrieval augmented generation."
+    assert events[-1][1]["session_id"] == "s1" and events[-1][1]["cached"] is False
+
+    history = pipeline.memory_manager.sessions["s1"].messages
+    assert isinstance(history[0], HumanMessage) and isinstance(history[1], AIMessage)
+    assert history[1].content == "Retrieval augmented generation."
+    assert pipeline.memory_manager.scheduled == ["s1"]
+
+
+def test_stream_without_sources_and_error_mid_stream(monkeypatch):
+    pipeline = make_pipeline(["abcdef"], error_on_chunk_number=2)
+    events = stream(pipeline, monkeypatch, include_sources=False)
+
+    names = [name for name, _ in events]
+    assert names == ["token", "token", "error"]
+    assert events[-1][1]["message"] == "Failed to process chat request"
+    assert pipeline.memory_manager.scheduled == []
+
+
+def test_chat_endpoint_returns_answer_and_records_turn(monkeypatch):
+    pipeline = make_pipeline(["It retrieves, then generates."])
+    monkeypatch.setattr(chat, "get_rag_engine", lambda: pipeline)
+    app = FastAPI()
+    app.include_router(chat.router, prefix="/chat")
+
+    response = TestClient(app).post("/chat/chat", json={"session_id": "s2", "query": "how does rag work?"})
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert data["answer"] == "It retrieves, then generates."
+    assert data["metadata"]["cached"] is False
+    assert [m.content for m in pipeline.memory_manager.sessions["s2"].messages] == [
+        "how does rag work?", "It retrieves, then generates."]
+
+
+def test_engine_is_resolved_off_the_event_loop(monkeypatch):
+    pipeline = make_pipeline(["ok"])
+    threads = []
+
+    def get_engine():
+        threads.append(threading.current_thread().name)
+        return pipeline
+
+    monkeypatch.setattr(chat, "get_rag_engine", get_engine)
+    monkeypatch.setattr(memory, "get_rag_engine", get_engine)
+    app = FastAPI()
+    app.include_router(chat.router, prefix="/chat")
+    app.include_router(memory.router, prefix="/memory")
+    client = TestClient(app)
+
+    assert client.post("/chat/chat", json={"session_id": "s3", "query": "hi"}).status_code == 200
+    assert client.get("/memory/s3").status_code == 200
+    assert len(threads) == 2 and all(name.startswith("rag-blocking") for name in threads)
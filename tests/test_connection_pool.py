@@ -0,0 +1,86 @@
+import threading
+
+import pytest
+from psycopg2 import extensions as pg_ext
+from ultimaterag.Database import Connection
+
+
+class FakeInfo:
+    transaction_status = pg_ext.TRANSACTION_STATUS_IDLE
+
+
+class FakeConn:
+    vector_registered = False
+    last_used = 0.0
+
+    def __init__(self):
+        self.closed = 0
+        self.info = FakeInfo()
+        self.rollbacks = 0
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.info.transaction_status = pg_ext.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def fake_pg(monkeypatch):
+    opened = []
+
+    def connect(**kwargs):
+        conn = FakeConn()
+        opened.append(conn)
+        return conn
+
+    def register(conn):
+        conn.registrations = getattr(conn, "registrations", 0) + 1
+
+    monkeypatch.setattr(Connection.psycopg2, "connect", connect)
+    monkeypatch.setattr(Connection, "register_vector", register)
+    return opened
+
+
+def make_pool(**kwargs):
+    options = dict(minconn=1, maxconn=2, timeout=0.2, ping_interval=60)
+    options.update(kwargs)
+    return Connection.ConnectionPool(**options)
+
+
+def test_connections_are_reused_and_registered_once(fake_pg):
+    pool = make_pool()
+    first = pool.getconn()
+    pool.putconn(first)
+    second = pool.getconn()
+
+    assert first is second
+    assert len(fake_pg) == 1
+    assert first.registrations == 1
+
+
+def test_pool_blocks_then_times_out_when_exhausted(fake_pg):
+    pool = make_pool()
+    a, b = pool.getconn(), pool.getconn()
+
+    with pytest.raises(ConnectionError):
+        pool.getconn()
+
+    threading.Timer(0.05, pool.putconn, args=(a,)).start()
+    assert pool.getconn() is a
+    assert pool.stats()["in_use"] == 2
+
+
+def test_broken_connections_are_replaced(fake_pg):
+    pool = make_pool()
+    conn = pool.getconn()
+    rollbacks = conn.rollbacks
+    conn.info.transaction_status = pg_ext.TRANSACTION_STATUS_INERROR
+    pool.putconn(conn)
+    assert conn.rollbacks == rollbacks + 1
+
+    conn.closed = 1  # server went away while idle
+    fresh = pool.getconn()
+    assert fresh is not conn
+    assert pool.stats()["size"] == 1
@@ -0,0 +1,146 @@
+import threading
+import time
+
+from ultimaterag.core.consolidation import ConsolidationQueue
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_pending_submits_are_deduplicated():
+    gate = threading.Event()
+    calls = []
+
+    def blocker(key):
+        gate.wait(5)
+
+    def handler(key):
+        calls.append(key)
+
+    q = ConsolidationQueue(workers=1)
+    q.submit("busy", blocker)  # occupies the only worker
+    assert wait_for(lambda: q.stats()["running"] == 1)
+
+    assert q.submit("s1", handler) is True
+    assert q.submit("s1", handler) is False
+    assert q.submit("s1", handler) is False
+    assert q.stats()["depth"] == 1
+    assert q.stats()["deduplicated"] == 2
+
+    gate.set()
+    q.stop()
+    assert calls == ["s1"]
+    assert q.stats()["completed"] == 2
+
+
+def test_submit_while_running_reruns_once_after_current_job():
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def handler(key):
+        calls.append(key)
+        if len(calls) == 1:
+            started.set()
+            release.wait(5)
+
+    q = ConsolidationQueue(workers=2)
+    q.submit("s1", handler)
+    assert started.wait(5)
+
+    # Arrives mid-run: must not run concurrently, but must run again afterwards.
+    assert q.submit("s1", handler) is False
+    assert q.submit("s1", handler) is False
+    time.sleep(0.05)
+    assert calls == ["s1"]
+
+    release.set()
+    assert wait_for(lambda: q.stats()["completed"] == 2)
+    q.stop()
+    assert calls == ["s1", "s1"]
+
+
+def test_failures_are_counted_and_workers_survive():
+    def boom(key):
+        raise RuntimeError("llm down")
+
+    done = []
+    q = ConsolidationQueue(workers=1)
+    q.submit("bad", boom)
+    q.submit("good", done.append)
+    q.stop()
+
+    stats = q.stats()
+    assert stats["failed"] == 1
+    assert stats["completed"] == 1
+    assert done == ["good"]
+
+
+def test_max_pending_and_stop_drop_new_jobs():
+    gate = threading.Event()
+    q = ConsolidationQueue(workers=1, max_pending=1)
+    q.submit("busy", lambda key: gate.wait(5))
+    assert wait_for(lambda: q.stats()["running"] == 1)
+
+    assert q.submit("a", lambda key: None) is True
+    assert q.submit("b", lambda key: None) is False
+    assert q.stats()["dropped"] == 1
+
+    gate.set()
+    q.stop()
+    assert q.submit("c", lambda key: None) is False
+    assert q.stats()["dropped"] == 2
+
+
+def test_lag_metrics_reflect_queue_wait():
+    gate = threading.Event()
+    q = ConsolidationQueue(workers=1)
+    q.submit("busy", lambda key: gate.wait(5))
+    assert wait_for(lambda: q.stats()["running"] == 1)
+    q.submit("waiting", lambda key: None)
+
+    time.sleep(0.1)
+    assert q.stats()["current_lag_seconds"] >= 0.1
+
+    gate.set()
+    q.stop()
+    stats = q.stats()
+    assert stats["depth"] == 0
+    assert stats["current_lag_seconds"] == 0.0
+    assert stats["max_lag_seconds"] >= 0.1
+
+
+def test_keys_are_enqueued_under_the_lock_so_stop_cannot_strand_them():
+    # stop() reads `stopped` and queues its sentinels under the lock; a key put outside
+    # it could land behind the sentinels and stay in _pending forever
+    q = ConsolidationQueue(workers=1)
+    unlocked_puts = []
+    put = q._queue.put
+
+    def checked_put(item, *args, **kwargs):
+        if item is not None and not q._lock.locked():
+            unlocked_puts.append(item)
+        put(item, *args, **kwargs)
+
+    q._queue.put = checked_put
+    started, release = threading.Event(), threading.Event()
+
+    def handler(key):
+        started.set()
+        release.wait(5)
+
+    q.submit("s1", handler)
+    assert started.wait(5)
+    q.submit("s1", handler)  # dirty: re-queued when the current run finishes
+    release.set()
+    assert wait_for(lambda: q.stats()["completed"] == 2)
+    q.stop()
+
+    assert unlocked_puts == []
+    assert q.stats()["depth"] == 0
@@ -0,0 +1,42 @@
+from ultimaterag.LLM.embeddings import CachedEmbeddings, EmbeddingCache
+
+
+class CountingEmbeddings:
+    model = "fake-embed"
+
+    def __init__(self):
+        self.query_calls = 0
+
+    def embed_query(self, text):
+        self.query_calls += 1
+        return [float(len(text)), 1.0]
+
+    def embed_documents(self, texts):
+        return [[float(len(t)), 0.0] for t in texts]
+
+
+def test_repeated_queries_hit_the_cache():
+    inner = CountingEmbeddings()
+    embeddings = CachedEmbeddings(inner, EmbeddingCache(max_size=8), "fake", inner.model)
+
+    assert embeddings.embed_query("what is rag?") == embeddings.embed_query("what is rag?")
+    assert inner.query_calls == 1
+
+    stats = embeddings.cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+    assert embeddings.model == "fake-embed"
+
+
+def test_lru_evicts_oldest_and_namespaces_are_isolated():
+    cache = EmbeddingCache(max_size=2)
+    a = CachedEmbeddings(CountingEmbeddings(), cache, "fake", "model-a")
+    b = CachedEmbeddings(CountingEmbeddings(), cache, "fake", "model-b")
+
+    a.embed_query("q1")
+    b.embed_query("q1")  # same text, different model -> separate entry
+    assert b.inner.query_calls == 1
+
+    a.embed_query("q2")  # evicts the oldest entry (model-a q1)
+    a.embed_query("q1")
+    assert a.inner.query_calls == 3
+    assert cache.stats()["size"] == 2
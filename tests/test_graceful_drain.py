@@ -0,0 +1,102 @@
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+import pytest
+import uvicorn
+from fastapi import FastAPI
+
+from test_chat_stream import make_pipeline, parse_sse
+from ultimaterag.API.v1.endpoints import chat
+from ultimaterag.core import container
+
+
+def serve(pipeline, monkeypatch, graceful_timeout):
+    """Run the chat router under a real uvicorn server in a thread; records lifespan shutdown."""
+    monkeypatch.setattr(chat, "get_rag_engine", lambda: pipeline)
+    events = []
+
+    @asynccontextmanager
+    async def lifespan(app):
+        yield
+        events.append("lifespan shutdown")
+
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(chat.router, prefix="/chat")
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning",
+                                           timeout_graceful_shutdown=graceful_timeout))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 5
+    while not server.started and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert server.started
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, thread, f"http://127.0.0.1:{port}", events
+
+
+def open_stream(client, url):
+    return client.stream("POST", f"{url}/chat/stream", json={"session_id": "s1", "query": "what is rag?"})
+
+
+def test_shutdown_lets_an_open_stream_finish_before_the_lifespan_closes(monkeypatch):
+    pipeline = make_pipeline(["streamed to the end"], sleep=0.02)
+    server, thread, url, events = serve(pipeline, monkeypatch, graceful_timeout=5)
+
+    with httpx.Client(timeout=5) as client, open_stream(client, url) as response:
+        chunks = response.iter_text()
+        body = next(chunks)
+        server.should_exit = True  # what uvicorn's SIGTERM handler does
+        body += "".join(chunks)
+        events.append("stream closed")
+
+    thread.join(5)
+    assert not thread.is_alive()
+    names = [name for name, _ in parse_sse(body)]
+    assert names[0] == "sources" and names[-1] == "done"
+    assert events == ["stream closed", "lifespan shutdown"]
+    assert pipeline.memory_manager.scheduled == ["s1"]
+
+
+def test_graceful_timeout_cancels_a_stuck_stream_and_still_shuts_down(monkeypatch):
+    pipeline = make_pipeline(["far too slow to finish"], sleep=1.0)
+    server, thread, url, events = serve(pipeline, monkeypatch, graceful_timeout=0.2)
+
+    with httpx.Client(timeout=5) as client, open_stream(client, url) as response:
+        chunks = response.iter_text()
+        next(chunks)
+        started = time.monotonic()
+        server.should_exit = True
+        try:
+            body = "".join(chunks)
+        except httpx.HTTPError:
+            body = ""
+
+    thread.join(5)
+    assert not thread.is_alive() and time.monotonic() - started < 3
+    assert "event: done" not in body
+    assert events == ["lifespan shutdown"]
+
+
+def test_engine_built_before_fork_is_not_reused(monkeypatch):
+    engine = object()
+    monkeypatch.setattr(container, "_rag_engine", engine)
+    monkeypatch.setattr(container, "_pid", os.getpid())
+    assert container.rag_engine_ready() and container.get_rag_engine() is engine
+
+    # As seen from a forked worker: the parent's engine belongs to another pid
+    monkeypatch.setattr(container, "_pid", -1)
+    assert not container.rag_engine_ready()
+
+
+def test_start_refuses_several_workers_with_chroma(monkeypatch):
+    from typer.testing import CliRunner
+    from ultimaterag import cli
+    from ultimaterag.config.settings import settings
+
+    monkeypatch.setattr(settings, "VECTOR_DB_TYPE", "chroma")
+    monkeypatch.setattr(uvicorn, "run", lambda *args, **kwargs: pytest.fail("server started"))
+    result = CliRunner().invoke(cli.app, ["start", "--workers", "2"])
+    assert result.exit_code != 0 and "VECTOR_DB_TYPE=postgres" in result.output
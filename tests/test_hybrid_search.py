@@ -0,0 +1,147 @@
+import chromadb
+import pytest
+from langchain_core.documents import Document
+
+from ultimaterag.core.vector_db.base import VectorDBBase, build_access_filter, reciprocal_rank_fusion
+from ultimaterag.core.vector_db.chroma import ChromaVectorDB
+from ultimaterag.core.vector_db.keyword_index import BM25Index, matches_filter, tokenize
+
+
+class FakeEmbeddings:
+    model = "fake"
+
+    def embed_documents(self, texts):
+        return [self.embed_query(t) for t in texts]
+
+    def embed_query(self, text):
+        # Length-based "semantics": identifiers carry no meaning for the dense leg.
+        return [float(len(text)), 1.0, 0.5]
+
+
+def make_chroma(tmp_path):
+    db = ChromaVectorDB.__new__(ChromaVectorDB)
+    db.client = chromadb.PersistentClient(path=str(tmp_path))
+    db.embeddings = FakeEmbeddings()
+    db.collection = db.client.get_or_create_collection("rag_collection", metadata={"hnsw:space": "cosine"})
+    db.projection_path = str(tmp_path / "rag_collection.projection.npz")
+    db._keyword_index = None
+    return db
+
+
+def docs(*texts, source="t"):
+    return [Document(page_content=t, metadata={"source": source}) for t in texts]
+
+
+def test_tokenize_keeps_identifiers_whole_and_split():
+    assert tokenize("Error ERR-4021 in v2.3.1") == ["error", "err-4021", "err", "4021", "in", "v2.3.1", "v2", "3", "1"]
+
+
+def test_bm25_ranks_exact_identifier_first():
+    index = BM25Index()
+    index.add("1", "General troubleshooting guide for the payment service")
+    index.add("2", "ERR-4021 means the payment token expired; refresh it")
+    index.add("3", "ERR-5000 is an internal server error")
+
+    hits = index.search("what does ERR-4021 mean", k=2)
+    assert hits[0][0] == "2"
+    assert all(hit[1] > 0 for hit in hits)
+
+
+def test_bm25_remove_and_reindex():
+    index = BM25Index()
+    index.add("1", "alpha beta")
+    index.add("1", "gamma")  # same id replaces the old text
+    assert index.search("alpha", k=5) == []
+    assert [h[0] for h in index.search("gamma", k=5)] == ["1"]
+    index.remove("1")
+    assert len(index) == 0
+
+
+def test_filter_matching_supports_rbac_or():
+    rbac = build_access_filter("alice")
+    assert matches_filter({"user_id": "alice", "access_level": "private"}, rbac)
+    assert matches_filter({"access_level": "common"}, rbac)
+    assert not matches_filter({"user_id": "bob", "access_level": "private"}, rbac)
+
+
+def test_rrf_rewards_documents_found_by_both_rankings():
+    a, b, c, d = docs("a", "b", "c", "d")
+    fused = reciprocal_rank_fusion([[a, b, c], [d, c]], k=3)
+    assert fused[0].page_content == "c"
+    assert {doc.page_content for doc in fused} <= {"a", "b", "c", "d"}
+    assert len(fused) == 3
+
+
+def test_rrf_weights():
+    a, b = docs("a", "b")
+    assert reciprocal_rank_fusion([[a], [b]], k=1, weights=[1.0, 2.0])[0].page_content == "b"
+
+
+def test_search_dispatches_by_mode():
+    class Backend(VectorDBBase):
+        def add_documents(self, *args, **kwargs): pass
+        def similarity_search(self, query, k=4, filter=None, **kw): return docs("dense")
+        def similarity_search_with_vectors(self, *args, **kwargs): pass
+        def keyword_search(self, query, k=4, filter=None): return docs("lexical")
+        def get_retriever(self, search_kwargs=None): pass
+
+    backend = Backend()
+    assert backend.search("q", mode="vector")[0].page_content == "dense"
+    assert backend.search("q", mode="keyword")[0].page_content == "lexical"
+    assert {d.page_content for d in backend.search("q", mode="hybrid")} == {"dense", "lexical"}
+    with pytest.raises(ValueError):
+        backend.search("q", mode="fuzzy")
+
+
+def test_chroma_hybrid_finds_error_code(tmp_path):
+    db = make_chroma(tmp_path)
+    filler = [f"Build {i}: minor fixes" for i in range(30)]  # shorter, so "closer" for the fake embedder
+    db.add_documents(docs(*filler), access_level="common")
+
+    # Index is built lazily from the collection, then kept in sync on add.
+    assert db.keyword_search("ERR-4021", k=1) == []
+    db.add_documents(docs("Payment failed with ERR-4021 after the token expired", source="incident.log"),
+                     access_level="common")
+
+    rbac = build_access_filter(None)
+    dense = db.search("ERR-4021", k=2, filter=rbac, mode="vector")
+    hybrid = db.search("ERR-4021", k=2, filter=rbac, mode="hybrid")
+    assert not any("ERR-4021" in d.page_content for d in dense)
+    assert any("ERR-4021" in d.page_content for d in hybrid)
+
+    assert db.keyword_search("ERR-4021", k=1, filter={"access_level": "private"}) == []
+
+
+def test_chroma_reingest_skips_unchanged_chunks(tmp_path):
+    db = make_chroma(tmp_path)
+    first = db.add_documents(docs("alpha", "beta", "gamma"), access_level="common")
+    assert (first["documents"], first["skipped"]) == (3, 0)
+
+    again = db.add_documents(docs("alpha", "beta", "gamma", "delta", "delta"), access_level="common")
+    assert (again["documents"], again["skipped"]) == (1, 4)
+    assert db.collection.count() == 4
+
+    # Same text in another owner's scope is a different chunk
+    private = db.add_documents(docs("alpha"), user_id="alice", access_level="private")
+    assert private["documents"] == 1
+    assert db.collection.count() == 5
+
+
+def test_chroma_reingesting_a_modified_file_replaces_its_old_chunks(tmp_path):
+    db = make_chroma(tmp_path)
+    db.add_documents(docs("We sell widgets.", "Shipping is free.", source="catalog.txt"), access_level="common")
+    db.add_documents(docs("We sell widgets.", source="catalog.txt"), user_id="alice", access_level="private")
+    db.add_documents(docs("Widgets are blue.", source="faq.txt"), access_level="common")
+    assert db.keyword_search("widgets", k=10)  # builds the keyword index
+
+    edited = db.add_documents(docs("We sell gadgets.", "Shipping is free.", source="catalog.txt"),
+                              access_level="common")
+    assert (edited["documents"], edited["skipped"], edited["removed"]) == (1, 1, 1)
+    assert db.collection.count() == 4
+
+    common = build_access_filter(None)
+    texts = {d.page_content for d in db.keyword_search("widgets gadgets", k=10, filter=common)}
+    assert texts == {"We sell gadgets.", "Widgets are blue."}
+    # Alice's private copy and the other file are another source or scope: untouched
+    assert {d.page_content for d in db.keyword_search("widgets", k=10, filter=build_access_filter("alice"))} == {
+        "We sell widgets.", "Widgets are blue."}
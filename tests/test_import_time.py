@@ -0,0 +1,51 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+# Importing an entry point must not build the engine or load these
+HEAVY_MODULES = ["chromadb", "sklearn", "sentence_transformers", "torch", "psycopg2", "redis",
+                 "uvicorn", "langchain_openai", "ultimaterag.core.rag_engine"]
+
+
+def loaded_after_import(module: str, heavy: list = HEAVY_MODULES) -> list:
+    code = (f"import json, sys; import {module}; "
+            f"print(json.dumps([m for m in {heavy!r} if m in sys.modules]))")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize("module", ["ultimaterag.cli", "ultimaterag.server"])
+def test_entry_points_import_lazily(module):
+    assert loaded_after_import(module) == []
+
+
+@pytest.mark.parametrize("module", ["ultimaterag.Database.DataAdding", "ultimaterag.Database.vectorSearch"])
+def test_database_helpers_load_model_on_first_use(module):
+    assert loaded_after_import(module, ["sentence_transformers"]) == []
+
+
+def test_version_command_needs_no_services():
+    result = subprocess.run([sys.executable, "-m", "ultimaterag.cli", "version"],
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0
+    assert "UltimateRAG" in result.stdout
+
+
+def test_container_builds_engine_on_first_use(monkeypatch):
+    from ultimaterag.core import container, rag_engine
+
+    built = []
+
+    class FakePipeline:
+        def __init__(self):
+            built.append(self)
+
+    monkeypatch.setattr(rag_engine, "RAGPipeline", FakePipeline)
+    monkeypatch.setattr(container, "_rag_engine", None)
+
+    assert not container.rag_engine_ready()
+    first = container.get_rag_engine()
+    assert container.rag_engine is first and container.get_rag_engine() is first
+    assert len(built) == 1 and container.rag_engine_ready()
@@ -0,0 +1,131 @@
+import random
+
+import pytest
+from ultimaterag.core import ingestion
+from ultimaterag.core.ingestion import IngestionManager
+
+
+class FakeVectorManager:
+    def __init__(self):
+        self.batches = []
+
+    def add_documents(self, documents, user_id=None, access_level="private", batch_size=None):
+        batch = []
+        for doc in documents:
+            batch.append(doc)
+            if len(batch) == batch_size:
+                self.batches.append((batch, user_id, access_level))
+                batch = []
+        if batch:
+            self.batches.append((batch, user_id, access_level))
+        return {"batches": len(self.batches), "docs_per_sec": 0.0}
+
+
+def test_text_is_streamed_into_chunks(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("The Ultimate RAG system streams files. " * 2000, encoding="utf-8")
+
+    ingester = IngestionManager(chunk_size=200, chunk_overlap=20)
+    chunks = list(ingester.iter_chunks(str(path)))
+
+    assert len(chunks) > 100
+    assert all(len(c.page_content) <= 200 for c in chunks)
+    assert all(c.metadata["source"] == "notes.txt" for c in chunks)
+
+
+def mixed_text(words=30000):
+    rng = random.Random(7)
+    parts = []
+    for i in range(words):
+        parts.append("".join(rng.choice("abcdefghij") for _ in range(rng.randint(2, 9))))
+        parts.append(rng.choice([" ", " ", " ", "  ", "\n", "\n\n"]))
+        if i % 400 == 0:
+            parts.append(f"\n# Heading {i}\n")
+    return "".join(parts)
+
+
+@pytest.mark.parametrize("ext", [".txt", ".md"])
+def test_streaming_across_blocks_matches_splitting_the_whole_text(tmp_path, ext):
+    text = mixed_text()
+    assert len(text) > 2 * ingestion.READ_BLOCK_SIZE
+    path = tmp_path / f"long{ext}"
+    path.write_text(text, encoding="utf-8")
+
+    ingester = IngestionManager(chunk_size=300, chunk_overlap=30)
+    streamed = [c.page_content for c in ingester.iter_chunks(str(path))]
+    splitter = ingester.markdown_splitter if ext == ".md" else ingester.text_splitter
+    whole = splitter.split_text(text)
+
+    if ext == ".txt":
+        assert streamed == whole
+    # No word glued to its neighbour across a block or window boundary
+    assert set(" ".join(streamed).split()) == set(text.split())
+    # Headings stay on their own line
+    assert all(line.startswith("# Heading") or "# Heading" not in line
+               for chunk in streamed for line in chunk.splitlines())
+
+
+def test_html_drops_scripts_and_tags(tmp_path):
+    path = tmp_path / "page.html"
+    path.write_text(
+        "<html><head><script>var secret = 1;</script></head>"
+        "<body><h1>Title</h1><p>Hello &amp; welcome.</p></body></html>",
+        encoding="utf-8",
+    )
+
+    chunks = IngestionManager().process_and_split(str(path))
+    text = " ".join(c.page_content for c in chunks)
+
+    assert "Hello & welcome." in text
+    assert "secret" not in text
+    assert "<p>" not in text
+
+
+def test_unsupported_extension_is_rejected(tmp_path):
+    path = tmp_path / "image.png"
+    path.write_bytes(b"\x89PNG")
+
+    with pytest.raises(ValueError):
+        IngestionManager().process_and_split(str(path))
+
+
+def test_ingest_writes_bounded_batches(tmp_path):
+    path = tmp_path / "big.md"
+    path.write_text("# Heading\n\n" + "Markdown paragraph text. " * 5000, encoding="utf-8")
+
+    vm = FakeVectorManager()
+    stats = IngestionManager(chunk_size=300, chunk_overlap=0, batch_size=16).ingest_file(
+        str(path), vm, user_id="user_A", access_level="private"
+    )
+
+    assert stats["chunks"] == sum(len(b[0]) for b in vm.batches)
+    assert stats["batches"] == len(vm.batches)
+    assert all(len(b[0]) <= 16 for b in vm.batches)
+    assert all(b[1] == "user_A" and b[2] == "private" for b in vm.batches)
+    assert stats["peak_rss_mb"] >= 0
+
+
+def test_upload_endpoint_ingests_off_the_event_loop(monkeypatch, tmp_path):
+    import threading
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from ultimaterag.API.v1.endpoints import ingest
+
+    seen = {}
+
+    class FakeEngine:
+        def ingest_file_with_stats(self, path, user_id=None, access_level="private"):
+            seen["thread"] = threading.current_thread().name
+            seen["content"] = open(path).read()
+            return {"chunks": 1, "written": 1, "skipped": 0, "removed": 0, "batches": 1, "seconds": 0.0,
+                    "docs_per_sec": 0.0, "peak_rss_mb": 0.0}
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ingest, "get_rag_engine", lambda: FakeEngine())
+    app = FastAPI()
+    app.include_router(ingest.router, prefix="/ingest")
+
+    response = TestClient(app).post("/ingest/upload", files={"file": ("notes.txt", b"hello world")})
+    assert response.status_code == 200
+    assert seen["content"] == "hello world"
+    assert seen["thread"].startswith("rag-blocking")
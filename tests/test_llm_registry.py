@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+
+from ultimaterag.config.settings import settings
+from ultimaterag.LLM import connection
+
+
+@pytest.fixture(autouse=True)
+def fresh_registry(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "openai")
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "sk-test")
+    asyncio.run(connection.close_llm_clients())
+    yield
+    asyncio.run(connection.close_llm_clients())
+
+
+def test_same_configuration_reuses_one_client():
+    first = connection.get_llm()
+    assert connection.get_llm() is first
+    assert connection.get_llm(model=settings.MODEL_NAME, temperature=connection.DEFAULT_TEMPERATURE) is first
+    assert connection.llm_client_stats()["clients"] == 1
+
+
+def test_different_params_get_their_own_client():
+    base = connection.get_llm()
+    cold = connection.get_llm(temperature=0)
+    other = connection.get_llm(model="gpt-4o-mini")
+    assert len({id(base), id(cold), id(other)}) == 3
+    assert connection.get_llm(temperature=0) is cold
+
+
+def test_clients_share_one_keep_alive_pool():
+    a = connection.get_llm()
+    b = connection.get_llm(temperature=0)
+    assert a.http_client is b.http_client is connection.get_http_client()
+    assert a.http_async_client is connection.get_async_http_client()
+
+
+def test_registry_is_dropped_after_fork(monkeypatch):
+    first = connection.get_llm()
+    monkeypatch.setattr(connection.os, "getpid", lambda: -1)
+    assert connection.get_llm() is not first
+
+
+def test_unknown_provider_raises():
+    with pytest.raises(ValueError):
+        connection.get_llm(provider="nope")
@@ -0,0 +1,136 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from ultimaterag.LLM.local_embeddings import LocalEmbeddingEngine
+
+
+class FakeModel:
+    """Stands in for a SentenceTransformer: records the size of every forward pass."""
+
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.calls = []
+
+    def encode(self, texts, batch_size, normalize_embeddings, convert_to_numpy, show_progress_bar):
+        self.calls.append(list(texts))
+        time.sleep(self.delay)
+        if any(t == "boom" for t in texts):
+            raise RuntimeError("inference failed")
+        return np.array([[float(len(t)), float(t.count("a"))] for t in texts], dtype=np.float32)
+
+
+def make_engine(model, **kwargs):
+    engine = LocalEmbeddingEngine("fake-model", **kwargs)
+    engine._model = model
+    return engine
+
+
+def embed_concurrently(engine, texts):
+    results = [None] * len(texts)
+    barrier = threading.Barrier(len(texts))
+
+    def worker(i):
+        barrier.wait()
+        results[i] = engine.embed_query(texts[i])
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(texts))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    return results
+
+
+def test_concurrent_queries_share_forward_passes():
+    model = FakeModel()
+    engine = make_engine(model, batch_size=16, max_wait_ms=20)
+    texts = [f"query {'a' * i}" for i in range(12)] + ["query a"]  # one duplicate
+
+    results = embed_concurrently(engine, texts)
+    assert results == [[float(len(t)), float(t.count("a"))] for t in texts]
+    assert len(model.calls) < len(texts)
+    assert sum(len(c) for c in model.calls) == 12  # the duplicate was encoded once
+
+    stats = engine.stats()
+    assert stats["queries"] == 13 and stats["avg_batch_size"] > 1
+    assert stats["embeddings_per_sec"] > 0
+    engine.close()
+
+
+def test_batch_size_caps_a_forward_pass():
+    model = FakeModel()
+    engine = make_engine(model, batch_size=4, max_wait_ms=20)
+    embed_concurrently(engine, [f"q{i}" for i in range(10)])
+    assert max(len(c) for c in model.calls) <= 4
+
+    engine.embed_documents([f"doc {i}" for i in range(10)])
+    assert [len(c) for c in model.calls[-3:]] == [4, 4, 2]
+    engine.close()
+
+
+def test_inference_error_reaches_every_caller_and_worker_survives():
+    engine = make_engine(FakeModel(delay=0), batch_size=8, max_wait_ms=20)
+    with pytest.raises(RuntimeError):
+        engine.embed_query("boom")
+    assert engine.embed_query("abc") == [3.0, 1.0]
+    engine.close()
+
+
+def test_close_racing_queries_never_leaves_a_caller_waiting():
+    engine = make_engine(FakeModel(delay=0.005), batch_size=4, max_wait_ms=1)
+    outcomes = []
+
+    def caller(i):
+        for j in range(20):
+            try:
+                engine.embed_query(f"q{i}-{j}")
+                outcomes.append("ok")
+            except RuntimeError:
+                outcomes.append("closed")
+
+    threads = [threading.Thread(target=caller, args=(i,), daemon=True) for i in range(8)]
+    for t in threads:
+        t.start()
+    for _ in range(10):
+        engine.close()
+        time.sleep(0.005)
+    for t in threads:
+        t.join(5)
+    assert not any(t.is_alive() for t in threads)
+    assert len(outcomes) == 160
+    engine.close()
+
+
+def test_queries_left_behind_a_stuck_batch_fail_on_close():
+    release = threading.Event()
+
+    class StuckModel(FakeModel):
+        def encode(self, texts, **kwargs):
+            release.wait(5)
+            return super().encode(texts, **kwargs)
+
+    engine = make_engine(StuckModel(delay=0), batch_size=2, max_wait_ms=0)
+    results = {}
+
+    def query(text):
+        try:
+            results[text] = engine.embed_query(text)
+        except RuntimeError as e:
+            results[text] = e
+
+    first = threading.Thread(target=query, args=("first",))
+    first.start()
+    time.sleep(0.05)  # "first" is being encoded
+    second = threading.Thread(target=query, args=("second",))
+    second.start()
+    time.sleep(0.05)
+
+    engine.close(timeout=0.05)
+    second.join(1)
+    assert isinstance(results["second"], RuntimeError)
+    release.set()
+    first.join(1)
+    assert results["first"] == [5.0, 0.0]
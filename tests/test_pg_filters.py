@@ -0,0 +1,85 @@
+import numpy as np
+
+from ultimaterag.core.vector_db.base import build_access_filter
+from ultimaterag.core.vector_db.postgres import PostgresVectorDB
+
+
+def make_db():
+    return PostgresVectorDB.__new__(PostgresVectorDB)  # no embedding model / schema
+
+
+def normalize(sql):
+    return " ".join(sql.split())
+
+
+def test_rbac_keys_use_typed_columns():
+    db = make_db()
+    branches = db._filter_branches(build_access_filter("alice"))
+    assert branches == [("user_id = %s", ["alice"]), ("access_level = %s", ["common"])]
+
+
+def test_other_keys_use_parameterized_metadata_lookup():
+    db = make_db()
+    where, params = db._build_filter_clause({"source": "a.pdf", "access_level": "common"})
+    assert where == " WHERE metadata->>%s = %s AND access_level = %s"
+    assert params == ["source", "a.pdf", "common"]
+
+
+def test_top_level_keys_apply_to_every_or_branch():
+    db = make_db()
+    branches = db._filter_branches({"$or": [{"user_id": "u"}, {"access_level": "common"}], "source": "x"})
+    assert branches == [
+        ("user_id = %s AND metadata->>%s = %s", ["u", "source", "x"]),
+        ("access_level = %s AND metadata->>%s = %s", ["common", "source", "x"]),
+    ]
+
+
+def test_unconstrained_branch_disables_filtering():
+    db = make_db()
+    assert db._filter_branches({"$or": [{}, {"user_id": "u"}]}) == []
+    assert db._filter_branches(None) == []
+
+
+def test_or_filter_compiles_to_union_all_of_top_k_branches():
+    db = make_db()
+    vector = [0.1, 0.2]
+    sql, params = db._build_search_query(vector, 4, build_access_filter("alice"), with_vectors=False)
+    sql = normalize(sql)
+
+    assert sql.count("UNION ALL") == 1
+    assert "(SELECT id, content, metadata, (embedding <=> %s) AS distance FROM documents WHERE user_id = %s" in sql
+    assert "WHERE access_level = %s ORDER BY distance ASC LIMIT %s)" in sql
+    assert "SELECT DISTINCT ON (id)" in sql
+    assert sql.endswith("ORDER BY distance ASC LIMIT %s")
+    assert " OR " not in sql
+
+    assert sql.count("%s") == len(params)
+    assert [p for p in params if not isinstance(p, np.ndarray)] == ["alice", 4, "common", 4, 4]
+
+
+def test_single_branch_is_a_plain_query():
+    db = make_db()
+    sql, params = db._build_search_query([0.1], 3, build_access_filter(None), with_vectors=True)
+    assert normalize(sql) == ("SELECT id, content, metadata, embedding, (embedding <=> %s) AS distance "
+                              "FROM documents WHERE access_level = %s ORDER BY distance ASC LIMIT %s")
+    assert params[1:] == ["common", 3]
+
+
+def test_rbac_filters_fall_back_to_metadata_until_backfilled(monkeypatch):
+    from ultimaterag.core.vector_db import postgres
+
+    pending = ["rbac_backfill"]
+    monkeypatch.setattr(postgres, "pending_tasks", lambda: list(pending))
+    monkeypatch.setattr(postgres, "RBAC_RECHECK_SECONDS", 0.0)
+    db = make_db()
+    db._rbac_ready = False
+
+    # Pre-existing rows still have the column defaults: match them through metadata JSON
+    assert db._filter_branches(build_access_filter("alice")) == [
+        ("metadata->>%s = %s", ["user_id", "alice"]),
+        ("metadata->>%s = %s", ["access_level", "common"]),
+    ]
+
+    pending.clear()  # `ultimaterag migrate` finished the backfill
+    assert db._filter_branches(build_access_filter("alice")) == [
+        ("user_id = %s", ["alice"]), ("access_level = %s", ["common"])]
@@ -0,0 +1,225 @@
+from contextlib import contextmanager
+
+import pytest
+
+from ultimaterag.config.settings import settings
+from ultimaterag.Database import Schema
+from ultimaterag.Database.Indexes import index_ddl, search_params
+
+
+class RecordingCursor:
+    def __init__(self, applied=(), has_documents=False, valid_indexes=()):
+        self.statements = []
+        self.applied = list(applied)
+        self.has_documents = has_documents
+        self.valid_indexes = set(valid_indexes)
+        self._result = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        sql = " ".join(sql.split())
+        self.statements.append((sql, params))
+        if sql.startswith("SELECT version FROM schema_migrations"):
+            self._result = [(v,) for v in self.applied]
+        elif sql.startswith("SELECT EXISTS"):
+            self._result = [(self.has_documents,)]
+        elif "pg_ts_config" in sql:
+            self._result = [(f"pg_catalog.{params[0]}",)]
+        elif "FROM pg_index" in sql:
+            self._result = [(True,)] if params[0] in self.valid_indexes else []
+
+    def fetchall(self):
+        return self._result
+
+    def fetchone(self):
+        return self._result[0] if self._result else None
+
+
+class RecordingConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.commits = 0
+
+    def cursor(self):
+        return self._cursor
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+def deferred_tasks(cur):
+    return [p[0] for s, p in cur.statements if s.startswith("INSERT INTO schema_tasks")]
+
+
+def test_hnsw_ddl_uses_cosine_ops_and_settings(monkeypatch):
+    monkeypatch.setattr(settings, "PG_HNSW_M", 24)
+    monkeypatch.setattr(settings, "PG_HNSW_EF_CONSTRUCTION", 128)
+    ddl = index_ddl("hnsw", concurrently=True)
+    assert ddl == ("CREATE INDEX CONCURRENTLY IF NOT EXISTS documents_embedding_idx ON documents "
+                   "USING hnsw (embedding vector_cosine_ops) WITH (m = 24, ef_construction = 128)")
+
+
+def test_ivfflat_ddl_and_overrides():
+    ddl = index_ddl("ivfflat", name="tmp_idx", lists=500)
+    assert "USING ivfflat (embedding vector_cosine_ops) WITH (lists = 500)" in ddl
+    assert ddl.startswith("CREATE INDEX IF NOT EXISTS tmp_idx")
+    with pytest.raises(ValueError):
+        index_ddl("flat")
+
+
+def test_search_params_follow_configured_method(monkeypatch):
+    monkeypatch.setattr(settings, "PG_HNSW_EF_SEARCH", 40)
+    monkeypatch.setattr(settings, "PG_IVFFLAT_PROBES", 10)
+
+    assert search_params(4, method="hnsw") == [("hnsw.ef_search", 40)]
+    assert search_params(4, ef_search=200, method="hnsw") == [("hnsw.ef_search", 200)]
+    # ef_search below k would cap the result count
+    assert search_params(100, method="hnsw") == [("hnsw.ef_search", 100)]
+    assert search_params(4, method="ivfflat") == [("ivfflat.probes", 10)]
+    assert search_params(4, probes=3, method="ivfflat") == [("ivfflat.probes", 3)]
+    assert search_params(4, method="none") == []
+
+
+def test_migrations_apply_in_order_and_are_recorded(monkeypatch):
+    monkeypatch.setattr(settings, "PG_INDEX_METHOD", "hnsw")
+    cur = RecordingCursor()
+    conn = RecordingConnection(cur)
+
+    applied = Schema.apply_migrations(conn)
+
+    assert applied == [v for v, _, _ in Schema.MIGRATIONS]
+    assert applied == sorted(applied)
+    sql = [s for s, _ in cur.statements]
+    assert sql[0].startswith("SELECT pg_advisory_xact_lock")
+    assert any("CREATE TABLE IF NOT EXISTS documents" in s for s in sql)
+    assert any("USING hnsw" in s for s in sql)
+    recorded = [p[0] for s, p in cur.statements if s.startswith("INSERT INTO schema_migrations")]
+    assert recorded == applied
+    assert conn.commits == 1
+    assert any(f"tsvector_update_trigger(content_tsv, 'pg_catalog.{settings.PG_TEXT_SEARCH_CONFIG}', content)" in s
+               for s in sql)
+    # Empty table: everything is built inline, nothing left for the online tasks
+    assert deferred_tasks(cur) == []
+
+
+def test_applied_migrations_are_skipped():
+    versions = [v for v, _, _ in Schema.MIGRATIONS]
+    cur = RecordingCursor(applied=versions)
+    assert Schema.apply_migrations(RecordingConnection(cur)) == []
+    assert not any(s.startswith("CREATE INDEX") for s, _ in cur.statements)
+
+
+def test_index_builds_on_populated_table_are_deferred(monkeypatch):
+    monkeypatch.setattr(settings, "PG_INDEX_METHOD", "hnsw")
+    cur = RecordingCursor(applied=[1], has_documents=True)
+    Schema.apply_migrations(RecordingConnection(cur))
+    assert not any("USING hnsw" in s for s, _ in cur.statements)
+    # No full-table backfill or blocking index build inside the startup transaction
+    assert not any(s.startswith("UPDATE documents") for s, _ in cur.statements)
+    deferred_indexes = [name for name, _ in Schema.RBAC_INDEXES] + [Schema.TSV_INDEX[0], Schema.CHUNK_ID_INDEX[0]]
+    assert not any(s.startswith("CREATE INDEX") and any(n in s for n in deferred_indexes) for s, _ in cur.statements)
+    assert not any("GENERATED" in s for s, _ in cur.statements)
+    assert {"rbac_backfill", "tsv_backfill", "chunk_id_index", "ann_indexes"} <= set(deferred_tasks(cur))
+    # Backfills run before the partial ANN index that depends on access_level
+    tasks = list(Schema.TASKS)
+    assert tasks.index("rbac_backfill") < tasks.index("ann_indexes")
+
+
+def test_ivfflat_index_is_always_deferred_and_waits_for_data(monkeypatch):
+    monkeypatch.setattr(settings, "PG_INDEX_METHOD", "ivfflat")
+    for has_documents in (False, True):
+        cur = RecordingCursor(applied=[1], has_documents=has_documents)
+        Schema.apply_migrations(RecordingConnection(cur))
+        assert not any("USING ivfflat" in s for s, _ in cur.statements)
+        assert "ann_indexes" in deferred_tasks(cur)
+
+    # The online task stays pending (not recorded as done) until there are rows to train on
+    @contextmanager
+    def empty_db():
+        yield RecordingConnection(RecordingCursor(has_documents=False))
+
+    monkeypatch.setattr(Schema, "db_connection", empty_db)
+    assert Schema.TASKS["ann_indexes"](1000) is False
+
+
+class PagingCursor(RecordingCursor):
+    """Serves keyset pages over ids 1..n for the batched backfill."""
+
+    def __init__(self, n):
+        super().__init__()
+        self.ids = list(range(1, n + 1))
+        self.rowcount = 0
+
+    def execute(self, sql, params=None):
+        super().execute(sql, params)
+        if sql.lstrip().startswith("SELECT max(id)"):
+            last_id, limit = params
+            page = [i for i in self.ids if i > last_id][:limit]
+            self._result = [(page[-1] if page else None,)]
+        elif sql.lstrip().startswith("UPDATE documents"):
+            self.rowcount = params[1] - params[0]
+
+
+def test_backfill_commits_one_id_range_at_a_time(monkeypatch):
+    cur = PagingCursor(7)
+    conn = RecordingConnection(cur)
+
+    @contextmanager
+    def connection():
+        yield conn
+
+    monkeypatch.setattr(Schema, "db_connection", connection)
+    assert Schema._batched_update("user_id = 'x'", "user_id IS NULL", batch_size=3) == 7
+
+    ranges = [p for s, p in cur.statements if s.startswith("UPDATE documents")]
+    assert ranges == [(0, 3), (3, 6), (6, 7)]
+    assert conn.commits == 3
+
+
+def test_inserts_use_on_conflict_only_once_the_chunk_id_index_is_valid(monkeypatch):
+    from ultimaterag.core.vector_db.postgres import PostgresVectorDB
+
+    row = ("text", "{}", [0.1, 0.2], None, "common", "abc", [0.0, 0.0, 0.0], "v1")
+    for valid_indexes, expected in (((), False), ((Schema.CHUNK_ID_INDEX[0],), True)):
+        db = PostgresVectorDB.__new__(PostgresVectorDB)
+        cur = RecordingCursor(valid_indexes=valid_indexes)
+        db._insert_rows(RecordingConnection(cur), [row], mode="row")
+        inserts = [s for s, _ in cur.statements if s.startswith("INSERT INTO documents")]
+        assert len(inserts) == 1 and ("ON CONFLICT (chunk_id)" in inserts[0]) is expected
+
+
+def test_existing_index_of_another_method_is_reported_not_kept_as_built(monkeypatch):
+    from ultimaterag.Database import Indexes
+
+    cur = RecordingCursor()
+
+    @contextmanager
+    def connection():
+        yield RecordingConnection(cur)
+
+    existing = [{"name": name, "method": "hnsw", "definition": "", "valid": True, "size": "1 MB"}
+                for name, _ in Indexes.ANN_INDEXES]
+    monkeypatch.setattr(Indexes, "index_status", lambda: existing)
+    monkeypatch.setattr(Indexes, "_autocommit_connection", connection)
+    monkeypatch.setattr(Schema, "ensure_schema", lambda report_pending=True: [])
+    monkeypatch.setattr(Schema, "complete_task", lambda name: None)
+
+    same = Indexes.build_index("hnsw")
+    assert set(same["indexes"].values()) == {"exists"} and same["mismatched"] == {}
+
+    other = Indexes.build_index("ivfflat")
+    assert set(other["indexes"].values()) == {"mismatch"}
+    assert other["mismatched"] == {name: "hnsw" for name, _ in Indexes.ANN_INDEXES}
+    assert not any("USING ivfflat" in s for s, _ in cur.statements)
+
+    rebuilt = Indexes.build_index("ivfflat", rebuild=True)
+    assert set(rebuilt["indexes"].values()) == {"rebuilt"}
+    assert any("USING ivfflat" in s for s, _ in cur.statements)
@@ -0,0 +1,136 @@
+import os
+
+import chromadb
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from ultimaterag.core.projection import CorpusProjection
+from ultimaterag.core.vector_db.chroma import PROJECTION_KEYS, PROJECTION_VERSION_KEY, ChromaVectorDB
+
+
+class FakeEmbeddings:
+    model = "fake"
+
+    def embed_documents(self, texts):
+        return [self.embed_query(t) for t in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), float(text.count("x")), float(sum(map(ord, text)) % 97)]
+
+
+def make_chroma(tmp_path):
+    db = ChromaVectorDB.__new__(ChromaVectorDB)
+    db.client = chromadb.PersistentClient(path=str(tmp_path))
+    db.embeddings = FakeEmbeddings()
+    db.collection = db.client.get_or_create_collection("rag_collection", metadata={"hnsw:space": "cosine"})
+    db.projection_path = str(tmp_path / "rag_collection.projection.npz")
+    db._keyword_index = None
+    return db
+
+
+def sample(n, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal((n, dim)) * np.linspace(4, 0.1, dim)
+
+
+def test_random_basis_before_fit_is_deterministic():
+    vectors = sample(5)
+    a, b = CorpusProjection(100), CorpusProjection(100)
+    assert a.transform(vectors).shape == (5, 3)
+    assert np.allclose(a.transform(vectors), b.transform(vectors))
+    assert a.method == "random"
+
+
+def test_fit_on_ingest_then_freeze():
+    projection = CorpusProjection(fit_samples=40)
+    data = sample(60)
+    assert not projection.partial_fit(data[:2])  # buffered: fewer rows than components
+    assert projection.partial_fit(data[2:20])
+    assert projection.method == "pca" and not projection.frozen
+
+    projection.partial_fit(data[20:45])
+    assert projection.frozen
+    version = projection.version
+    assert not projection.partial_fit(data[45:])
+    assert projection.version == version
+
+    # Queries are projected onto the fitted principal axes
+    centered = data[:5] - projection.mean
+    assert np.allclose(projection.transform(data[:5]), centered @ projection.components.T, atol=1e-4)
+
+
+def test_state_round_trip_resumes_fitting():
+    data = sample(80)
+    original = CorpusProjection(fit_samples=70)
+    original.partial_fit(data[:30])
+
+    restored = CorpusProjection.from_bytes(original.to_bytes(), fit_samples=70)
+    assert restored.version == original.version
+    assert np.allclose(restored.transform(data[:3]), original.transform(data[:3]))
+
+    original.partial_fit(data[30:])
+    restored.partial_fit(data[30:])
+    assert restored.frozen
+    assert np.allclose(restored.transform(data[:3]), original.transform(data[:3]), atol=1e-4)
+
+
+def test_chroma_stores_coords_and_projects_queries_consistently(tmp_path):
+    db = make_chroma(tmp_path)
+    texts = [f"chunk number {i} " + "x" * i for i in range(12)]
+    db.add_documents([Document(page_content=t, metadata={"source": "t"}) for t in texts], access_level="common",
+                     batch_size=4)
+
+    stored = db.collection.get(include=["metadatas"])["metadatas"]
+    assert all(PROJECTION_VERSION_KEY in m for m in stored)
+
+    first = db.search_with_embeddings("chunk number 3", k=12)
+    second = db.search_with_embeddings("something else entirely", k=12)
+    assert all(not set(p["metadata"]) & set(PROJECTION_KEYS) for p in first["points"])
+    # Same basis for every request: a chunk lands on the same spot whatever the query
+    coords = lambda result: {p["text"]: (p["x"], p["y"], p["z"]) for p in result["points"]}
+    assert coords(first) == coords(second)
+
+    # The basis moved while the first batches were written; rebuild re-projects them
+    result = db.rebuild_projection(page_size=5)
+    assert result["scanned"] == 12 and result["updated"] > 0
+    versions = {m[PROJECTION_VERSION_KEY] for m in db.collection.get(include=["metadatas"])["metadatas"]}
+    assert versions == {db.projection.version}
+
+    # The basis is persisted next to the collection
+    reopened = make_chroma(tmp_path)
+    assert reopened.projection.version == db.projection.version
+
+
+def test_refit_on_empty_store_is_refused(tmp_path):
+    db = make_chroma(tmp_path)
+    with pytest.raises(ValueError):
+        db.rebuild_projection(refit=True)
+    assert not os.path.exists(db.projection_path)
+    with pytest.raises(ValueError):
+        CorpusProjection(100).to_bytes()
+
+
+def test_unreadable_state_falls_back_to_a_fresh_basis(tmp_path):
+    db = make_chroma(tmp_path)
+    with open(db.projection_path, "wb") as f:
+        f.write(b"not an npz file")
+    assert db.projection.method == "none"
+    db.add_documents([Document(page_content=f"chunk {i}", metadata={}) for i in range(4)], access_level="common")
+    assert db.projection.method == "pca"
+
+
+def test_server_picks_up_a_refit_made_by_another_process(tmp_path):
+    server = make_chroma(tmp_path)
+    server.add_documents([Document(page_content=f"chunk {i} " + "x" * i, metadata={}) for i in range(8)],
+                         access_level="common")
+    old_version = server.projection.version
+
+    cli = make_chroma(tmp_path)
+    cli.collection.add(ids=["extra"], documents=["an outlier"], embeddings=[[500.0, 90.0, 1.0]],
+                       metadatas=[{"source": "t"}])
+    cli.rebuild_projection(refit=True)
+    assert cli.projection.version != old_version
+
+    server.export_points()
+    assert server.projection.version == cli.projection.version
@@ -0,0 +1,65 @@
+from langchain_core.documents import Document
+
+from ultimaterag.config.settings import settings
+from ultimaterag.core import rerank
+from ultimaterag.core.rerank import Reranker, chunk_key
+
+
+class OverlapReranker(Reranker):
+    """Scores by shared words; records every batch sent to the "model"."""
+
+    model_name = "overlap"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.batches = []
+
+    def _predict(self, pairs):
+        self.batches.append(len(pairs))
+        return [len(set(q.lower().split()) & set(d.lower().split())) for q, d in pairs]
+
+
+def docs(*texts):
+    return [Document(page_content=t, metadata={"source": "t"}) for t in texts]
+
+
+def test_rerank_orders_and_cuts_to_top_n():
+    reranker = OverlapReranker(batch_size=8)
+    ranked = reranker.rerank("reset the admin password",
+                             docs("billing faq", "reset admin password steps", "password policy"), top_n=2)
+    assert [d.page_content for d in ranked] == ["reset admin password steps", "password policy"]
+    assert ranked[0].metadata["rerank_score"] == 3.0
+    assert ranked[0].metadata["source"] == "t"
+
+
+def test_min_score_drops_irrelevant_chunks():
+    reranker = OverlapReranker()
+    assert reranker.rerank("gpu drivers", docs("billing faq", "tax forms"), min_score=1) == []
+
+
+def test_scores_are_batched_and_cached_per_query_and_chunk():
+    reranker = OverlapReranker(batch_size=2, cache_size=100)
+    chunks = docs("a b", "b c", "c d", "d e", "e f")
+
+    first = reranker.score("b d", chunks)
+    assert reranker.batches == [2, 2, 1]
+
+    # Same query: served from cache. New chunk only: one pair scored.
+    assert reranker.score("b d", chunks) == first
+    reranker.score("b d", chunks + docs("b d"))
+    assert reranker.batches == [2, 2, 1, 1]
+
+    # Different query: all pairs are new.
+    reranker.score("a", chunks[:1])
+    assert reranker.batches[-1] == 1
+    assert reranker.pairs_scored == 7
+
+
+def test_chunk_key_prefers_store_id():
+    assert chunk_key(Document(page_content="x", metadata={"id": 42})) == "42"
+    assert chunk_key(Document(page_content="x")) == chunk_key(Document(page_content="x", metadata={"a": 1}))
+
+
+def test_get_reranker_disabled_by_default(monkeypatch):
+    monkeypatch.setattr(settings, "RERANK_ENABLED", False)
+    assert rerank.get_reranker() is None
@@ -0,0 +1,76 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")  # fakeredis needs it to run Lua scripts
+
+from ultimaterag.core import memory as memory_module
+from ultimaterag.core.memory import MemoryManager, RedisSessionHistory
+
+
+def make_history(client, session_id="s1", n=0):
+    history = RedisSessionHistory(session_id, client)
+    for i in range(n):
+        history.add_message(HumanMessage(content=f"m{i}"))
+    return history
+
+
+def contents(history):
+    return [m.content for m in history.messages]
+
+
+def test_messages_are_returned_oldest_first():
+    history = make_history(fakeredis.FakeRedis())
+    history.add_messages([HumanMessage(content="hi"), AIMessage(content="hello")])
+    assert contents(history) == ["hi", "hello"]
+
+
+def test_trim_oldest_keeps_messages_added_during_consolidation():
+    history = make_history(fakeredis.FakeRedis(), n=12)
+    snapshot = history.raw_messages()
+    to_archive = snapshot[-10:]
+
+    # New turn lands while the summary is being generated.
+    history.add_messages([HumanMessage(content="late question"), AIMessage(content="late answer")])
+
+    assert history.trim_oldest(to_archive) is True
+    assert contents(history) == ["m10", "m11", "late question", "late answer"]
+
+
+def test_trim_oldest_is_compare_and_set():
+    client = fakeredis.FakeRedis()
+    history = make_history(client, n=12)
+    to_archive = history.raw_messages()[-10:]
+
+    # Another worker already trimmed the same messages: nothing else is removed.
+    assert history.trim_oldest(to_archive) is True
+    assert history.trim_oldest(to_archive) is False
+    assert contents(history) == ["m10", "m11"]
+
+    # History cleared and rebuilt underneath: the new messages survive.
+    history.clear()
+    history.add_messages([HumanMessage(content=f"n{i}") for i in range(12)])
+    assert history.trim_oldest(to_archive) is False
+    assert len(history.messages) == 12
+
+
+def test_trim_whole_history_deletes_key():
+    client = fakeredis.FakeRedis()
+    history = make_history(client, n=3)
+    assert history.trim_oldest(history.raw_messages()) is True
+    assert history.messages == []
+    assert not client.exists(history.key)
+
+
+def test_memory_manager_shares_one_client(monkeypatch):
+    client = fakeredis.FakeRedis()
+    monkeypatch.setattr(memory_module, "get_redis_client", lambda: client)
+    monkeypatch.setattr(memory_module, "get_async_redis_client", lambda: None)
+
+    manager = MemoryManager()
+    a = manager.get_session_memory("a")
+    b = manager.get_session_memory("b")
+    assert a.client is client and b.client is client
+
+    manager.add_user_message("a", "question")
+    assert [m.content for m in manager.get_history("a")] == ["question"]
@@ -0,0 +1,73 @@
+import threading
+import time
+
+import pytest
+from langchain_core.documents import Document
+from ultimaterag.core.vector_db.writer import PipelinedWriter
+
+
+def _docs(n):
+    return (Document(page_content=f"chunk {i}") for i in range(n))
+
+
+def test_all_documents_are_written_in_order():
+    written = []
+
+    writer = PipelinedWriter(
+        embed_fn=lambda texts: [[float(len(t))] for t in texts],
+        write_fn=lambda docs, embs: written.extend(d.page_content for d in docs),
+        batch_size=7,
+        max_pending=2,
+    )
+    stats = writer.run(_docs(50))
+
+    assert written == [f"chunk {i}" for i in range(50)]
+    assert stats["documents"] == 50
+    assert stats["batches"] == 8
+
+
+def test_embedding_overlaps_writes_and_is_bounded():
+    in_flight = {"embedded": 0, "written": 0, "max_ahead": 0}
+    lock = threading.Lock()
+
+    def embed(texts):
+        with lock:
+            in_flight["embedded"] += 1
+            ahead = in_flight["embedded"] - in_flight["written"]
+            in_flight["max_ahead"] = max(in_flight["max_ahead"], ahead)
+        return [[0.0] for _ in texts]
+
+    def write(docs, embs):
+        time.sleep(0.01)  # slow database
+        with lock:
+            in_flight["written"] += 1
+
+    PipelinedWriter(embed, write, batch_size=1, max_pending=2).run(_docs(20))
+
+    # queue (2) + one batch being written + one being embedded
+    assert in_flight["max_ahead"] <= 4
+
+
+def test_write_errors_are_raised():
+    def write(docs, embs):
+        raise RuntimeError("db down")
+
+    with pytest.raises(RuntimeError, match="db down"):
+        PipelinedWriter(lambda t: [[0.0]] * len(t), write, batch_size=2).run(_docs(10))
+
+
+def test_prepare_fn_skips_documents_before_embedding():
+    embedded, written = [], []
+
+    def embed(texts):
+        embedded.extend(texts)
+        return [[0.0]] * len(texts)
+
+    writer = PipelinedWriter(
+        embed, lambda docs, embs: written.extend(d.page_content for d in docs), batch_size=4,
+        prepare_fn=lambda docs: [d for d in docs if not d.page_content.endswith(("0", "2", "4", "6", "8"))],
+    )
+    stats = writer.run(_docs(10))
+
+    assert embedded == written == [f"chunk {i}" for i in range(1, 10, 2)]
+    assert (stats["documents"], stats["skipped"]) == (5, 5)
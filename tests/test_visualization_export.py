@@ -0,0 +1,66 @@
+import numpy as np
+from langchain_core.documents import Document
+
+from ultimaterag.core.vector_db.chroma import PROJECTION_VERSION_KEY
+from ultimaterag.core.visualization import decode_points_page, encode_points_page
+from test_projection import make_chroma
+
+
+def test_page_round_trip_with_padding():
+    coords = np.array([[0.5, -1.25, 3.0], [0.1, 0.2, 0.3], [7.0, 8.0, -9.0]], dtype=np.float32)
+    page = {
+        "ids": ["a", "b", "c"],
+        "coords": coords,
+        "texts": ["one", "two", "three"],
+        "metadatas": [{"source": "x.pdf"}, {"source": "y.pdf"}, {"source": "x.pdf"}],
+        "next_cursor": "3",
+        "projection": "pca-123",
+    }
+    data = encode_points_page(page, include_text=True)
+    header_length = int.from_bytes(data[4:8], "little")
+    assert header_length % 8 == 0
+    # header + float16 coords (18 bytes, padded to 20) + uint32 labels
+    assert len(data) == 8 + header_length + 20 + 12
+
+    decoded = decode_points_page(data)
+    assert decoded["count"] == 3 and decoded["next_cursor"] == "3"
+    assert np.allclose(decoded["coords"], coords, atol=1e-2)
+    assert decoded["labels"] == ["x.pdf", "y.pdf"]
+    assert decoded["label_codes"].tolist() == [0, 1, 0]
+    assert decoded["texts"] == ["one", "two", "three"] and "ids" not in decoded
+
+
+def test_chroma_export_pages_through_scope(tmp_path):
+    db = make_chroma(tmp_path)
+    common = [Document(page_content=f"public chunk {i}", metadata={"source": "pub"}) for i in range(7)]
+    private = [Document(page_content=f"private chunk {i}", metadata={"source": "mine"}) for i in range(3)]
+    db.add_documents(common, access_level="common")
+    db.add_documents(private, user_id="alice")
+
+    def export_all(user_id):
+        ids, cursor = [], None
+        while True:
+            page = db.export_points(user_id=user_id, cursor=cursor, limit=4)
+            assert page["coords"].shape == (len(page["ids"]), 3)
+            ids += page["ids"]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return ids
+
+    assert len(set(export_all(None))) == 7
+    assert len(set(export_all("alice"))) == 10
+    assert len(export_all("bob")) == 7
+
+
+def test_export_reprojects_and_stores_stale_coordinates(tmp_path):
+    db = make_chroma(tmp_path)
+    db.add_documents([Document(page_content=f"chunk {i} " + "x" * i, metadata={}) for i in range(6)],
+                     access_level="common", batch_size=2)
+    page = db.export_points(limit=10)
+
+    stored = db.collection.get(ids=page["ids"], include=["documents"])
+    texts = dict(zip(stored["ids"], stored["documents"]))
+    expected = db.projection.transform(db.embeddings.embed_documents([texts[i] for i in page["ids"]]))
+    assert np.allclose(page["coords"], expected, atol=1e-4)
+    versions = {m[PROJECTION_VERSION_KEY] for m in db.collection.get(include=["metadatas"])["metadatas"]}
+    assert versions == {db.projection.version}
@@ -0,0 +1,123 @@
+import threading
+import time
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeMessagesListChatModel
+from langchain_core.messages import AIMessage
+
+from ultimaterag.core.workflows.graph import END, WorkflowError, WorkflowGraph
+
+
+def sleeper(key, seconds=0.2):
+    def node(state):
+        time.sleep(seconds)
+        return {key: True}
+    return node
+
+
+def test_independent_nodes_run_in_parallel_and_join_waits():
+    order = []
+    graph = WorkflowGraph("fan-out")
+    graph.add_node("a", sleeper("a"))
+    graph.add_node("b", sleeper("b"))
+    graph.add_node("slow", sleeper("slow"))
+    graph.add_node("join", lambda s: order.append(("join", s["a"], s["slow"])) or {"done": True})
+    graph.set_entry("a", "b")
+    graph.add_edge("b", "slow")
+    graph.add_edge(["a", "slow"], "join")
+
+    start = time.perf_counter()
+    state = graph.run({})
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.55  # a || b, then slow: two supersteps, not three sequential sleeps
+    assert order == [("join", True, True)]  # join ran once, after both sources
+    assert [(r["node"], r["step"]) for r in state["steps"]] == [("a", 0), ("b", 0), ("slow", 1), ("join", 2)]
+    assert all(r["seconds"] >= 0 for r in state["steps"])
+
+
+def test_conditional_loop_is_bounded():
+    graph = WorkflowGraph("loop")
+    graph.add_node("inc", lambda s: {"n": s.get("n", 0) + 1})
+    graph.set_entry("inc")
+    graph.add_conditional_edges("inc", lambda s: "inc" if s["n"] < 3 else END)
+    assert graph.run({})["n"] == 3
+
+    graph = WorkflowGraph("runaway", max_steps=5)
+    graph.add_node("spin", lambda s: None)
+    graph.set_entry("spin")
+    graph.add_edge("spin", "spin")
+    with pytest.raises(WorkflowError):
+        graph.run({})
+
+    graph = WorkflowGraph("capped")
+    graph.add_node("spin", lambda s: None, max_visits=2)
+    graph.set_entry("spin")
+    graph.add_edge("spin", "spin")
+    with pytest.raises(WorkflowError, match="visits"):
+        graph.run({})
+
+
+def test_parallel_nodes_may_not_write_the_same_key():
+    graph = WorkflowGraph("conflict")
+    graph.add_node("a", lambda s: {"x": 1})
+    graph.add_node("b", lambda s: {"x": 2})
+    graph.set_entry("a", "b")
+    with pytest.raises(WorkflowError, match="both updated"):
+        graph.run({})
+
+
+def test_unknown_nodes_are_rejected():
+    graph = WorkflowGraph("broken")
+    graph.add_node("a", lambda s: None)
+    graph.set_entry("a")
+    graph.add_edge("a", "missing")
+    with pytest.raises(WorkflowError, match="missing"):
+        graph.run({})
+
+
+def test_token_usage_is_recorded_per_node():
+    def llm_node(tokens):
+        llm = FakeMessagesListChatModel(responses=[AIMessage(
+            content="ok", usage_metadata={"input_tokens": tokens, "output_tokens": 1, "total_tokens": tokens + 1})])
+        return lambda s: {f"out{tokens}": llm.invoke("hi").content}
+
+    graph = WorkflowGraph("tokens")
+    graph.add_node("small", llm_node(10))
+    graph.add_node("large", llm_node(100))
+    graph.add_node("plain", lambda s: None)
+    graph.set_entry("small", "large")
+    graph.add_edge("large", "plain")
+
+    steps = {r["node"]: r["tokens"] for r in graph.run({})["steps"]}
+    assert steps["small"] == {"input_tokens": 10, "output_tokens": 1, "total_tokens": 11}
+    assert steps["large"]["total_tokens"] == 101
+    assert steps["plain"]["total_tokens"] == 0
+
+
+def test_llm_grading_stops_before_grading_every_candidate(monkeypatch):
+    from types import SimpleNamespace
+    from ultimaterag.config.settings import settings
+    from ultimaterag.core.workflows.engine import WORKFLOW_K, WorkflowEngine
+
+    monkeypatch.setattr(settings, "WORKFLOW_GRADE_CONCURRENCY", 2)
+    monkeypatch.setattr(settings, "WORKFLOW_MIN_RELEVANT", 3)
+    started = []
+    lock = threading.Lock()
+
+    class Grader:
+        def invoke(self, inputs):
+            with lock:
+                started.append(inputs["document"])
+            time.sleep(0.02)
+            return SimpleNamespace(binary_score="yes")
+
+    engine = WorkflowEngine.__new__(WorkflowEngine)
+    engine.grader = Grader()
+    candidates = [f"doc {i}" for i in range(settings.WORKFLOW_GRADE_CANDIDATES)]
+
+    kept = engine._llm_grade("q", candidates)
+    assert len(kept) == WORKFLOW_K
+    assert kept == sorted(kept, key=candidates.index)
+    time.sleep(0.1)  # let in-flight calls finish
+    assert len(started) < len(candidates)